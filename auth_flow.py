@@ -0,0 +1,235 @@
+"""
+Fluxos de login (authorization code + PKCE) do MSAL
+
+initiate_auth_code_flow gera `state`, `nonce` e o par PKCE a cada chamada.
+Para que renderizar a página de login não faça criptografia nem I/O:
+  - FlowPool mantém alguns fluxos pré-gerados e é reabastecido em uma
+    thread de fundo quando fica abaixo de `low_water`;
+  - FlowStore guarda os fluxos entregues, indexados por `state`, até o
+    retorno do Azure AD (limite de tamanho e TTL). O retorno chega em uma
+    nova sessão Streamlit, por isso o store é do processo, não da sessão.
+
+O FlowStore em memória só funciona com um único processo: com vários
+workers ou réplicas o retorno pode cair em outro processo. Para isso há
+SQLiteFlowStore e RedisFlowStore, escolhidos pela mesma configuração do
+session store (`session_store`, `session_store_path`).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+Flow = Dict[str, Any]
+
+
+class FlowStore:
+    """Fluxos pendentes por `state`, com LRU e expiração"""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 900):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, flow: Flow):
+        with self._lock:
+            self._data[flow["state"]] = (flow, time.monotonic())
+            self._data.move_to_end(flow["state"])
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def _live(self, state: str, remove: bool) -> Optional[Flow]:
+        with self._lock:
+            entry = self._data.pop(state, None) if remove else self._data.get(state)
+            if entry is None:
+                return None
+            flow, stored = entry
+            if time.monotonic() - stored > self.ttl:
+                self._data.pop(state, None)
+                return None
+            return flow
+
+    def get(self, state: str) -> Optional[Flow]:
+        """Fluxo ainda pendente (sem consumir)"""
+        return self._live(state, remove=False) if state else None
+
+    def pop(self, state: str) -> Optional[Flow]:
+        """Consome o fluxo: cada `state` só pode ser usado uma vez"""
+        return self._live(state, remove=True) if state else None
+
+
+class SQLiteFlowStore:
+    """Fluxos pendentes em uma tabela SQLite, compartilhada entre processos"""
+
+    def __init__(self, path: str, ttl: float = 900):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS login_flows ("
+                "state TEXT PRIMARY KEY, blob TEXT NOT NULL, stored REAL NOT NULL)"
+            )
+
+    def put(self, flow: Flow):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM login_flows WHERE stored < ?", (now - self.ttl,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO login_flows (state, blob, stored) VALUES (?, ?, ?)",
+                (flow["state"], json.dumps(flow), now),
+            )
+
+    def get(self, state: str) -> Optional[Flow]:
+        if not state:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT blob FROM login_flows WHERE state = ? AND stored >= ?",
+                (state, time.time() - self.ttl),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pop(self, state: str) -> Optional[Flow]:
+        if not state:
+            return None
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT blob, stored FROM login_flows WHERE state = ?", (state,)
+            ).fetchone()
+            if row is None:
+                return None
+            # Só quem apagou a linha consome o fluxo (outro processo pode ter chegado antes)
+            if self._conn.execute("DELETE FROM login_flows WHERE state = ?", (state,)).rowcount != 1:
+                return None
+        if time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+
+class RedisFlowStore:
+    """Fluxos pendentes em Redis (ou substituto compatível), com TTL nativo"""
+
+    def __init__(self, client, prefix: str = "st_login_flow:", ttl: float = 900):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def put(self, flow: Flow):
+        self.client.set(self.prefix + flow["state"], json.dumps(flow), ex=int(self.ttl))
+
+    def get(self, state: str) -> Optional[Flow]:
+        blob = self.client.get(self.prefix + state) if state else None
+        return json.loads(blob) if blob else None
+
+    def pop(self, state: str) -> Optional[Flow]:
+        if not state:
+            return None
+        pipe = self.client.pipeline()  # MULTI/EXEC: leitura e remoção atômicas
+        pipe.get(self.prefix + state)
+        pipe.delete(self.prefix + state)
+        blob, removed = pipe.execute()
+        return json.loads(blob) if blob and removed else None
+
+
+class FlowPool:
+    """Fluxos pré-gerados por `factory()`, reabastecidos em segundo plano"""
+
+    def __init__(self, factory: Callable[[], Flow], size: int = 16, low_water: int = 4,
+                 max_age: float = 600):
+        self.factory = factory
+        self.size = size
+        self.low_water = low_water
+        self.max_age = max_age
+        self._flows: deque = deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+
+    def take(self) -> Flow:
+        """Um fluxo pronto; só gera na hora se o pool estiver vazio"""
+        now = time.monotonic()
+        flow = None
+        with self._lock:
+            while self._flows:
+                candidate, created = self._flows.popleft()
+                if now - created <= self.max_age:
+                    flow = candidate
+                    break
+            low = len(self._flows) < self.low_water
+        if low:
+            self._refill_async()
+        return flow if flow is not None else self.factory()
+
+    def _refill_async(self):
+        with self._lock:
+            if self._refilling:
+                return
+            self._refilling = True
+        threading.Thread(target=self._refill, name="auth-flow-pool", daemon=True).start()
+
+    def _refill(self):
+        try:
+            while True:
+                with self._lock:
+                    if len(self._flows) >= self.size:
+                        return
+                flow = self.factory()
+                with self._lock:
+                    self._flows.append((flow, time.monotonic()))
+        except Exception as e:
+            # take() gera na hora; a próxima chamada tenta reabastecer de novo
+            logger.error(f"Erro ao pré-gerar fluxos de login: {e}")
+        finally:
+            with self._lock:
+                self._refilling = False
+
+
+_lock = threading.Lock()
+_flow_stores: Dict[tuple, Any] = {}
+_pools: Dict[tuple, FlowPool] = {}
+
+
+def create_flow_store(kind: str = "memory", path: Optional[str] = None):
+    """Cria o store a partir da configuração do session store ("memory", "sqlite" ou "redis")"""
+    kind = (kind or "memory").lower()
+    if kind == "memory":
+        return FlowStore()
+    if kind == "sqlite":
+        return SQLiteFlowStore(path or os.path.join(".streamlit", "sessions.sqlite"))
+    if kind == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("session_store = 'redis' requer redis: pip install redis")
+        return RedisFlowStore(redis.Redis.from_url(path or "redis://localhost:6379/0"))
+    raise ValueError(f"Tipo de flow store desconhecido: {kind}")
+
+
+def get_flow_store(kind: str = "memory", path: Optional[str] = None):
+    """Store de fluxos pendentes compartilhado pelo processo para (kind, path)"""
+    key = ((kind or "memory").lower(), path)
+    with _lock:
+        store = _flow_stores.get(key)
+        if store is None:
+            store = create_flow_store(kind, path)
+            _flow_stores[key] = store
+        return store
+
+
+def get_flow_pool(key: tuple, factory: Callable[[], Flow]) -> FlowPool:
+    """Pool por configuração (client, authority, redirect, escopos)"""
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = FlowPool(factory)
+            _pools[key] = pool
+            pool._refill_async()
+        return pool
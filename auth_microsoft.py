@@ -5,16 +5,31 @@ Implementa login via Azure AD com MSAL
 Template reutilizável para projetos Synvia
 """
 
+import asyncio
+import hashlib
+import json
 import os
+import time
 from functools import lru_cache
 from html import escape
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
-import msal
+import jwt
 import requests
 import streamlit as st
+import streamlit.components.v1 as components
 import logging
 
+import msal_registry
+from auth_flow import get_flow_pool, get_flow_store
+from graph_async import get_async_client
+from graph_http import HttpTransport, get_default_transport
+from profile_cache import get_profile_cache
+from session_store import SessionRecord, compact_profile, get_session_store, new_session_id
+from token_cache import get_token_cache
+from token_refresher import SessionTokens, TokenSet, get_token_refresher
+from token_validator import get_token_validator
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -190,9 +205,10 @@ LOGIN_PAGE_CSS = f"""
 class MicrosoftAuth:
     """Classe para gerenciar autenticação Microsoft via Azure AD"""
 
-    def __init__(self):
+    def __init__(self, transport: Optional[HttpTransport] = None):
         """Inicializar com configurações do Streamlit secrets"""
         try:
+            self.transport = transport or get_default_transport()
             auth_config = st.secrets.get("auth", {})
 
             self.client_id = auth_config.get("client_id", os.getenv("AZURE_CLIENT_ID"))
@@ -203,6 +219,19 @@ class MicrosoftAuth:
             self.authority = auth_config.get("authority", f"https://login.microsoftonline.com/{self.tenant_id}")
             self.scope = auth_config.get("scope", ["https://graph.microsoft.com/User.Read"])
 
+            # Cache de tokens MSAL compartilhado ("memory", "file" ou "sqlite")
+            self.token_cache = get_token_cache(
+                auth_config.get("token_cache", "memory"),
+                auth_config.get("token_cache_path")
+            )
+
+            # Fluxos de login pendentes no mesmo backend do session store, para
+            # que o retorno do Azure AD funcione com vários workers/réplicas
+            self.flow_store = get_flow_store(
+                auth_config.get("session_store", "memory"),
+                auth_config.get("session_store_path")
+            )
+
             # Determinar redirect URI baseado no ambiente
             self.redirect_uri = self._get_redirect_uri()
 
@@ -246,77 +275,170 @@ class MicrosoftAuth:
             logger.error(f"Erro ao determinar redirect URI: {e}")
             return self.redirect_uri_prod
 
-    def get_login_url(self) -> str:
-        """Gera URL de autenticação Microsoft"""
+    def _get_app(self):
+        """Aplicação MSAL compartilhada pelo processo (ver msal_registry)"""
+        return msal_registry.get_confidential_app(
+            self.client_id,
+            self.authority,
+            self.client_secret,
+            token_cache=self.token_cache
+        )
+
+    @staticmethod
+    def _home_account_id(result: Dict[str, Any]) -> Optional[str]:
+        """Identificador da conta no cache MSAL (<oid>.<tid>)"""
+        claims = result.get("id_token_claims") or {}
+        if claims.get("oid") and claims.get("tid"):
+            return f"{claims['oid']}.{claims['tid']}"
+        return None
+
+    def _acquire_token_silent(self, home_account_id: str) -> Optional[Dict[str, Any]]:
+        """Tenta servir o token pelo cache MSAL (renovando via refresh token cacheado)"""
+        app = self._get_app()
+        self.token_cache.load_partition(home_account_id)
+        accounts = [a for a in app.get_accounts() if a.get("home_account_id") == home_account_id]
+        if not accounts:
+            return None
+        result = app.acquire_token_silent(self.scope, account=accounts[0])
+        self.token_cache.save_partition(home_account_id)
+        return result
+
+    def forget_user(self, home_account_id: str):
+        """Remove os tokens do usuário do cache (memória e store)"""
+        self.token_cache.forget_partition(home_account_id)
+
+    def _new_flow(self) -> Dict[str, Any]:
+        """Fluxo authorization code + PKCE (state, nonce, code_verifier, auth_uri)"""
+        return self._get_app().initiate_auth_code_flow(
+            self.scope,
+            redirect_uri=self.redirect_uri,
+            prompt="select_account"
+        )
+
+    def start_login_flow(self, state: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Fluxo de login para a página: reutiliza o fluxo pendente de `state`
+        (mesma sessão em reruns) ou retira um pré-gerado do pool.
+        """
         try:
-            app = msal.ConfidentialClientApplication(
-                self.client_id,
-                authority=self.authority,
-                client_credential=self.client_secret
-            )
+            store = self.flow_store
+            flow = store.get(state)
+            if flow is None:
+                key = (self.client_id, self.authority, self.redirect_uri, tuple(self.scope))
+                flow = get_flow_pool(key, self._new_flow).take()
+                store.put(flow)
+            return flow
+        except Exception as e:
+            logger.error(f"Erro ao gerar URL de login: {e}")
+            raise
 
-            auth_url = app.get_authorization_request_url(
+    def get_login_url(self) -> str:
+        """
+        Gera URL de autenticação Microsoft (par legado de get_token_from_code)
+
+        Sem state/PKCE: o código retornado é trocado por get_token_from_code.
+        A página de login usa start_login_flow + get_token_from_auth_response.
+        """
+        try:
+            return self._get_app().get_authorization_request_url(
                 self.scope,
                 redirect_uri=self.redirect_uri,
                 prompt="select_account"
             )
-            return auth_url
         except Exception as e:
             logger.error(f"Erro ao gerar URL de login: {e}")
             raise
 
+    def discard_login_flow(self, state: Optional[str]):
+        """Descarta o fluxo pendente (ex.: o usuário cancelou no Azure AD)"""
+        self.flow_store.pop(state)
+
+    def get_token_from_auth_response(self, auth_response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Conclui o login a partir dos query params do redirect (code, state...).
+        O fluxo é consumido pelo `state`; o MSAL confere state, nonce e PKCE.
+        """
+        flow = self.flow_store.pop(auth_response.get("state"))
+        if flow is None:
+            logger.error("Fluxo de login desconhecido ou expirado (state inválido)")
+            return None
+        try:
+            result = self._get_app().acquire_token_by_auth_code_flow(flow, auth_response)
+            return self._login_result(result)
+        except ValueError as e:
+            # state divergente ou resposta adulterada
+            logger.error(f"Resposta de autenticação inválida: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Erro ao obter token: {e}")
+            return None
+
     def get_token_from_code(self, code: str) -> Optional[Dict[str, Any]]:
-        """Troca código de autorização por token de acesso"""
+        """
+        Troca código de autorização por token de acesso
+
+        Só para códigos emitidos pela URL de get_login_url (sem PKCE); códigos
+        de start_login_flow exigem o code_verifier e passam por
+        get_token_from_auth_response.
+        """
         try:
-            app = msal.ConfidentialClientApplication(
-                self.client_id,
-                authority=self.authority,
-                client_credential=self.client_secret
-            )
+            app = self._get_app()
 
             result = app.acquire_token_by_authorization_code(
                 code,
                 scopes=self.scope,
                 redirect_uri=self.redirect_uri
             )
+            return self._login_result(result)
 
-            if "access_token" in result:
-                return {
-                    "access_token": result["access_token"],
-                    "refresh_token": result.get("refresh_token"),
-                    "expires_in": result.get("expires_in", 3600)
-                }
+        except Exception as e:
+            logger.error(f"Erro ao obter token: {e}")
+            return None
 
-            if "error" in result:
-                logger.error(f"Erro na autenticação: {result['error_description']}")
-                return None
+    def _login_result(self, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Salva a partição do usuário no cache e extrai os campos usados pela sessão"""
+        if "access_token" in result:
+            home_account_id = self._home_account_id(result)
+            self.token_cache.save_partition(home_account_id)
+            return {
+                "access_token": result["access_token"],
+                "refresh_token": result.get("refresh_token"),
+                "expires_in": result.get("expires_in", 3600),
+                "home_account_id": home_account_id,
+                # Claims do id_token já validadas pelo MSAL na troca do código
+                "oid": (result.get("id_token_claims") or {}).get("oid")
+            }
 
+        if "error" in result:
+            logger.error(f"Erro na autenticação: {result['error_description']}")
             return None
 
-        except Exception as e:
-            logger.error(f"Erro ao obter token: {e}")
-            return None
+        return None
 
-    def refresh_access_token(self, refresh_token: str) -> Optional[Dict[str, Any]]:
-        """Renova o access token usando refresh token"""
+    def refresh_access_token(self, refresh_token: str,
+                             home_account_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Renova o access token (primeiro pelo cache MSAL, depois pelo refresh token)"""
         try:
-            app = msal.ConfidentialClientApplication(
-                self.client_id,
-                authority=self.authority,
-                client_credential=self.client_secret
-            )
-
-            result = app.acquire_token_by_refresh_token(
-                refresh_token,
-                scopes=self.scope
-            )
+            result = None
+            if home_account_id:
+                result = self._acquire_token_silent(home_account_id)
+
+            if not result or "access_token" not in result:
+                app = self._get_app()
+                result = app.acquire_token_by_refresh_token(
+                    refresh_token,
+                    scopes=self.scope
+                )
+                home_account_id = self._home_account_id(result) or home_account_id
+                self.token_cache.save_partition(home_account_id)
 
             if "access_token" in result:
                 logger.info("Token renovado com sucesso")
                 return {
                     "access_token": result["access_token"],
                     "refresh_token": result.get("refresh_token", refresh_token),
-                    "expires_in": result.get("expires_in", 3600)
+                    "expires_in": result.get("expires_in", 3600),
+                    "home_account_id": home_account_id
                 }
 
             if "error" in result:
@@ -329,27 +451,98 @@ class MicrosoftAuth:
             logger.error(f"Erro ao renovar token: {e}")
             return None
 
-    def get_user_info(self, token: str) -> Optional[Dict[str, Any]]:
-        """Obtém informações do usuário via Microsoft Graph"""
+    def _user_oid(self, token: str) -> Optional[str]:
+        """Object id do usuário (claim `oid`) a partir das claims validadas do token"""
         try:
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
+            return self._validator().validate(token).get("oid")
+        except Exception:
+            return None
+
+    @staticmethod
+    def _unverified_oid(token: str) -> Optional[str]:
+        """Claim `oid` sem verificar a assinatura (só serve para achar o ETag)"""
+        try:
+            return jwt.decode(token, options={"verify_signature": False}).get("oid")
+        except Exception:
+            return None
+
+    def _profile_request(self, token: str, select: Optional[List[str]], oid: Optional[str] = None):
+        """
+        Consulta o cache de perfis e monta a requisição GET /me se necessário
+
+        Só um `oid` confiável (claims do id_token no login ou token com
+        assinatura verificada) pode servir o perfil direto do cache. Com um
+        `oid` não verificado (ex.: token de audiência Graph) o cache só
+        fornece o ETag: a requisição sempre vai ao Graph, que autentica o
+        token antes de responder 304.
+        """
+        cache = get_profile_cache()
+        oid = oid or self._user_oid(token)
+        trusted = oid is not None
+        if not trusted:
+            oid = self._unverified_oid(token)
+        cache_key = (oid, tuple(select) if select else None) if oid else None
+
+        cached, etag, fresh = None, None, False
+        if cache_key:
+            cached, etag, fresh = cache.lookup(cache_key)
+        fresh = fresh and trusted
+        if not trusted and cached is not None and not etag:
+            cached = None  # sem ETag não há como o Graph confirmar a entrada
+
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+        if etag:
+            headers["If-None-Match"] = etag
+        params = {"$select": ",".join(select)} if select else None
+        return cache_key, cached, fresh, headers, params, trusted
+
+    @staticmethod
+    def _profile_result(response, cache_key, cached, trusted: bool) -> Optional[Dict[str, Any]]:
+        """Interpreta a resposta de GET /me (200, 304 ou erro) e atualiza o cache"""
+        cache = get_profile_cache()
+        if response.status_code == 304 and cached is not None:
+            cache.mark_revalidated(cache_key)
+            return cached
+
+        if response.status_code == 200:
+            user_data = response.json()
+            user_data['domain'] = user_data.get('userPrincipalName', '').split('@')[-1] if user_data.get('userPrincipalName') else ''
+            if cache_key and not trusted:
+                # oid não verificado: só o id devolvido pelo Graph indexa o cache
+                cache_key = (user_data["id"], cache_key[1]) if user_data.get("id") else None
+            if cache_key:
+                cache.put(cache_key, user_data, response.headers.get("ETag") or user_data.get("@odata.etag"))
+            return user_data
+
+        logger.error(f"Erro ao obter usuário: {response.status_code}")
+        return None
+
+    def get_user_info(self, token: str, select: Optional[List[str]] = None,
+                      oid: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Obtém informações do usuário via Microsoft Graph
+
+        O perfil é cacheado por `oid` e projeção `$select` (ver profile_cache);
+        entradas vencidas são revalidadas por ETag. Passe `oid` apenas de uma
+        fonte confiável (claims do id_token devolvidas pelo MSAL no login);
+        sem ele, tokens que não podem ser verificados localmente sempre vão
+        ao Graph.
+        """
+        try:
+            cache_key, cached, fresh, headers, params, trusted = self._profile_request(token, select, oid)
+            if fresh:
+                return cached
 
-            response = requests.get(
+            response = self.transport.get(
                 "https://graph.microsoft.com/v1.0/me",
                 headers=headers,
+                params=params,
                 timeout=10
             )
-
-            if response.status_code == 200:
-                user_data = response.json()
-                user_data['domain'] = user_data.get('userPrincipalName', '').split('@')[-1] if user_data.get('userPrincipalName') else ''
-                return user_data
-            else:
-                logger.error(f"Erro ao obter usuário: {response.status_code}")
-                return None
+            return self._profile_result(response, cache_key, cached, trusted)
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Erro de rede: {e}")
@@ -358,26 +551,138 @@ class MicrosoftAuth:
             logger.error(f"Erro inesperado: {e}")
             return None
 
-    def validate_token(self, token: str) -> bool:
-        """Valida se o token ainda é válido"""
+    async def get_user_info_async(self, token: str, select: Optional[List[str]] = None,
+                                  oid: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Versão asyncio de get_user_info (httpx, mesmo cache de perfis)"""
         try:
-            headers = {"Authorization": f"Bearer {token}"}
-            response = requests.get(
+            cache_key, cached, fresh, headers, params, trusted = self._profile_request(token, select, oid)
+            if fresh:
+                return cached
+
+            response = await get_async_client().get(
                 "https://graph.microsoft.com/v1.0/me",
                 headers=headers,
-                timeout=5
+                params=params,
+                timeout=10
             )
-            return response.status_code == 200
-        except:
-            return False
+            return self._profile_result(response, cache_key, cached, trusted)
+
+        except Exception as e:
+            logger.error(f"Erro ao obter usuário (async): {e}")
+            return None
+
+    async def refresh_access_token_async(self, refresh_token: str,
+                                         home_account_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Versão asyncio de refresh_access_token. O MSAL é síncrono, então a
+        renovação roda no executor padrão sem bloquear o event loop; o cache
+        de tokens é o mesmo do caminho síncrono.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.refresh_access_token, refresh_token, home_account_id)
+
+    def _validator(self):
+        """Validador com assinatura verificada para tokens emitidos para este app"""
+        return get_token_validator(self.tenant_id, (self.client_id,))
+
+    def validate_token(self, token: str) -> bool:
+        """
+        Valida se o token ainda é válido (localmente, sem chamar o Graph)
+
+        Tokens emitidos para este app (aud = client id) têm a assinatura
+        verificada. Access tokens do Graph não podem ser verificados por
+        terceiros: para eles só exp/nbf/aud/iss são conferidos, então esta
+        função NÃO detecta tokens do Graph revogados ou forjados e não serve
+        como prova de identidade. Para isso use get_user_info (o Graph
+        autentica o token).
+        """
+        validator = self._validator()
+        if validator.is_unverifiable(token):
+            try:
+                validator.check_claims(token)
+                return True
+            except jwt.PyJWTError:
+                return False
+        return validator.is_valid(token)
 
 
 class AuthManager:
     """Gerenciador de estado de autenticação para Streamlit"""
 
+    # Intervalo mínimo entre gravações de "último acesso" no session store
+    TOUCH_INTERVAL = 60
+
+    # Cookie com o id da sessão no servidor (nunca vai para a URL)
+    SESSION_COOKIE = "st_auth_sid"
+
+    @staticmethod
+    def _session_store():
+        """Store de sessões configurado em [auth] (session_store, session_store_path)"""
+        auth_config = st.secrets.get("auth", {})
+        return get_session_store(
+            auth_config.get("session_store", "memory"),
+            auth_config.get("session_store_path"),
+            float(auth_config.get("session_idle_timeout", 8 * 3600))
+        )
+
+    @staticmethod
+    def _token_cache():
+        """Cache MSAL configurado em [auth] (o mesmo objeto usado por MicrosoftAuth)"""
+        auth_config = st.secrets.get("auth", {})
+        return get_token_cache(auth_config.get("token_cache", "memory"), auth_config.get("token_cache_path"))
+
+    @staticmethod
+    def _attach(record: SessionRecord):
+        """Liga o session_state a um SessionRecord (login ou retomada)"""
+        store = AuthManager._session_store()
+        record.tokens.on_swap = lambda _: store.update(record)
+        st.session_state.session_record = record
+        st.session_state.authenticated = True
+        st.session_state.user_info = record.user
+        st.session_state.tokens = record.tokens
+        AuthManager._sync_session(record.tokens.current)
+
+    @staticmethod
+    def _write_session_cookie(sid: Optional[str], max_age: float = 0):
+        """
+        Grava (ou apaga, com sid=None) o cookie da sessão no navegador
+
+        O Streamlit só expõe cookies para leitura (st.context.cookies); a
+        gravação é feita por um script em um componente de altura zero.
+        """
+        value = json.dumps(sid or "")
+        script = (
+            "<script>"
+            f"var c = '{AuthManager.SESSION_COOKIE}=' + encodeURIComponent({value})"
+            f" + '; Path=/; Max-Age={int(max_age) if sid else 0}; SameSite=Strict';"
+            "if (window.parent.location.protocol === 'https:') c += '; Secure';"
+            "window.parent.document.cookie = c;"
+            "</script>"
+        )
+        components.html(script, height=0)
+
+    @staticmethod
+    def _resume_session():
+        """Retoma a sessão do cookie (ex.: após o websocket cair) e troca o id"""
+        if "sid" in st.query_params:
+            # Links antigos com ?sid=: o id na URL nunca é aceito
+            del st.query_params["sid"]
+        sid = st.context.cookies.get(AuthManager.SESSION_COOKIE)
+        if not sid:
+            return
+        store = AuthManager._session_store()
+        record = store.get(sid)
+        if record is None:
+            AuthManager._write_session_cookie(None)
+            return
+        store.rotate(record)
+        AuthManager._attach(record)
+        AuthManager._write_session_cookie(record.sid, store.idle_timeout)
+        logger.info(f"Sessão de {record.user.get('displayName')} retomada")
+
     @staticmethod
     def init_session_state():
-        """Inicializar estado da sessão"""
+        """Inicializar estado da sessão (retomando a sessão do servidor, se houver)"""
         if "authenticated" not in st.session_state:
             st.session_state.authenticated = False
         if "user_info" not in st.session_state:
@@ -388,31 +693,67 @@ class AuthManager:
             st.session_state.refresh_token = None
         if "token_expiry" not in st.session_state:
             st.session_state.token_expiry = None
+        if "home_account_id" not in st.session_state:
+            st.session_state.home_account_id = None
+        if "tokens" not in st.session_state:
+            st.session_state.tokens = None  # SessionTokens (renovado em segundo plano)
+        if "session_record" not in st.session_state:
+            st.session_state.session_record = None
         if "login_attempts" not in st.session_state:
             st.session_state.login_attempts = 0
 
+        record = st.session_state.session_record
+        if record is None:
+            AuthManager._resume_session()
+        elif time.time() - record.last_seen > AuthManager.TOUCH_INTERVAL:
+            AuthManager._session_store().touch(record)
+
     @staticmethod
-    def login(user_info: Dict[str, Any], token: str, refresh_token: str = None, expires_in: int = 3600):
-        """Realizar login do usuário"""
-        import datetime
-        st.session_state.authenticated = True
-        st.session_state.user_info = user_info
-        st.session_state.token = token
-        st.session_state.refresh_token = refresh_token
-        st.session_state.token_expiry = datetime.datetime.now() + datetime.timedelta(seconds=expires_in)
+    def login(user_info: Dict[str, Any], token: str, refresh_token: str = None, expires_in: int = 3600,
+              home_account_id: str = None):
+        """Realizar login do usuário (cria a sessão no servidor e grava o id no cookie)"""
+        record = SessionRecord(
+            new_session_id(),
+            compact_profile(user_info),
+            SessionTokens(TokenSet(token, refresh_token, time.time() + expires_in, home_account_id))
+        )
+        store = AuthManager._session_store()
+        store.put(record)
+        AuthManager._attach(record)
+        AuthManager._write_session_cookie(record.sid, store.idle_timeout)
         st.session_state.login_attempts = 0
         logger.info(f"Usuário {user_info.get('displayName')} fez login")
 
     @staticmethod
-    def logout():
-        """Realizar logout do usuário"""
+    def logout(auth: 'MicrosoftAuth' = None):
+        """Realizar logout do usuário (remove também os tokens do cache MSAL)"""
         user_name = st.session_state.user_info.get('displayName') if st.session_state.user_info else 'Unknown'
         logger.info(f"Usuário {user_name} fez logout")
 
+        tokens = st.session_state.get("tokens")
+        home_account_id = st.session_state.get("home_account_id") or (
+            tokens.current.home_account_id if tokens is not None else None)
+        if home_account_id:
+            if auth is not None:
+                auth.forget_user(home_account_id)
+            else:
+                AuthManager._token_cache().forget_partition(home_account_id)
+
+        if tokens is not None:
+            get_token_refresher().untrack(tokens)
+
+        record = st.session_state.get("session_record")
+        if record is not None:
+            AuthManager._session_store().delete(record.sid)
+        AuthManager._write_session_cookie(None)
+
         st.session_state.authenticated = False
         st.session_state.user_info = None
         st.session_state.token = None
         st.session_state.refresh_token = None
+        st.session_state.home_account_id = None
+        st.session_state.tokens = None
+        st.session_state.session_record = None
         st.session_state.login_attempts = 0
 
     @staticmethod
@@ -434,7 +775,10 @@ class AuthManager:
 
     @staticmethod
     def get_token() -> Optional[str]:
-        """Obter token atual"""
+        """Obter token atual (já renovado em segundo plano, se for o caso)"""
+        tokens = st.session_state.get("tokens")
+        if tokens is not None:
+            return tokens.current.access_token
         return st.session_state.get("token")
 
     @staticmethod
@@ -448,39 +792,44 @@ class AuthManager:
         return st.session_state.get("login_attempts", 0)
 
     @staticmethod
-    def check_and_refresh_token(auth: 'MicrosoftAuth') -> bool:
-        """Verifica e renova token se necessário"""
+    def _sync_session(current: TokenSet):
+        """Espelha o TokenSet atual nas chaves legadas do session_state"""
         import datetime
+        st.session_state.token = current.access_token
+        st.session_state.refresh_token = current.refresh_token
+        st.session_state.home_account_id = current.home_account_id
+        st.session_state.token_expiry = datetime.datetime.fromtimestamp(current.expires_at)
 
+    @staticmethod
+    def check_and_refresh_token(auth: 'MicrosoftAuth') -> bool:
+        """
+        Garante que a sessão tenha um token válido.
+
+        A renovação normal acontece em segundo plano (token_refresher), antes
+        do vencimento; aqui só se registra a sessão no refresher e se copia o
+        token atual. O rerun só bloqueia se o token já estiver vencendo (ex.:
+        o refresher falhou ou o processo ficou suspenso).
+        """
         if not AuthManager.is_authenticated():
             return False
 
-        refresh_token = st.session_state.get("refresh_token")
-        if not refresh_token:
-            return True
-
-        token_expiry = st.session_state.get("token_expiry")
-        if not token_expiry:
+        tokens = st.session_state.get("tokens")
+        if tokens is None or not tokens.current.refresh_token:
             return True
 
-        time_until_expiry = token_expiry - datetime.datetime.now()
-        if time_until_expiry.total_seconds() < 300:  # 5 minutos
-            logger.info(f"Token expira em {time_until_expiry.total_seconds():.0f}s. Renovando...")
+        refresher = get_token_refresher()
+        refresher.track(tokens, auth.refresh_access_token)
 
-            new_token_data = auth.refresh_access_token(refresh_token)
-            if new_token_data:
-                st.session_state.token = new_token_data["access_token"]
-                st.session_state.refresh_token = new_token_data.get("refresh_token", refresh_token)
-                st.session_state.token_expiry = datetime.datetime.now() + datetime.timedelta(
-                    seconds=new_token_data.get("expires_in", 3600)
-                )
-                logger.info("Token renovado com sucesso!")
-                return True
-            else:
+        remaining = tokens.current.expires_in()
+        if remaining < 60:
+            logger.info(f"Token expira em {remaining:.0f}s. Renovando...")
+            if not refresher.refresh(tokens):
                 logger.error("Falha ao renovar token")
-                AuthManager.logout()
+                AuthManager.logout(auth)
                 return False
+            logger.info("Token renovado com sucesso!")
 
+        AuthManager._sync_session(tokens.current)
         return True
 
 
@@ -507,6 +856,76 @@ LOGIN_CONFIG = {
 }
 
 
+def _attempts_state(attempts: int) -> int:
+    """Estados distintos do alerta de tentativas (0, 1, 2 e 3+)"""
+    return min(attempts, 3)
+
+
+# (hash do config, estado das tentativas) -> (HTML antes da URL, HTML depois)
+_login_templates: Dict[tuple, tuple] = {}
+_LOGIN_TEMPLATES_MAX = 64
+
+
+def _build_login_template(config: dict, attempts_state: int):
+    """HTML do card de login dividido em (antes, depois) da URL de login"""
+
+    # Highlights HTML - tudo em uma linha para evitar quebras no Streamlit
+    highlights_items = "".join(
+        f'<div class="highlight-item"><div class="highlight-icon">{h["icon"]}</div><div class="highlight-text"><strong>{h["title"]}</strong><p>{h["description"]}</p></div></div>'
+        for h in config.get("highlights", [])
+    )
+    highlights_html = f'<div class="login-highlights">{highlights_items}</div>'
+
+    # Alerta de tentativas
+    attempts_html = ""
+    if attempts_state >= 3:
+        attempts_html = '<div class="login-alert danger">Muitas tentativas detectadas. Atualize a página.</div>'
+    elif attempts_state > 0:
+        attempts_html = f'<div class="login-alert">Tentativa {attempts_state} registrada.</div>'
+
+    # Construir HTML final - tudo junto para evitar quebras no Streamlit
+    head = f'<div class="login-wrapper"><div class="login-inner"><div class="login-card"><div class="login-logo-placeholder">Bem-vindo!</div><h1 class="login-title">{config.get("title", "Aplicação")}</h1><p class="login-subtitle">{config.get("subtitle", "")}</p>{highlights_html}{attempts_html}<a class="login-button" href="'
+    tail = f'"><span>Entrar com Microsoft</span><span class="login-button-icon">&rarr;</span></a><div class="login-meta"><span class="login-badge">{config.get("badge_text", "Acesso Restrito")}</span><p>Use sua conta corporativa <strong>{config.get("email_domain", "")}</strong> para continuar.</p></div><div class="login-help"><p>Problemas no login? Limpe o cache do navegador ou procure suporte.</p></div></div></div></div>'
+    return head, tail
+
+
+# id(config) -> (config, ids dos valores, hash do conteúdo)
+_config_digests: Dict[int, tuple] = {}
+
+
+def _config_digest(config: dict) -> str:
+    """
+    Hash do conteúdo do config, calculado uma vez por objeto: serializar e
+    hashear a cada rerun custava mais do que montar o card. Reatribuir uma
+    chave (config["title"] = ...) recalcula; alterações aninhadas (ex.:
+    highlights.append) exigem um novo dict.
+    """
+    values = tuple(map(id, config.values()))
+    entry = _config_digests.get(id(config))
+    if entry is not None and entry[0] is config and entry[1] == values:
+        return entry[2]
+    config_json = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha1(config_json.encode("utf-8")).hexdigest()
+    if len(_config_digests) >= _LOGIN_TEMPLATES_MAX:
+        _config_digests.clear()
+    _config_digests[id(config)] = (config, values, digest)
+    return digest
+
+
+def render_login_card(config: dict, attempts: int, login_url: str) -> str:
+    """HTML do card de login; só a URL (escapada) muda entre requisições"""
+    key = (_config_digest(config), _attempts_state(attempts))
+    template = _login_templates.get(key)
+    if template is None:
+        # Em picos de login o template é montado uma vez; cada rerun só concatena a URL
+        template = _build_login_template(config, key[1])
+        if len(_login_templates) >= _LOGIN_TEMPLATES_MAX:
+            _login_templates.clear()
+        _login_templates[key] = template
+    head, tail = template
+    return head + escape(login_url, quote=True) + tail
+
+
 def create_login_page(auth: MicrosoftAuth, config: dict = None) -> bool:
     """
     Criar página de login Microsoft
@@ -531,20 +950,21 @@ def create_login_page(auth: MicrosoftAuth, config: dict = None) -> bool:
 
     if "code" in query_params:
         with st.spinner("🔄 Autenticando..."):
-            code = query_params["code"]
-            token_data = auth.get_token_from_code(code)
+            token_data = auth.get_token_from_auth_response(query_params.to_dict())
 
             if token_data and token_data.get("access_token"):
                 access_token = token_data["access_token"]
                 refresh_token = token_data.get("refresh_token")
                 expires_in = token_data.get("expires_in", 3600)
+                home_account_id = token_data.get("home_account_id")
 
-                user_info = auth.get_user_info(access_token)
+                user_info = auth.get_user_info(access_token, oid=token_data.get("oid"))
                 if user_info:
-                    AuthManager.login(user_info, access_token, refresh_token, expires_in)
+                    # Remove code/state da URL antes de abrir a sessão
+                    st.query_params.clear()
+                    AuthManager.login(user_info, access_token, refresh_token, expires_in, home_account_id)
                     st.success("✅ Login realizado com sucesso!")
                     st.balloons()
-                    st.query_params.clear()
                     return True
 
                 AuthManager.increment_login_attempts()
@@ -563,29 +983,14 @@ def create_login_page(auth: MicrosoftAuth, config: dict = None) -> bool:
         error_description = query_params.get("error_description", "Erro desconhecido")
         st.error(f"❌ Erro de autenticação: {error}")
         st.warning(f"Detalhes: {error_description}")
+        auth.discard_login_flow(query_params.get("state"))
         st.query_params.clear()
 
-    # Gerar página de login
-    raw_login_url = auth.get_login_url()
-    login_url = escape(raw_login_url, quote=True)
-
-    # Highlights HTML - tudo em uma linha para evitar quebras no Streamlit
-    highlights_items = ""
-    for h in config.get("highlights", []):
-        highlights_items += f'<div class="highlight-item"><div class="highlight-icon">{h["icon"]}</div><div class="highlight-text"><strong>{h["title"]}</strong><p>{h["description"]}</p></div></div>'
-    highlights_html = f'<div class="login-highlights">{highlights_items}</div>'
-
-    # Alerta de tentativas
-    attempts = AuthManager.get_login_attempts()
-    attempts_html = ""
-    if attempts >= 3:
-        attempts_html = '<div class="login-alert danger">Muitas tentativas detectadas. Atualize a página.</div>'
-    elif attempts > 0:
-        attempts_html = f'<div class="login-alert">Tentativa {attempts} registrada.</div>'
-
-    # Construir HTML final - tudo junto para evitar quebras no Streamlit
-    html_content = f'<div class="login-wrapper"><div class="login-inner"><div class="login-card"><div class="login-logo-placeholder">Bem-vindo!</div><h1 class="login-title">{config.get("title", "Aplicação")}</h1><p class="login-subtitle">{config.get("subtitle", "")}</p>{highlights_html}{attempts_html}<a class="login-button" href="{login_url}"><span>Entrar com Microsoft</span><span class="login-button-icon">&rarr;</span></a><div class="login-meta"><span class="login-badge">{config.get("badge_text", "Acesso Restrito")}</span><p>Use sua conta corporativa <strong>{config.get("email_domain", "")}</strong> para continuar.</p></div><div class="login-help"><p>Problemas no login? Limpe o cache do navegador ou procure suporte.</p></div></div></div></div>'
-
+    # Gerar página de login (template memoizado, só a URL muda). O fluxo
+    # pendente da sessão é reaproveitado entre reruns
+    flow = auth.start_login_flow(st.session_state.get("login_state"))
+    st.session_state.login_state = flow["state"]
+    html_content = render_login_card(config, AuthManager.get_login_attempts(), flow["auth_uri"])
     st.markdown(html_content, unsafe_allow_html=True)
     return False
 
@@ -0,0 +1,124 @@
+"""
+Benchmark: download em um fluxo vs download_parallel (HTTP Range)
+
+Sobe um servidor local que imita o Graph + SharePoint: metadados com
+downloadUrl e uma downloadUrl que aceita Range. Cada conexão é limitada a
+`--rate` MiB/s, como a vazão por conexão do SharePoint, que é o que o
+download paralelo contorna.
+
+Uso:
+    python benchmarks/bench_download_parallel.py [--size-mb 64] [--rate 25] [--workers 2 4 8]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_http import HttpTransport  # noqa: E402
+from graph_throttle import RetryPolicy  # noqa: E402
+from sp_connector import SPConnector  # noqa: E402
+from sp_index import PathIndex  # noqa: E402
+
+FILE_NAME = "big.bin"
+WRITE_CHUNK = 64 * 1024
+
+
+class FakeTokens:
+    def token(self):
+        return "token"
+
+
+def make_handler(content: bytes, rate: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _send(self, status: int, body: bytes, headers=None, throttle=False):
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if not throttle:
+                self.wfile.write(body)
+                return
+            # Vazão limitada por conexão
+            start = time.perf_counter()
+            for offset in range(0, len(body), WRITE_CHUNK):
+                self.wfile.write(body[offset:offset + WRITE_CHUNK])
+                ahead = (offset + WRITE_CHUNK) / rate - (time.perf_counter() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        def do_GET(self):
+            host = f"http://{self.headers['Host']}"
+            if self.path.startswith("/dl/"):
+                match = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range") or "")
+                if not match:
+                    return self._send(200, content, throttle=True)
+                start, end = int(match.group(1)), min(int(match.group(2)), len(content) - 1)
+                return self._send(206, content[start:end + 1], throttle=True, headers={
+                    "Content-Range": f"bytes {start}-{end}/{len(content)}"})
+            if self.path.split("?")[0].endswith("/content"):
+                return self._send(200, content, throttle=True)
+            item = {"id": "BIG", "name": FILE_NAME, "size": len(content),
+                    "parentReference": {"path": "/drive/root:"},
+                    "@microsoft.graph.downloadUrl": f"{host}/dl/{FILE_NAME}"}
+            self._send(200, json.dumps(item).encode(), headers={"Content-Type": "application/json"})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def timed(label: str, fn, expected: bytes):
+    start = time.perf_counter()
+    data = fn()
+    elapsed = time.perf_counter() - start
+    assert bytes(data) == expected, f"{label}: conteúdo divergente"
+    mib = len(expected) / 1024 / 1024
+    print(f"{label:<28} {elapsed:6.2f} s   {mib / elapsed:7.1f} MiB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--rate", type=float, default=25, help="MiB/s por conexão")
+    parser.add_argument("--range-mb", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    args = parser.parse_args()
+
+    content = os.urandom(args.size_mb * 1024 * 1024)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(content, args.rate * 1024 * 1024))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    transport = HttpTransport(retry_status=False)
+    sp = SPConnector("tenant", "client", "secret", user_upn="bench@example.com",
+                     transport=transport, retry_policy=RetryPolicy(), path_index=PathIndex(),
+                     token_provider=FakeTokens())
+    sp._drive_url = lambda: f"{base}/drive"  # aponta o conector para o servidor local
+
+    try:
+        print(f"{args.size_mb} MiB, {args.rate:g} MiB/s por conexão, ranges de {args.range_mb} MiB")
+        timed("download (1 fluxo)", lambda: sp.download(FILE_NAME), content)
+        for workers in args.workers:
+            timed(f"download_parallel x{workers}",
+                  lambda: sp.download_parallel(FILE_NAME, range_size=args.range_mb * 1024 * 1024,
+                                               max_workers=workers),
+                  content)
+    finally:
+        transport.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: engines de leitura de Excel no SPConnector
+
+Gera pastas de trabalho com ~10 mil, 100 mil e 1 milhão de células (10
+colunas, mais uma aba pequena "Resumo") e mede, para cada engine
+disponível (openpyxl e calamine):
+  - read_excel: aba principal inteira
+  - read_sheet com usecols: projeção de 2 colunas
+  - list_sheets e read_sheet("Resumo"): abas sem ler a aba grande
+
+O download é trocado por uma cópia do arquivo local, então só a leitura
+é medida.
+
+Uso:
+    python benchmarks/bench_excel_engines.py [--cells 10000 100000 1000000] [--repeat 3]
+
+Requer openpyxl (pip install openpyxl); calamine é medido se instalado
+(pip install python-calamine).
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sp_connector import SPConnector, detect_excel_engine  # noqa: E402
+
+COLUMNS = 10
+
+
+class FakeTokens:
+    def token(self):
+        return "token"
+
+
+def make_workbook(path: str, cells: int):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ImportError("O benchmark requer openpyxl: pip install openpyxl")
+
+    # Sem write_only: o modo write-only não grava <dimension>, e o openpyxl
+    # em read-only varreria a aba inteira para descobrir o tamanho (arquivos
+    # salvos pelo Excel trazem <dimension>)
+    book = Workbook()
+    sheet = book.active
+    sheet.title = "Dados"
+    sheet.append([f"col{i}" for i in range(COLUMNS)])
+    for row in range(cells // COLUMNS):
+        sheet.append([row, row * 0.5, f"item {row}", row % 7, "SP", row * 3, row / 3, "x" * 8, row % 2, row])
+    summary = book.create_sheet("Resumo")
+    summary.append(["linhas", "colunas"])
+    summary.append([cells // COLUMNS, COLUMNS])
+    book.save(path)
+
+
+def connector(engine: str, local: str) -> SPConnector:
+    sp = SPConnector("tenant", "client", "secret", user_upn="bench@example.com",
+                     transport=object(), token_provider=FakeTokens(), excel_engine=engine)
+
+    def download_to(path, fh, chunk_size=None):
+        with open(local, "rb") as src:
+            shutil.copyfileobj(src, fh)
+
+    sp.download_to = download_to
+    return sp
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cells", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    engines = ["openpyxl"] + (["calamine"] if detect_excel_engine() == "calamine" else [])
+    if len(engines) == 1:
+        print("python-calamine não instalado: medindo só openpyxl")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for cells in args.cells:
+            local = os.path.join(directory, f"bench_{cells}.xlsx")
+            start = time.perf_counter()
+            make_workbook(local, cells)
+            size_mb = os.path.getsize(local) / 1024 / 1024
+            print(f"\n{cells:,} células ({size_mb:.1f} MB, gerado em {time.perf_counter() - start:.1f} s)")
+            print(f"{'engine':<10} {'read_excel':>12} {'usecols=2':>12} {'list_sheets':>12} {'aba Resumo':>12}")
+            for engine in engines:
+                sp = connector(engine, local)
+                row = [
+                    best_of(lambda: sp.read_excel("bench.xlsx", sheet_name="Dados"), args.repeat),
+                    best_of(lambda: sp.read_sheet("bench.xlsx", "Dados", usecols=[0, 2]), args.repeat),
+                    best_of(lambda: sp.list_sheets("bench.xlsx"), args.repeat),
+                    best_of(lambda: sp.read_sheet("bench.xlsx", "Resumo"), args.repeat),
+                ]
+                print(f"{engine:<10} " + " ".join(f"{t * 1000:10.1f}ms" for t in row))
+
+
+if __name__ == "__main__":
+    main()
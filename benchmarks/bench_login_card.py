@@ -0,0 +1,54 @@
+"""
+Benchmark: tempo de renderização do card de login por requisição
+
+Compara, para o LOGIN_CONFIG padrão e um config com 50 highlights:
+  - sem cache: monta o HTML inteiro a cada rerun (comportamento anterior)
+  - render_login_card: template memoizado, só a URL de login é inserida
+
+Uso:
+    python benchmarks/bench_login_card.py [--number 20000]
+"""
+
+import argparse
+import os
+import secrets
+import sys
+import timeit
+from html import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth_microsoft import (  # noqa: E402
+    LOGIN_CONFIG,
+    _attempts_state,
+    _build_login_template,
+    render_login_card,
+)
+
+LOGIN_URL = ("https://login.microsoftonline.com/tenant/oauth2/v2.0/authorize?client_id=client"
+             f"&response_type=code&state={secrets.token_urlsafe(24)}&code_challenge={secrets.token_urlsafe(32)}")
+
+
+def render_uncached(config: dict, attempts: int, login_url: str) -> str:
+    head, tail = _build_login_template(config, _attempts_state(attempts))
+    return head + escape(login_url, quote=True) + tail
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    large = dict(LOGIN_CONFIG, highlights=[
+        {"icon": "✅", "title": f"Recurso {i}", "description": "Descrição do recurso " * 3} for i in range(50)
+    ])
+    for label, config in (("LOGIN_CONFIG", LOGIN_CONFIG), ("50 highlights", large)):
+        assert render_uncached(config, 1, LOGIN_URL) == render_login_card(config, 1, LOGIN_URL)
+        print(label)
+        for name, fn in (("sem cache", render_uncached), ("render_login_card", render_login_card)):
+            seconds = min(timeit.repeat(lambda: fn(config, 1, LOGIN_URL), number=args.number, repeat=3))
+            print(f"  {name:<20} {seconds / args.number * 1e6:8.2f} µs/requisição")
+
+
+if __name__ == "__main__":
+    main()
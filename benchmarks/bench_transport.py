@@ -0,0 +1,134 @@
+"""
+Benchmark: latência por chamada com e sem o transporte compartilhado
+
+Sobe um servidor HTTPS local (certificado autoassinado gerado na hora) que
+faz as vezes do Graph e compara:
+  - antes:  requests.get por chamada (nova conexão TCP + handshake TLS)
+  - depois: HttpTransport (Session com pool keep-alive)
+
+Uso:
+    python benchmarks/bench_transport.py [--calls 500]
+
+Requer cryptography (para gerar o certificado): pip install cryptography
+"""
+
+import argparse
+import datetime
+import ipaddress
+import json
+import os
+import ssl
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_http import HttpTransport  # noqa: E402
+
+BODY = json.dumps({"id": "00000000-0000-0000-0000-000000000000", "displayName": "Ana"}).encode()
+
+
+def make_certificate(directory: str):
+    """Gera (cert.pem, key.pem) autoassinados para 127.0.0.1/localhost"""
+    try:
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.x509.oid import NameOID
+    except ImportError:
+        raise ImportError("O benchmark requer cryptography: pip install cryptography")
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([
+            x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as fh:
+        fh.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as fh:
+        fh.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                   serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # sem atraso de ACK entre cabeçalhos e corpo
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(cert_path: str, key_path: str):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(get, calls: int):
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        r = get()
+        r.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label: str, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<28} média {statistics.mean(latencies):7.2f} ms   "
+          f"p50 {statistics.median(latencies):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = make_certificate(directory)
+        server = start_server(cert_path, key_path)
+        url = f"https://127.0.0.1:{server.server_address[1]}/v1.0/me"
+        transport = HttpTransport()
+        try:
+            print(f"{args.calls} GETs em {url}")
+            report("requests.get (antes)", measure(lambda: requests.get(url, verify=cert_path, timeout=10),
+                                                   args.calls))
+            report("HttpTransport (depois)", measure(lambda: transport.get(url, verify=cert_path),
+                                                     args.calls))
+        finally:
+            transport.close()
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
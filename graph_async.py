@@ -0,0 +1,73 @@
+"""
+Infraestrutura asyncio para chamadas ao Microsoft Graph (httpx)
+
+- get_async_client(): um httpx.AsyncClient por event loop, com pool de
+  conexões keep-alive e HTTP/1.1, reutilizado por todas as chamadas async.
+- run_sync(coro): ponte para o Streamlit. Executa a corrotina em um event
+  loop de fundo compartilhado pelo processo e bloqueia só a thread do script
+  até o resultado. Como o loop é único, o AsyncClient (e suas conexões) é
+  reaproveitado entre reruns e sessões.
+
+httpx é dependência opcional: instale com `pip install httpx`.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Optional
+
+try:
+    import httpx
+except ImportError:  # dependência opcional
+    httpx = None
+
+_lock = threading.Lock()
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Erros de transporte que a RetryPolicy deve tratar como falha retentável
+RETRY_EXCEPTIONS = (httpx.TransportError,) if httpx is not None else ()
+
+
+def _require_httpx():
+    if httpx is None:
+        raise ImportError("A API assíncrona requer httpx: pip install httpx")
+
+
+def get_async_client(max_connections: int = 100, max_keepalive: int = 20,
+                     connect_timeout: float = 5, read_timeout: float = 60) -> "httpx.AsyncClient":
+    """AsyncClient compartilhado pelo event loop em execução"""
+    _require_httpx()
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_keepalive),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                follow_redirects=True,
+            )
+            _clients[loop] = client
+        return client
+
+
+def background_loop() -> asyncio.AbstractEventLoop:
+    """Event loop de fundo (thread daemon) compartilhado pelo processo"""
+    global _loop
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="graph-async-loop", daemon=True)
+            thread.start()
+        return _loop
+
+
+def run_sync(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """
+    Executa uma corrotina a partir de código síncrono (ex.: script Streamlit)
+
+        dfs = run_sync(asp.read_csv_many(paths))
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, background_loop())
+    return future.result(timeout)
@@ -0,0 +1,120 @@
+"""
+JSON batching do Microsoft Graph ($batch)
+
+Agrupa até 20 sub-requisições por POST /$batch. Cada sub-resposta tem seu
+próprio status; as que voltam throttled (429/503) são reenviadas sozinhas em
+um novo lote, respeitando o maior Retry-After informado. Um 424 (dependência
+falhou) só é reenviado junto com a dependência que também será reenviada;
+se a dependência falhou de vez, o 424 é o resultado final.
+
+`dependsOn` é preservado dentro do lote. Uma dependência concluída com
+sucesso em um lote anterior é descartada (os lotes são enviados em ordem);
+se ela falhou, a sub-requisição dependente não é enviada e recebe um 424.
+"""
+
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+import requests
+
+MAX_BATCH_SIZE = 20
+RETRY_STATUSES = (429, 503)
+FAILED_DEPENDENCY = 424
+
+
+def _retry_after(sub_response: Dict[str, Any]) -> float:
+    headers = {k.lower(): v for k, v in (sub_response.get("headers") or {}).items()}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _succeeded(sub_response: Dict[str, Any]) -> bool:
+    return 200 <= (sub_response.get("status") or 0) < 300
+
+
+def _failed_dependency(request_id: str, dependency: str) -> Dict[str, Any]:
+    return {
+        "id": request_id,
+        "status": FAILED_DEPENDENCY,
+        "headers": {},
+        "body": {"error": {"code": "FailedDependency",
+                           "message": f"A dependência {dependency} não foi concluída"}},
+    }
+
+
+def execute_batch(post: Callable[[Dict[str, Any]], requests.Response],
+                  batch_requests: List[Dict[str, Any]], max_retries: int = 3,
+                  base_delay: float = 1.0, sleep: Callable[[float], None] = time.sleep
+                  ) -> List[Dict[str, Any]]:
+    """
+    Executa as sub-requisições em lotes de até 20 e retorna as sub-respostas
+    ({"id", "status", "headers", "body"}) na mesma ordem da entrada.
+
+    `post(payload)` envia o JSON do lote para /$batch e devolve a resposta.
+    Cada sub-requisição precisa de "id", "method" e "url" (relativa a /v1.0).
+    """
+    ids = [r["id"] for r in batch_requests]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Ids de sub-requisições do $batch devem ser únicos")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for start in range(0, len(batch_requests), MAX_BATCH_SIZE):
+        todo = batch_requests[start:start + MAX_BATCH_SIZE]
+        for attempt in range(max_retries + 1):
+            in_batch = {r["id"] for r in todo}
+            payload = []
+            for r in todo:
+                sub = dict(r)
+                deps = []
+                failed = None
+                for d in r.get("dependsOn", []):
+                    if d in in_batch:
+                        deps.append(d)
+                    elif d not in results or not _succeeded(results[d]):
+                        failed = d
+                if failed is not None:
+                    results[r["id"]] = _failed_dependency(r["id"], failed)
+                    in_batch.discard(r["id"])
+                    continue
+                if deps:
+                    sub["dependsOn"] = deps
+                else:
+                    sub.pop("dependsOn", None)
+                payload.append(sub)
+            if not payload:
+                break
+
+            response = post({"requests": payload})
+            response.raise_for_status()
+
+            responses = {sr["id"]: sr for sr in response.json().get("responses", [])}
+            retry_ids, wait = set(), 0.0
+            if attempt < max_retries:
+                for sub_response in responses.values():
+                    if sub_response.get("status") in RETRY_STATUSES:
+                        retry_ids.add(sub_response["id"])
+                        wait = max(wait, _retry_after(sub_response))
+                # 424 só volta junto com uma dependência que também será reenviada
+                deps_of = {r["id"]: r.get("dependsOn", []) for r in todo}
+                changed = True
+                while changed:
+                    changed = False
+                    for rid, sub_response in responses.items():
+                        if (sub_response.get("status") == FAILED_DEPENDENCY and rid not in retry_ids
+                                and any(d in retry_ids for d in deps_of.get(rid, []))):
+                            retry_ids.add(rid)
+                            changed = True
+
+            for rid, sub_response in responses.items():
+                if rid not in retry_ids:
+                    results[rid] = sub_response
+
+            if not retry_ids:
+                break
+            todo = [r for r in todo if r["id"] in retry_ids]
+            sleep(wait or random.uniform(0, base_delay * (2 ** attempt)))
+
+    return [results.get(i, {"id": i, "status": 0, "body": None}) for i in ids]
@@ -0,0 +1,118 @@
+"""
+Camada de transporte HTTP compartilhada para chamadas ao Microsoft Graph
+
+Um requests.Session por processo, com pool de conexões keep-alive, retries
+de conexão/5xx e timeouts configuráveis. MicrosoftAuth e SPConnector recebem
+o transporte por injeção (parâmetro `transport`) e, por padrão, usam um
+transporte global.
+
+Chamadas feitas sob a RetryPolicy (SPConnector) usam get_policy_transport(),
+que não repete por status nem por Retry-After: se o urllib3 repetisse o
+429/503 internamente, a política nunca veria o throttling (bucket do tenant
+sem pausa, semáforo preso durante as esperas, retries multiplicados).
+"""
+
+import threading
+from typing import Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+Timeout = Union[None, float, Tuple[float, float]]
+
+
+class HttpTransport:
+    """Session com pool de conexões reutilizáveis e política de retry do urllib3"""
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 32,
+                 max_retries: int = 3, backoff_factor: float = 0.5,
+                 connect_timeout: float = 5, read_timeout: float = 60,
+                 status_forcelist: Tuple[int, ...] = (500, 502, 504),
+                 retry_status: bool = True):
+        """
+        retry_status=False desliga os retries por status e por Retry-After
+        (só conexão/leitura são repetidas): use-o sob uma RetryPolicy.
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retry_status = retry_status
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries if retry_status else 0,
+            backoff_factor=backoff_factor,
+            status_forcelist=status_forcelist if retry_status else (),
+            allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}),
+            respect_retry_after_header=retry_status,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _timeout(self, timeout: Timeout) -> Tuple[float, float]:
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, (int, float)):
+            return (self.connect_timeout, timeout)
+        return timeout
+
+    def request(self, method: str, url: str, timeout: Timeout = None, **kw) -> requests.Response:
+        return self.session.request(method, url, timeout=self._timeout(timeout), **kw)
+
+    def get(self, url: str, **kw) -> requests.Response:
+        return self.request("GET", url, **kw)
+
+    def put(self, url: str, **kw) -> requests.Response:
+        return self.request("PUT", url, **kw)
+
+    def post(self, url: str, **kw) -> requests.Response:
+        return self.request("POST", url, **kw)
+
+    def close(self):
+        self.session.close()
+
+
+_lock = threading.Lock()
+_default_transport: Optional[HttpTransport] = None
+_policy_transport: Optional[HttpTransport] = None
+
+
+def get_default_transport() -> HttpTransport:
+    """Transporte compartilhado pelo processo (criado na primeira chamada)"""
+    global _default_transport
+    with _lock:
+        if _default_transport is None:
+            _default_transport = HttpTransport()
+        return _default_transport
+
+
+def get_policy_transport() -> HttpTransport:
+    """Transporte compartilhado para chamadas sob RetryPolicy (sem retries por status)"""
+    global _policy_transport
+    with _lock:
+        if _policy_transport is None:
+            _policy_transport = HttpTransport(retry_status=False)
+        return _policy_transport
+
+
+def configure_default_transport(**kw) -> HttpTransport:
+    """Substitui os transportes globais (ex.: pool maior em produção)"""
+    global _default_transport, _policy_transport
+    kw.pop("retry_status", None)
+    with _lock:
+        old = (_default_transport, _policy_transport)
+        _default_transport = HttpTransport(**kw)
+        _policy_transport = HttpTransport(retry_status=False, **kw)
+    for transport in old:
+        if transport is not None:
+            transport.close()
+    return _default_transport
@@ -0,0 +1,363 @@
+"""
+Política de retry e controle de vazão para o Microsoft Graph
+
+Sob carga o Graph responde 429/503 com `Retry-After`. A RetryPolicy:
+  - respeita Retry-After e, na falta dele, usa backoff exponencial com jitter;
+  - limita a vazão por tenant com um token bucket compartilhado, para que
+    sessões concorrentes não disparem em manada (e pausa o bucket inteiro
+    quando o Graph pede para esperar);
+  - abre um circuit breaker por tenant após falhas seguidas (5xx e erros de
+    transporte; throttling com Retry-After não conta como falha), rejeitando
+    chamadas até o tempo de recuperação e liberando então uma única sonda;
+  - limita o número de requisições simultâneas do processo (`max_concurrency`).
+    O semáforo cobre só o envio até a chegada dos cabeçalhos: o corpo de
+    respostas com stream=True é lido fora dele. Transferências inteiras são
+    limitadas pelos pools das APIs de múltiplos arquivos do SPConnector (e do
+    AsyncSPConnector), que usam o mesmo teto;
+  - registra métricas de retries, esperas e disparos do breaker.
+
+O envio é feito por uma função passada a execute(), então a política funciona
+com qualquer transporte (inclusive um servidor Graph falso local em testes).
+"""
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+
+
+class CircuitOpenError(RuntimeError):
+    """Circuit breaker aberto: chamadas ao Graph suspensas temporariamente"""
+
+
+class TokenBucket:
+    """Token bucket thread-safe (rate tokens/s, até `capacity` acumulados)"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def block_for(self, seconds: float):
+        """Suspende a emissão de tokens (ex.: Retry-After recebido)"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def try_acquire(self) -> float:
+        """Consome um token se houver; senão retorna quanto tempo esperar"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, sleep: Callable[[float], None] = time.sleep) -> float:
+        """Consome um token, esperando se preciso. Retorna o tempo esperado."""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return waited
+            sleep(wait)
+            waited += wait
+
+    async def acquire_async(self) -> float:
+        """Versão asyncio de acquire()"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+
+class CircuitBreaker:
+    """
+    Breaker clássico: closed -> open (após N falhas) -> half-open -> closed
+
+    Em half-open só uma chamada (a sonda) passa; as demais continuam
+    rejeitadas até a sonda terminar.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def release(self):
+        """A sonda terminou sem veredito (ex.: throttled): libera outra"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self.state = "closed"
+
+    def record_failure(self) -> bool:
+        """Registra uma falha; retorna True se o breaker abriu agora"""
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half_open" or (
+                self.state == "closed" and self._failures >= self.failure_threshold
+            ):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+class RetryMetrics:
+    """Contadores thread-safe da política"""
+
+    FIELDS = ("requests", "retries", "throttled", "retry_wait_seconds",
+              "rate_limit_wait_seconds", "breaker_trips", "breaker_rejections")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, field: str, value: float = 1):
+        with self._lock:
+            self._data[field] += value
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._data)
+
+
+def parse_retry_after(response: requests.Response) -> Optional[float]:
+    """Segundos pedidos em Retry-After (inteiro ou data HTTP), se houver"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Executa requisições com retry, rate limiting e circuit breaker por chave (tenant)"""
+
+    RETRY_STATUSES = (429, 503)
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 60,
+                 rate: float = 25, burst: float = 50,
+                 failure_threshold: int = 5, reset_timeout: float = 30,
+                 max_concurrency: int = 32,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate = rate
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_concurrency = max_concurrency
+        # Teto global de requisições em andamento. Vale só até a chegada dos
+        # cabeçalhos: segurar o semáforo até o fim de um corpo em stream
+        # dependeria de o chamador fechar a resposta, e um vazamento travaria
+        # o processo inteiro
+        self.concurrency = threading.BoundedSemaphore(max_concurrency)
+        self.sleep = sleep
+        self.metrics = RetryMetrics()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, key: str) -> TokenBucket:
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(self.rate, self.burst)
+            return self._buckets[key]
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[key]
+
+    def backoff(self, attempt: int) -> float:
+        """Backoff exponencial com full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def _failed(self, breaker: CircuitBreaker):
+        if breaker.record_failure():
+            self.metrics.add("breaker_trips")
+
+    def _wait(self, delay: float):
+        self._count_wait(delay)
+        self.sleep(delay)
+
+    def _count_wait(self, delay: float):
+        self.metrics.add("retries")
+        self.metrics.add("retry_wait_seconds", delay)
+
+    def _throttle_delay(self, response, attempt: int, bucket: TokenBucket) -> float:
+        """Registra uma resposta 429/503 e calcula a espera antes da próxima tentativa"""
+        retry_after = parse_retry_after(response)
+        if retry_after is not None:
+            # Pausa o tenant inteiro, não só esta chamada
+            bucket.block_for(retry_after)
+            return min(retry_after, self.max_delay)
+        return self.backoff(attempt)
+
+    def _settle(self, response, breaker: CircuitBreaker):
+        if response.status_code >= 500:
+            self._failed(breaker)
+        else:
+            breaker.record_success()
+
+    def _throttled(self, response, breaker: CircuitBreaker):
+        """
+        429, ou 503 com Retry-After, é o Graph pedindo para esperar, não uma
+        falha: não conta para o breaker. Um 503 sem Retry-After conta.
+        """
+        self.metrics.add("throttled")
+        if response.status_code == 503 and parse_retry_after(response) is None:
+            self._failed(breaker)
+        else:
+            breaker.release()
+
+    def execute(self, key: str, send: Callable[[], requests.Response]) -> requests.Response:
+        """
+        Chama `send()` até obter uma resposta não-throttled ou esgotar as
+        tentativas. A última resposta 429/503 é devolvida ao chamador.
+        """
+        bucket = self.bucket(key)
+        breaker = self.breaker(key)
+
+        for attempt in range(1, self.max_attempts + 1):
+            if not breaker.allow():
+                self.metrics.add("breaker_rejections")
+                raise CircuitOpenError(f"Circuit breaker aberto para {key}")
+
+            waited = bucket.acquire(self.sleep)
+            if waited:
+                self.metrics.add("rate_limit_wait_seconds", waited)
+
+            self.metrics.add("requests")
+            try:
+                with self.concurrency:
+                    response = send()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self._failed(breaker)
+                if attempt == self.max_attempts:
+                    raise
+                self._wait(self.backoff(attempt))
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+
+            if response.status_code in self.RETRY_STATUSES:
+                self._throttled(response, breaker)
+                if attempt == self.max_attempts:
+                    return response
+                delay = self._throttle_delay(response, attempt, bucket)
+                response.close()
+                self._wait(delay)
+                continue
+
+            self._settle(response, breaker)
+            return response
+
+        raise RuntimeError("RetryPolicy.execute: tentativas esgotadas")  # inalcançável
+
+    async def execute_async(self, key: str, send: Callable[[], Any],
+                            retry_exceptions: Tuple[type, ...] = ()) -> Any:
+        """
+        Versão asyncio de execute(): `send()` devolve uma corrotina (ex.: httpx).
+        Compartilha buckets, breakers e métricas com o caminho síncrono.
+        `retry_exceptions` são os erros de transporte do cliente async usado.
+        """
+        bucket = self.bucket(key)
+        breaker = self.breaker(key)
+
+        for attempt in range(1, self.max_attempts + 1):
+            if not breaker.allow():
+                self.metrics.add("breaker_rejections")
+                raise CircuitOpenError(f"Circuit breaker aberto para {key}")
+
+            waited = await bucket.acquire_async()
+            if waited:
+                self.metrics.add("rate_limit_wait_seconds", waited)
+
+            self.metrics.add("requests")
+            try:
+                response = await send()
+            except retry_exceptions:
+                self._failed(breaker)
+                if attempt == self.max_attempts:
+                    raise
+                delay = self.backoff(attempt)
+                self._count_wait(delay)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+
+            if response.status_code in self.RETRY_STATUSES:
+                self._throttled(response, breaker)
+                if attempt == self.max_attempts:
+                    return response
+                delay = self._throttle_delay(response, attempt, bucket)
+                self._count_wait(delay)
+                await asyncio.sleep(delay)
+                continue
+
+            self._settle(response, breaker)
+            return response
+
+        raise RuntimeError("RetryPolicy.execute_async: tentativas esgotadas")  # inalcançável
+
+
+_lock = threading.Lock()
+_default_policy: Optional[RetryPolicy] = None
+
+
+def get_default_policy() -> RetryPolicy:
+    """Política compartilhada pelo processo (buckets e breakers por tenant)"""
+    global _default_policy
+    with _lock:
+        if _default_policy is None:
+            _default_policy = RetryPolicy()
+        return _default_policy
@@ -0,0 +1,113 @@
+"""
+Token app-only (client credentials) compartilhado pelo processo
+
+Cada SPConnector pedia seu próprio token e guardava `_tok`/`_exp` por
+instância, sem lock. O AppTokenProvider mantém um único token por
+(tenant, client, credencial):
+  - leitura sem espera enquanto o token é válido;
+  - single-flight: chamadas concorrentes com o token vencido disparam uma
+    única requisição ao Azure AD, as demais aguardam o resultado;
+  - renovação proativa em uma thread de fundo `refresh_margin` segundos
+    antes do vencimento, para que nenhuma chamada ao Graph espere pelo token.
+    A margem padrão (+ skew) fica dentro da janela de 5 minutos em que o
+    MSAL deixa de servir o token do cache e pede um novo.
+
+A aplicação MSAL vem do msal_registry (uma por credencial no processo).
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import msal_registry
+
+logger = logging.getLogger(__name__)
+
+GRAPH_SCOPES = ["https://graph.microsoft.com/.default"]
+
+
+class AppTokenProvider:
+    """Token app-only thread-safe com renovação em segundo plano"""
+
+    def __init__(self, tenant_id: str, client_id: str, client_secret: str,
+                 scopes=None, refresh_margin: float = 180, skew: float = 60):
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.scopes = list(scopes or GRAPH_SCOPES)
+        self.refresh_margin = refresh_margin
+        self.skew = skew
+        self._app = msal_registry.get_confidential_app(
+            client_id,
+            f"https://login.microsoftonline.com/{tenant_id}",
+            client_secret,
+        )
+        # (token, vencimento) trocados juntos: leitores nunca veem um par misturado
+        self._current: Tuple[Optional[str], float] = (None, 0.0)
+        self._fetch_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self.fetches = 0
+
+    def token(self) -> str:
+        """Token válido; só bloqueia se ainda não houver um (ou se venceu)"""
+        tok, exp = self._current
+        if tok and time.time() < exp:
+            return tok
+        return self._refresh(force=False)
+
+    def _refresh(self, force: bool) -> str:
+        with self._fetch_lock:
+            # Quem esperou o lock reaproveita o token obtido por outra thread
+            tok, exp = self._current
+            now = time.time()
+            if not force and tok and now < exp:
+                return tok
+            res = self._app.acquire_token_for_client(scopes=self.scopes)
+            if "access_token" not in res:
+                raise RuntimeError(res.get("error_description") or res)
+            self.fetches += 1
+            exp = now + int(res.get("expires_in", 3600)) - self.skew
+            delay = exp - self.refresh_margin - now
+            if res["access_token"] == tok:
+                # O MSAL devolveu o token do próprio cache (ainda fora da janela
+                # de renovação dele): tenta de novo mais tarde, sem girar em falso
+                delay = max(delay, 30.0)
+            self._current = (res["access_token"], exp)
+            self._schedule(delay)
+            return res["access_token"]
+
+    def _schedule(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(max(delay, 1.0), self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            self._refresh(force=True)
+        except Exception as e:
+            # O token atual segue válido até vencer; a próxima chamada tenta de novo
+            logger.warning(f"Falha ao renovar token app-only em segundo plano: {e}")
+
+    def close(self):
+        """Cancela a renovação agendada"""
+        with self._fetch_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+_lock = threading.Lock()
+_providers: Dict[Tuple[str, str, str], AppTokenProvider] = {}
+
+
+def get_app_token_provider(tenant_id: str, client_id: str, client_secret: str) -> AppTokenProvider:
+    """Provider compartilhado por (tenant, client, credencial)"""
+    key = (tenant_id, client_id, msal_registry.credential_fingerprint(client_secret))
+    with _lock:
+        provider = _providers.get(key)
+        if provider is None:
+            provider = AppTokenProvider(tenant_id, client_id, client_secret)
+            _providers[key] = provider
+        return provider
@@ -0,0 +1,76 @@
+"""
+Registro de aplicações MSAL compartilhadas pelo processo
+
+Cada msal.ConfidentialClientApplication faz descoberta de authority/OpenID
+e monta sua própria pilha HTTP. Este módulo cria cada aplicação uma única vez
+por (client_id, authority, credencial) e a reutiliza em todas as sessões
+Streamlit do processo.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import msal
+
+_lock = threading.Lock()
+_apps: Dict[Tuple[str, str, str, int], msal.ConfidentialClientApplication] = {}
+
+# Cache HTTP do MSAL (instance discovery / metadados OpenID), compartilhado
+# entre todas as aplicações para que a descoberta ocorra uma vez por authority
+_http_cache: Dict[Any, Any] = {}
+
+_stats = {"apps_built": 0, "calls": 0}
+
+
+def credential_fingerprint(client_credential: Any) -> str:
+    """Impressão digital da credencial (nunca guardamos o segredo na chave)"""
+    if isinstance(client_credential, dict):
+        raw = json.dumps(client_credential, sort_keys=True)
+    else:
+        raw = str(client_credential or "")
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def get_confidential_app(client_id: str, authority: str, client_credential: Any,
+                         token_cache: Optional[msal.TokenCache] = None
+                         ) -> msal.ConfidentialClientApplication:
+    """
+    Retorna a ConfidentialClientApplication compartilhada para a combinação
+    (client_id, authority, credencial), criando-a na primeira chamada.
+    Um token_cache diferente resulta em outra aplicação.
+    """
+    key = (client_id, authority, credential_fingerprint(client_credential),
+           id(token_cache) if token_cache is not None else 0)
+    with _lock:
+        _stats["calls"] += 1
+        app = _apps.get(key)
+        if app is None:
+            app = msal.ConfidentialClientApplication(
+                client_id,
+                authority=authority,
+                client_credential=client_credential,
+                token_cache=token_cache,
+                http_cache=_http_cache,
+            )
+            _apps[key] = app
+            _stats["apps_built"] += 1
+        return app
+
+
+def get_stats() -> Dict[str, int]:
+    """Quantas aplicações foram construídas frente a quantas chamadas"""
+    with _lock:
+        return {
+            "apps_built": _stats["apps_built"],
+            "calls": _stats["calls"],
+            "apps_cached": len(_apps),
+        }
+
+
+def clear():
+    """Descarta todas as aplicações registradas (ex.: após trocar segredos)"""
+    with _lock:
+        _apps.clear()
+        _http_cache.clear()
@@ -0,0 +1,83 @@
+"""
+Cache TTL/LRU de perfis de usuário do Microsoft Graph
+
+Guarda o resultado de GET /me por object id do usuário (claim `oid`) e pela
+projeção `$select` pedida. Entradas vencidas que têm ETag são revalidadas com
+If-None-Match: um 304 renova a entrada sem transferir o perfil de novo.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class _Entry:
+    __slots__ = ("data", "etag", "fetched_at")
+
+    def __init__(self, data: Dict[str, Any], etag: Optional[str]):
+        self.data = data
+        self.etag = etag
+        self.fetched_at = time.time()
+
+
+class ProfileCache:
+    """LRU limitado com expiração por TTL e estatísticas de acerto"""
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0, "evictions": 0}
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[Dict[str, Any]], Optional[str], bool]:
+        """
+        Retorna (dados, etag, fresco). Se fresco, os dados podem ser usados
+        diretamente; caso contrário o etag (se houver) serve para revalidar.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None, None, False
+            self._data.move_to_end(key)
+            if time.time() - entry.fetched_at < self.ttl:
+                self._stats["hits"] += 1
+                return dict(entry.data), entry.etag, True
+            self._stats["misses"] += 1
+            return dict(entry.data), entry.etag, False
+
+    def put(self, key: Hashable, data: Dict[str, Any], etag: Optional[str] = None):
+        with self._lock:
+            self._data[key] = _Entry(dict(data), etag)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def mark_revalidated(self, key: Hashable):
+        """Servidor respondeu 304: a entrada volta a ser fresca"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                entry.fetched_at = time.time()
+                self._stats["revalidated"] += 1
+
+    def invalidate(self, oid: str):
+        """Remove todas as projeções cacheadas de um usuário"""
+        with self._lock:
+            for key in [k for k in self._data if isinstance(k, tuple) and k and k[0] == oid]:
+                del self._data[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, size=len(self._data))
+
+
+_default_cache = ProfileCache()
+
+
+def get_profile_cache() -> ProfileCache:
+    """Cache de perfis compartilhado pelo processo"""
+    return _default_cache
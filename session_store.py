@@ -0,0 +1,292 @@
+"""
+Sessões de login guardadas no servidor
+
+O session_state do Streamlit morre junto com o websocket: uma reconexão
+obrigava o usuário a refazer o login. Aqui cada login vira um SessionRecord
+compacto (`__slots__`, só os campos de perfil usados pela aplicação)
+guardado em um store plugável e indexado por um id opaco e aleatório. O
+navegador guarda apenas esse id, em um cookie (nunca na URL, onde vazaria
+por links, histórico, logs e Referer), e a reconexão retoma a sessão sem
+nova ida ao Azure AD. O id é trocado a cada retomada (rotate).
+
+Stores disponíveis:
+  - MemorySessionStore: LRU em memória, com limite de sessões (padrão)
+  - SQLiteSessionStore: tabela SQLite (sobrevive a restarts)
+  - RedisSessionStore:  qualquer cliente compatível com redis-py (Redis
+    local, fakeredis...), com expiração nativa por TTL
+
+Um reaper em thread de fundo remove sessões ociosas há mais de
+`idle_timeout` segundos.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from token_refresher import SessionTokens, TokenSet
+
+# Campos do perfil /me mantidos na sessão (o resto do dict é descartado)
+PROFILE_FIELDS = ("id", "displayName", "mail", "userPrincipalName", "jobTitle", "domain")
+
+
+def new_session_id() -> str:
+    """Id opaco (256 bits aleatórios, seguro para URL)"""
+    return secrets.token_urlsafe(32)
+
+
+def compact_profile(user_info: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: user_info[k] for k in PROFILE_FIELDS if user_info.get(k) is not None}
+
+
+class SessionRecord:
+    """Estado de uma sessão autenticada"""
+
+    __slots__ = ("sid", "user", "tokens", "created", "last_seen")
+
+    def __init__(self, sid: str, user: Dict[str, Any], tokens: SessionTokens,
+                 created: float = None, last_seen: float = None):
+        self.sid = sid
+        self.user = user
+        self.tokens = tokens
+        self.created = created or time.time()
+        self.last_seen = last_seen or self.created
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "user": self.user,
+            "tokens": list(self.tokens.current),
+            "created": self.created,
+            "last_seen": self.last_seen,
+        })
+
+    @classmethod
+    def from_json(cls, sid: str, blob: str) -> "SessionRecord":
+        data = json.loads(blob)
+        return cls(sid, data["user"], SessionTokens(TokenSet(*data["tokens"])),
+                   data["created"], data["last_seen"])
+
+
+# ============================================================================
+# STORES
+# ============================================================================
+class SessionStore:
+    """Interface de um store de sessões"""
+
+    def __init__(self, idle_timeout: float = 8 * 3600):
+        self.idle_timeout = idle_timeout
+        self._reaper: Optional[threading.Thread] = None
+
+    def get(self, sid: str) -> Optional[SessionRecord]:
+        raise NotImplementedError
+
+    def put(self, record: SessionRecord):
+        raise NotImplementedError
+
+    def delete(self, sid: str):
+        raise NotImplementedError
+
+    def update(self, record: SessionRecord) -> bool:
+        """
+        Regrava uma sessão existente; não recria um id já removido (logout,
+        rotate ou reaper). Retorna False se o id não existe mais.
+        """
+        raise NotImplementedError
+
+    def rotate(self, record: SessionRecord) -> SessionRecord:
+        """Troca o id da sessão; o id anterior deixa de valer"""
+        old = record.sid
+        record.sid = new_session_id()
+        self.put(record)
+        self.delete(old)
+        return record
+
+    def touch(self, record: SessionRecord):
+        """Atualiza o último acesso"""
+        record.last_seen = time.time()
+        self.update(record)
+
+    def reap(self) -> int:
+        """Remove sessões ociosas; retorna quantas foram removidas"""
+        return 0
+
+    def start_reaper(self, interval: float = 300):
+        """Inicia (uma vez) a thread que chama reap() periodicamente"""
+        if self._reaper is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reap()
+                except Exception:
+                    pass  # tenta de novo no próximo ciclo
+
+        self._reaper = threading.Thread(target=loop, name="session-reaper", daemon=True)
+        self._reaper.start()
+
+
+class MemorySessionStore(SessionStore):
+    """LRU em memória; a sessão menos usada sai quando `max_sessions` é excedido"""
+
+    def __init__(self, max_sessions: int = 10000, idle_timeout: float = 8 * 3600):
+        super().__init__(idle_timeout)
+        self.max_sessions = max_sessions
+        self._data: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid: str) -> Optional[SessionRecord]:
+        with self._lock:
+            record = self._data.get(sid)
+            if record is None:
+                return None
+            if time.time() - record.last_seen > self.idle_timeout:
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return record
+
+    def put(self, record: SessionRecord):
+        with self._lock:
+            self._data[record.sid] = record
+            self._data.move_to_end(record.sid)
+            while len(self._data) > self.max_sessions:
+                self._data.popitem(last=False)
+
+    def delete(self, sid: str):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def update(self, record: SessionRecord) -> bool:
+        with self._lock:
+            if record.sid not in self._data:
+                return False
+            self._data[record.sid] = record
+            self._data.move_to_end(record.sid)
+            return True
+
+    def reap(self) -> int:
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            idle = [sid for sid, r in self._data.items() if r.last_seen < cutoff]
+            for sid in idle:
+                del self._data[sid]
+        return len(idle)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessões em uma tabela SQLite (seguro entre threads e processos)"""
+
+    def __init__(self, path: str, idle_timeout: float = 8 * 3600):
+        super().__init__(idle_timeout)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "sid TEXT PRIMARY KEY, blob TEXT NOT NULL, last_seen REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+
+    def get(self, sid: str) -> Optional[SessionRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT blob FROM sessions WHERE sid = ? AND last_seen >= ?",
+                (sid, time.time() - self.idle_timeout),
+            ).fetchone()
+        return SessionRecord.from_json(sid, row[0]) if row else None
+
+    def put(self, record: SessionRecord):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (sid, blob, last_seen) VALUES (?, ?, ?)",
+                (record.sid, record.to_json(), record.last_seen),
+            )
+
+    def delete(self, sid: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def update(self, record: SessionRecord) -> bool:
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE sessions SET blob = ?, last_seen = ? WHERE sid = ?",
+                (record.to_json(), record.last_seen, record.sid),
+            )
+        return cur.rowcount > 0
+
+    def reap(self) -> int:
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "DELETE FROM sessions WHERE last_seen < ?", (time.time() - self.idle_timeout,)
+            )
+        return cur.rowcount
+
+
+class RedisSessionStore(SessionStore):
+    """Sessões em Redis (ou substituto local compatível); a ociosidade vira TTL da chave"""
+
+    def __init__(self, client, prefix: str = "st_session:", idle_timeout: float = 8 * 3600):
+        super().__init__(idle_timeout)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, sid: str) -> Optional[SessionRecord]:
+        blob = self.client.get(self.prefix + sid)
+        if blob is None:
+            return None
+        if isinstance(blob, bytes):
+            blob = blob.decode("utf-8")
+        return SessionRecord.from_json(sid, blob)
+
+    def put(self, record: SessionRecord):
+        self.client.set(self.prefix + record.sid, record.to_json(), ex=int(self.idle_timeout))
+
+    def delete(self, sid: str):
+        self.client.delete(self.prefix + sid)
+
+    def update(self, record: SessionRecord) -> bool:
+        # xx=True: só grava se a chave ainda existe
+        return bool(self.client.set(self.prefix + record.sid, record.to_json(),
+                                    ex=int(self.idle_timeout), xx=True))
+
+
+_stores_lock = threading.Lock()
+_stores: Dict[tuple, SessionStore] = {}
+
+
+def create_session_store(kind: str = "memory", path: Optional[str] = None,
+                         idle_timeout: float = 8 * 3600) -> SessionStore:
+    """Cria o store a partir da configuração ("memory", "sqlite" ou "redis")"""
+    kind = (kind or "memory").lower()
+    if kind == "memory":
+        return MemorySessionStore(idle_timeout=idle_timeout)
+    if kind == "sqlite":
+        return SQLiteSessionStore(path or os.path.join(".streamlit", "sessions.sqlite"), idle_timeout)
+    if kind == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("session_store = 'redis' requer redis: pip install redis")
+        return RedisSessionStore(redis.Redis.from_url(path or "redis://localhost:6379/0"),
+                                 idle_timeout=idle_timeout)
+    raise ValueError(f"Tipo de session store desconhecido: {kind}")
+
+
+def get_session_store(kind: str = "memory", path: Optional[str] = None,
+                      idle_timeout: float = 8 * 3600) -> SessionStore:
+    """Store compartilhado pelo processo para (kind, path), com reaper ativo"""
+    key = ((kind or "memory").lower(), path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = create_session_store(kind, path, idle_timeout)
+            store.start_reaper()
+            _stores[key] = store
+        return store
@@ -0,0 +1,323 @@
+"""
+Cache local de conteúdo do SharePoint/OneDrive
+
+ContentCache guarda em disco os bytes de cada driveItem (chave: item id),
+junto com eTag/cTag. Antes de reutilizar uma cópia o SPConnector compara o
+cTag com uma chamada barata de metadados; dentro do `ttl` nem essa chamada é
+feita. O tamanho total é limitado com despejo LRU e as gravações são atômicas
+e protegidas por lock de arquivo, então vários processos podem compartilhar
+o mesmo diretório.
+
+DataFrameCache é um segundo nível sobre o conteúdo: guarda o DataFrame já
+parseado por (item id, versão, kwargs de leitura), em um LRU em memória e em
+disco (pickle protocolo 5). Quando o eTag/cTag muda a chave muda junto, então
+a invalidação é automática. Kwargs sem representação estável (funções) não
+geram chave, e um pickle que não carrega é descartado e reparseado.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from token_cache import file_lock
+
+
+class ContentCache:
+    """Cache em disco de conteúdo de arquivos, indexado por drive item id"""
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024 ** 3, ttl: float = 60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, ".lock")
+        # (escopo, caminho) -> item id, para pular a revalidação dentro do TTL
+        self._paths: Dict[Tuple[str, str], str] = {}
+        self._paths_lock = threading.Lock()
+        self._stats = {"hits": 0, "revalidated": 0, "misses": 0, "evictions": 0}
+
+    # -------- Arquivos --------
+    def _base(self, item_id: str) -> str:
+        name = hashlib.sha256(item_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name)
+
+    def data_path(self, item_id: str) -> str:
+        return self._base(item_id) + ".bin"
+
+    def _meta_path(self, item_id: str) -> str:
+        return self._base(item_id) + ".json"
+
+    def _read_meta(self, item_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._meta_path(item_id), "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not os.path.exists(self.data_path(item_id)):
+            return None
+        return meta
+
+    def _write_meta(self, item_id: str, meta: Dict[str, Any]):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, self._meta_path(item_id))
+
+    def _touch(self, item_id: str):
+        try:
+            os.utime(self.data_path(item_id))
+        except FileNotFoundError:
+            pass
+
+    # -------- API --------
+    def cached_item(self, scope: str, path: str) -> Optional[str]:
+        """Item id conhecido para o caminho (sem ir ao servidor)"""
+        with self._paths_lock:
+            return self._paths.get((scope, path))
+
+    def fresh_path(self, item_id: str) -> Optional[str]:
+        """Caminho local se a cópia foi validada há menos de `ttl` segundos"""
+        meta = self._read_meta(item_id)
+        if meta and time.time() - meta.get("validated_at", 0) < self.ttl:
+            self._stats["hits"] += 1
+            self._touch(item_id)
+            return self.data_path(item_id)
+        return None
+
+    def validate(self, item: Dict[str, Any]) -> Optional[str]:
+        """
+        Compara os metadados do servidor (cTag/eTag) com a cópia local.
+        Retorna o caminho local se ainda for válida.
+        """
+        item_id = item["id"]
+        meta = self._read_meta(item_id)
+        if not meta:
+            return None
+        # cTag muda só com o conteúdo; eTag também muda com metadados
+        tag_field = "cTag" if item.get("cTag") else "eTag"
+        if item.get(tag_field) and meta.get(tag_field) == item.get(tag_field):
+            meta["validated_at"] = time.time()
+            with file_lock(self._lock_path):
+                self._write_meta(item_id, meta)
+            self._stats["revalidated"] += 1
+            self._touch(item_id)
+            return self.data_path(item_id)
+        return None
+
+    def version(self, item_id: str) -> Optional[str]:
+        """cTag (ou eTag) da cópia local"""
+        meta = self._read_meta(item_id) or {}
+        return meta.get("cTag") or meta.get("eTag")
+
+    def remember(self, scope: str, path: str, item_id: str):
+        with self._paths_lock:
+            self._paths[(scope, path)] = item_id
+
+    def forget(self, scope: str, path: str):
+        with self._paths_lock:
+            self._paths.pop((scope, path), None)
+
+    def discard(self, item_id: str):
+        """Remove a cópia local do item (ex.: arquivo corrompido)"""
+        with file_lock(self._lock_path):
+            for p in (self.data_path(item_id), self._meta_path(item_id)):
+                if os.path.exists(p):
+                    os.remove(p)
+
+    def store(self, item: Dict[str, Any], writer: Callable[[Any], Any]) -> str:
+        """
+        Grava o conteúdo do item chamando `writer(arquivo_binário)` e
+        registra eTag/cTag. A troca do arquivo é atômica.
+        """
+        item_id = item["id"]
+        self._stats["misses"] += 1
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                writer(fh)
+            with file_lock(self._lock_path):
+                os.replace(tmp, self.data_path(item_id))
+                self._write_meta(item_id, {
+                    "id": item_id,
+                    "eTag": item.get("eTag"),
+                    "cTag": item.get("cTag"),
+                    "size": item.get("size"),
+                    "validated_at": time.time(),
+                })
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict(keep=self.data_path(item_id))
+        return self.data_path(item_id)
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove os itens menos usados até o total caber em `max_bytes`"""
+        with file_lock(self._lock_path):
+            entries = []
+            total = 0
+            for name in os.listdir(self.directory):
+                if not name.endswith(".bin"):
+                    continue
+                full = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(full)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+                total += st.st_size
+            entries.sort()
+            for _, size, full in entries:
+                if total <= self.max_bytes:
+                    break
+                if full == keep:
+                    continue
+                for p in (full, full[:-4] + ".json"):
+                    if os.path.exists(p):
+                        os.remove(p)
+                total -= size
+                self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+
+class _Unstable(Exception):
+    """Valor sem representação estável entre chamadas/processos"""
+
+
+def _normalize_kwarg(value):
+    """Forma canônica (e com repr estável) de um kwarg de leitura"""
+    if value is None or isinstance(value, (str, bytes, bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((repr(k), _normalize_kwarg(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_normalize_kwarg(v) for v in value))
+    if isinstance(value, (set, frozenset)):
+        return ("set", tuple(sorted(repr(_normalize_kwarg(v)) for v in value)))
+    if isinstance(value, type):
+        # Tipos (ex.: dtype=np.int32) pelo nome qualificado
+        return ("type", f"{value.__module__}.{value.__qualname__}")
+    if callable(value):
+        raise _Unstable(value)
+    text = repr(value)
+    if " at 0x" in text:
+        raise _Unstable(value)  # repr padrão, baseado no endereço do objeto
+    return (type(value).__name__, text)
+
+
+class DataFrameCache:
+    """
+    Cache de DataFrames parseados: LRU em memória + arquivos pickle em disco.
+
+    O diretório deve ser local e confiável (pickle executa código ao carregar).
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_memory_bytes: int = 512 * 1024 ** 2,
+                 max_disk_bytes: int = 4 * 1024 ** 3):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "discarded": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk = ContentCache(directory, max_bytes=max_disk_bytes, ttl=0)
+
+    @staticmethod
+    def make_key(item_id: str, version: Optional[str], reader: str,
+                 kwargs: Dict[str, Any]) -> Optional[str]:
+        """
+        Chave estável para (item, versão, leitor, kwargs de leitura), ou None
+        se os kwargs não têm representação estável (funções, lambdas e outros
+        chamáveis, como converters=): nesse caso o resultado não é cacheado.
+        """
+        try:
+            normalized = _normalize_kwarg(kwargs)
+        except _Unstable:
+            return None
+        raw = repr((item_id, version, reader, normalized))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, df: pd.DataFrame):
+        # deep=True conta o conteúdo das colunas object/string, não só os ponteiros
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= old[1]
+            self._memory[key] = (df, size)
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes:
+                _, (_, evicted) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """DataFrame cacheado (uma cópia, para que o chamador possa alterá-la)"""
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return hit[0].copy()
+
+        if self.directory:
+            path = self._disk.data_path(key)
+            try:
+                with open(path, "rb") as fh:
+                    df = pickle.load(fh)
+            except FileNotFoundError:
+                df = None
+            except Exception:
+                # Pickle truncado, de outra versão do pandas etc.: descarta e reparseia
+                df = None
+                self._disk.discard(key)
+                self._stats["discarded"] += 1
+            if df is not None and not isinstance(df, pd.DataFrame):
+                df = None
+                self._disk.discard(key)
+                self._stats["discarded"] += 1
+            if df is not None:
+                self._disk._touch(key)
+                self._stats["disk_hits"] += 1
+                self._remember(key, df)
+                return df.copy()
+
+        self._stats["misses"] += 1
+        return None
+
+    def put(self, key: str, df: pd.DataFrame):
+        self._remember(key, df)
+        if self.directory:
+            self._disk.store(
+                {"id": key},
+                lambda fh: pickle.dump(df, fh, protocol=pickle.HIGHEST_PROTOCOL),
+            )
+
+    def get_or_parse(self, key: Optional[str], parse: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """DataFrame de `key`, parseando e guardando se ausente (key=None: só parseia)"""
+        if key is None:
+            return parse()
+        df = self.get(key)
+        if df is None:
+            df = parse()
+            self.put(key, df)
+            df = df.copy()
+        return df
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, memory_entries=len(self._memory), memory_bytes=self._memory_bytes)
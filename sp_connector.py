@@ -10,15 +10,165 @@ IMPORTANTE: O App Registration no Azure precisa ter a permissão
 não delegada) com consentimento do administrador.
 """
 
+import contextlib
+import gzip
 import io
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import threading
 import time
-import requests
-import msal
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import NamedTuple, Optional
 import pandas as pd
-from urllib.parse import quote
+import requests
+from urllib.parse import quote, unquote
+
+import msal_registry
+from graph_batch import execute_batch
+from graph_http import get_policy_transport
+from graph_throttle import get_default_policy
+from graph_token import get_app_token_provider
+from sp_index import get_path_index
+
+logger = logging.getLogger(__name__)
 
 GRAPH = "https://graph.microsoft.com/v1.0"
 
+# Limite do PUT simples; acima disso usa-se uma upload session
+SMALL_UPLOAD_LIMIT = 4 * 1024 * 1024
+# O Graph exige fragmentos múltiplos de 320 KiB
+UPLOAD_CHUNK_ALIGN = 320 * 1024
+DEFAULT_UPLOAD_CHUNK = 32 * UPLOAD_CHUNK_ALIGN  # 10 MiB
+DEFAULT_DOWNLOAD_CHUNK = 1024 * 1024
+DEFAULT_RANGE_SIZE = 8 * 1024 * 1024
+# Acima disso, downloads que precisam de arquivo seekable (Excel) vão para disco
+SPOOL_MAX_MEMORY = 64 * 1024 * 1024
+# Linhas serializadas por vez nas escritas de DataFrame (CSV/Parquet)
+DEFAULT_WRITE_CHUNK_ROWS = 100_000
+# Campos pedidos nas listagens (mantém as páginas pequenas)
+LIST_SELECT = "id,name,size,eTag,cTag,lastModifiedDateTime,folder,file"
+DELTA_SELECT = "id,name,size,cTag,deleted,file,folder,root,parentReference"
+# Campos que confirmam que um id do índice ainda está no caminho pedido
+LOCATION_SELECT = "name,parentReference"
+
+
+class RangeNotSupported(RuntimeError):
+    """O servidor respondeu sem 206 a um pedido com Range"""
+
+
+class DriveItem(NamedTuple):
+    """Registro compacto de um item de listagem"""
+    id: str
+    name: str
+    path: str  # relativo à raiz do drive/biblioteca
+    size: int
+    etag: Optional[str]
+    ctag: Optional[str]
+    last_modified: Optional[str]
+    is_folder: bool
+
+    @classmethod
+    def from_graph(cls, data: dict, parent_path: str = "") -> "DriveItem":
+        name = data.get("name", "")
+        return cls(
+            id=data["id"],
+            name=name,
+            path=f"{parent_path}/{name}" if parent_path else name,
+            size=int(data.get("size") or 0),
+            etag=data.get("eTag"),
+            ctag=data.get("cTag"),
+            last_modified=data.get("lastModifiedDateTime"),
+            is_folder="folder" in data,
+        )
+
+
+def _is_seekable(fileobj) -> bool:
+    try:
+        return fileobj.seekable()
+    except AttributeError:
+        # SpooledTemporaryFile < 3.11 não implementa seekable()
+        return hasattr(fileobj, "seek") and hasattr(fileobj, "tell")
+
+
+def _as_seekable(source, size=None, spool_size=DEFAULT_UPLOAD_CHUNK):
+    """
+    Normaliza a origem de um upload para (arquivo seekable, tamanho, temporário?).
+    Geradores e streams não-seekable são copiados para um arquivo temporário
+    (em memória até `spool_size`, depois em disco), mantendo a memória limitada.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source), len(source), False
+
+    if hasattr(source, "read") and _is_seekable(source):
+        if size is None:
+            pos = source.tell()
+            size = source.seek(0, io.SEEK_END) - pos
+            source.seek(pos)
+        return source, size, False
+
+    if hasattr(source, "read"):
+        chunks = iter(lambda: source.read(spool_size), b"")
+    else:
+        chunks = iter(source)
+    tmp = tempfile.SpooledTemporaryFile(max_size=spool_size)
+    for chunk in chunks:
+        tmp.write(chunk)
+    size = tmp.tell()
+    tmp.seek(0)
+    return tmp, size, True
+
+
+def detect_excel_engine() -> str:
+    """calamine (python-calamine, pandas >= 2.2) se instalado; senão openpyxl"""
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return "openpyxl"
+    major, minor = (int(x) for x in pd.__version__.split(".")[:2])
+    return "calamine" if (major, minor) >= (2, 2) else "openpyxl"
+
+
+def _iter_frames(data, chunk_rows: int):
+    """DataFrame em fatias de `chunk_rows` linhas, ou um iterável de DataFrames como está"""
+    if not isinstance(data, pd.DataFrame):
+        yield from data
+        return
+    if data.empty:
+        yield data
+        return
+    for start in range(0, len(data), chunk_rows):
+        yield data.iloc[start:start + chunk_rows]
+
+
+def _infer_format(path: str):
+    """(formato, compressão) pela extensão: .csv, .csv.gz, .csv.zst, .parquet"""
+    name = path.lower()
+    compression = None
+    for ext, codec in ((".gz", "gzip"), (".zst", "zstd")):
+        if name.endswith(ext):
+            name, compression = name[:-len(ext)], codec
+    return ("parquet" if name.endswith(".parquet") else "csv"), compression
+
+
+def _compressed(fileobj, compression: Optional[str]):
+    """Envolve `fileobj` com um compressor em streaming (não fecha o arquivo base)"""
+    if not compression:
+        return contextlib.nullcontext(fileobj)
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="wb", mtime=0)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Compressão zstd requer zstandard: pip install zstandard")
+        return zstandard.ZstdCompressor().stream_writer(fileobj, closefd=False)
+    raise ValueError(f"Compressão não suportada: {compression}")
+
 
 class SPConnector:
     """
@@ -50,7 +200,9 @@ class SPConnector:
     """
 
     def __init__(self, tenant_id, client_id, client_secret,
-                 hostname=None, site_path=None, library_name=None, user_upn=None):
+                 hostname=None, site_path=None, library_name=None, user_upn=None,
+                 transport=None, retry_policy=None, content_cache=None, frame_cache=None,
+                 path_index=None, token_provider=None, excel_engine=None):
         self.tenant_id = tenant_id
         self.client_id = client_id
         self.client_secret = client_secret
@@ -59,32 +211,37 @@ class SPConnector:
         self.site_path = site_path or ""
         self.library_name = library_name or ""
         self.user_upn = user_upn or ""  # se presente, opera em OneDrive
+        # Sem retries por status: 429/503 ficam com a RetryPolicy
+        self.transport = transport or get_policy_transport()
+        self.retry_policy = retry_policy or get_default_policy()
+        self.content_cache = content_cache  # sp_cache.ContentCache opcional
+        self.frame_cache = frame_cache  # sp_cache.DataFrameCache opcional
+        # Engine do pandas para .xlsx; o openpyxl do pandas já abre em modo read-only
+        self.excel_engine = excel_engine or detect_excel_engine()
+        # Índice caminho -> item id e descoberta de site/drive, compartilhados pelo processo
+        self.path_index = path_index or get_path_index()
 
-        self._app = msal.ConfidentialClientApplication(
-            client_id=self.client_id,
-            authority=f"https://login.microsoftonline.com/{self.tenant_id}",
-            client_credential=self.client_secret,
+        # Token app-only compartilhado (e renovado em segundo plano) por credencial
+        self.token_provider = token_provider or get_app_token_provider(
+            self.tenant_id, self.client_id, self.client_secret
         )
-        self._tok = None
-        self._exp = 0
         self._site_id_cache = None
         self._drive_id_cache = None
 
     # -------- Auth --------
     def _token(self):
-        now = time.time()
-        if self._tok and now < self._exp:
-            return self._tok
-        res = self._app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-        if "access_token" not in res:
-            raise RuntimeError(res.get("error_description") or res)
-        self._tok = res["access_token"]
-        self._exp = now + int(res.get("expires_in", 3600)) - 60
-        return self._tok
+        return self.token_provider.token()
 
     def _headers(self):
         return {"Authorization": f"Bearer {self._token()}"}
 
+    def _request(self, method: str, url: str, **kw):
+        """Requisição ao Graph com retry/backoff e rate limiting por tenant"""
+        return self.retry_policy.execute(
+            self.tenant_id,
+            lambda: self.transport.request(method, url, **kw),
+        )
+
     # -------- Modo --------
     @property
     def is_onedrive(self) -> bool:
@@ -96,10 +253,15 @@ class SPConnector:
             return None
         if self._site_id_cache:
             return self._site_id_cache
+        site_id, _ = self.path_index.get_discovery(self._cache_scope())
+        if site_id:
+            self._site_id_cache = site_id
+            return site_id
         url = f"{GRAPH}/sites/{self.hostname}:/{self.site_path}"
-        r = requests.get(url, headers=self._headers(), timeout=30)
+        r = self._request("GET", url, headers=self._headers(), timeout=30)
         r.raise_for_status()
         self._site_id_cache = r.json()["id"]
+        self.path_index.put_discovery(self._cache_scope(), self._site_id_cache, None)
         return self._site_id_cache
 
     def _drive_id(self):
@@ -107,18 +269,20 @@ class SPConnector:
             return None
         if self._drive_id_cache:
             return self._drive_id_cache
+        _, drive_id = self.path_index.get_discovery(self._cache_scope())
+        if drive_id:
+            self._drive_id_cache = drive_id
+            return drive_id
         url = f"{GRAPH}/sites/{self._site_id()}/drives"
-        r = requests.get(url, headers=self._headers(), timeout=30)
+        r = self._request("GET", url, headers=self._headers(), timeout=30)
         r.raise_for_status()
         drives = r.json().get("value", [])
-        for d in drives:
-            if d.get("name", "").lower() == self.library_name.lower():
-                self._drive_id_cache = d["id"]
-                return self._drive_id_cache
-        for d in drives:
-            if d.get("driveType") == "documentLibrary":
-                self._drive_id_cache = d["id"]
-                return self._drive_id_cache
+        match = next((d for d in drives if d.get("name", "").lower() == self.library_name.lower()), None)
+        match = match or next((d for d in drives if d.get("driveType") == "documentLibrary"), None)
+        if match:
+            self._drive_id_cache = match["id"]
+            self.path_index.put_discovery(self._cache_scope(), self._site_id_cache, self._drive_id_cache)
+            return self._drive_id_cache
         raise RuntimeError(f"Biblioteca '{self.library_name}' não encontrada em {self.site_path}")
 
     # -------- Normalização de caminho --------
@@ -154,43 +318,1104 @@ class SPConnector:
                 return path[len(prefix):]
             return path
 
-    # -------- Download / Upload --------
-    def download(self, path: str) -> bytes:
-        """Baixa o conteúdo de um arquivo como bytes"""
+    def _drive_url(self) -> str:
+        """URL base do drive (OneDrive do usuário ou biblioteca do site)"""
+        if self.is_onedrive:
+            return f"{GRAPH}/users/{self.user_upn}/drive"
+        return f"{GRAPH}/drives/{self._drive_id()}"
+
+    def _item_url(self, path: str) -> str:
+        """URL do driveItem endereçado por caminho (sem sufixo /content)"""
         rel = quote(self.normalize_path(path), safe="/")
+        return f"{self._drive_url()}/root:/{rel}:"
+
+    # -------- Índice caminho -> id --------
+    def _indexed_item_url(self, path: str):
+        """(URL do driveItem, endereçada por id?) — por id quando o caminho está no índice"""
+        item_id = self.path_index.get(self._cache_scope(), self.normalize_path(path))
+        if item_id:
+            return f"{self._drive_url()}/items/{item_id}", True
+        return self._item_url(path), False
+
+    def _remember_path(self, path: str, item):
+        if isinstance(item, dict) and item.get("id"):
+            self.path_index.put(self._cache_scope(), self.normalize_path(path), item["id"])
+
+    def _forget_path(self, path: str):
+        self.path_index.invalidate(self._cache_scope(), self.normalize_path(path))
+
+    def _same_location(self, item: dict, path: str) -> bool:
+        """
+        O item (obtido por id) ainda está em `path`? O id sobrevive a
+        renomear e mover, então o índice pode apontar para outro caminho.
+        """
+        rel = self.normalize_path(path).strip("/")
+        parent, _, name = rel.rpartition("/")
+        if (item.get("name") or "").casefold() != name.casefold():
+            return False
+        ref_path = (item.get("parentReference") or {}).get("path")
+        if not ref_path or "root:" not in ref_path:
+            return True  # sem caminho do pai na resposta: confere só o nome
+        actual = unquote(ref_path.split("root:", 1)[1]).strip("/")
+        return actual.casefold() == parent.casefold()
+
+    @staticmethod
+    def _with_location(select: Optional[str]) -> Optional[str]:
+        # Sem $select o Graph já devolve name e parentReference
+        return f"{select},{LOCATION_SELECT}" if select else None
+
+    def _item_request(self, method: str, path: str, suffix: str = "", **kw):
+        """
+        Requisição ao driveItem de `path`. Usa /items/{id} quando o id é
+        conhecido. Um id pode estar desatualizado: 404 (item excluído ou
+        substituído) ou item renomeado/movido (name/parentReference não
+        batem com `path`). Nos dois casos a entrada é invalidada e a chamada
+        é repetida pelo caminho.
+        """
+        url, by_id = self._indexed_item_url(path)
+        if by_id and suffix == "/content" and method == "GET":
+            r = self._content_by_id(url, path, **kw)
+            if r is not None:
+                return r
+        elif by_id and not suffix and method == "GET":
+            params = dict(kw.pop("params", None) or {})
+            if "$select" in params:
+                params["$select"] = self._with_location(params["$select"])
+            r = self._request(method, url, headers=self._headers(), params=params, **kw)
+            if r.status_code not in (200, 404) or (
+                    r.status_code == 200 and self._same_location(r.json(), path)):
+                return r
+            r.close()
+            kw["params"] = params
+        else:
+            r = self._request(method, url + suffix, headers=self._headers(), **kw)
+            if r.status_code != 404 or not by_id:
+                return r
+            r.close()
+        self._forget_path(path)
+        return self._request(method, self._item_url(path) + suffix, headers=self._headers(), **kw)
+
+    def _content_by_id(self, url: str, path: str, **kw):
+        """
+        /content por id em dois passos: metadados com downloadUrl (confere o
+        caminho) e GET na downloadUrl, o mesmo número de round-trips do
+        redirect 302 de /content. None se o id está desatualizado.
+        """
+        params = {"$select": f"id,@microsoft.graph.downloadUrl,{LOCATION_SELECT}"}
+        meta = self._request("GET", url, headers=self._headers(), params=params, timeout=30)
+        if meta.status_code == 404:
+            meta.close()
+            return None
+        meta.raise_for_status()
+        item = meta.json()
+        download_url = item.get("@microsoft.graph.downloadUrl")
+        if not self._same_location(item, path) or not download_url:
+            return None
+        # downloadUrl é pré-autenticada: sem Authorization
+        return self._request("GET", download_url, **kw)
+
+    def item_metadata(self, path: str, select: str = None) -> dict:
+        """Metadados do driveItem (opcionalmente só os campos de `select`)"""
+        params = {"$select": select} if select else None
+        r = self._item_request("GET", path, params=params, timeout=30)
+        if r.status_code == 404:
+            raise FileNotFoundError(path)
+        r.raise_for_status()
+        item = r.json()
+        self._remember_path(path, item)
+        return item
+
+    # -------- Listagem --------
+    def _children_url(self, path: str = "", item_id: str = None) -> str:
+        if item_id:
+            return f"{self._drive_url()}/items/{item_id}/children"
+        if not path.strip("/"):
+            return f"{self._drive_url()}/root/children"
+        return f"{self._item_url(path)}/children"
+
+    def _iter_children(self, url: str, parent_path: str, page_size: int, select: str):
+        params = {"$top": page_size, "$select": select}
+        while url:
+            r = self._request("GET", url, headers=self._headers(), params=params, timeout=60)
+            if r.status_code == 404:
+                raise FileNotFoundError(parent_path or "/")
+            r.raise_for_status()
+            data = r.json()
+            items = [DriveItem.from_graph(item, parent_path) for item in data.get("value", [])]
+            # A listagem alimenta o índice: chamadas seguintes vão direto por id
+            self.path_index.put_many(self._cache_scope(), ((i.path, i.id) for i in items))
+            yield from items
+            # nextLink já carrega $top/$select
+            url, params = data.get("@odata.nextLink"), None
+
+    def list_children(self, path: str = "", page_size: int = 200, select: str = LIST_SELECT):
+        """
+        Gera os itens de uma pasta como DriveItem, buscando as páginas
+        (@odata.nextLink) sob demanda. path="" lista a raiz.
+        """
+        parent = self.normalize_path(path).strip("/") if path.strip("/") else ""
+        return self._iter_children(self._children_url(path), parent, page_size, select)
+
+    def walk(self, path: str = "", parallel: bool = False, max_workers: int = 4,
+             page_size: int = 200, select: str = LIST_SELECT):
+        """
+        Percorre recursivamente a pasta e gera cada DriveItem (arquivos e pastas).
+        As subpastas são listadas por id, sem resolver caminhos no servidor.
+        Com parallel=True, pastas irmãs são listadas ao mesmo tempo; a
+        ordem de saída deixa de ser determinística.
+        """
+        parent = self.normalize_path(path).strip("/") if path.strip("/") else ""
+        root_url = self._children_url(path)
+
+        if not parallel:
+            stack = [(root_url, parent)]
+            while stack:
+                url, folder = stack.pop()
+                for item in self._iter_children(url, folder, page_size, select):
+                    yield item
+                    if item.is_folder:
+                        stack.append((self._children_url(item_id=item.id), item.path))
+            return
+
+        def list_folder(url, folder):
+            return list(self._iter_children(url, folder, page_size, select))
+
+        with ThreadPoolExecutor(max_workers=self._workers(max_workers)) as pool:
+            pending = {pool.submit(list_folder, root_url, parent)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for item in future.result():
+                        yield item
+                        if item.is_folder:
+                            pending.add(pool.submit(list_folder, self._children_url(item_id=item.id), item.path))
+
+    # -------- Sincronização incremental (delta) --------
+    def _resolve_item_id(self, path: str) -> str:
+        if path.strip("/"):
+            return self.item_metadata(path, select="id")["id"]
+        r = self._request("GET", f"{self._drive_url()}/root", headers=self._headers(),
+                          params={"$select": "id"}, timeout=30)
+        r.raise_for_status()
+        return r.json()["id"]
+
+    def _collect_delta(self, delta_link: Optional[str]):
+        """
+        Lê todas as páginas de /delta; retorna (itens, novo deltaLink, completa).
+        `completa` indica uma enumeração completa (sem deltaLink ou após 410),
+        que lista o que existe e não informa exclusões.
+        """
+        url = delta_link or f"{self._drive_url()}/root/delta"
+        params = None if delta_link else {"$select": DELTA_SELECT}
+        changes = {}
+        while True:
+            r = self._request("GET", url, headers=self._headers(), params=params, timeout=60)
+            if r.status_code == 410 and delta_link:
+                # Token expirado: o servidor exige nova enumeração completa
+                return self._collect_delta(None)
+            r.raise_for_status()
+            data = r.json()
+            for item in data.get("value", []):
+                changes[item["id"]] = item  # a última versão do item prevalece
+            if "@odata.nextLink" in data:
+                url, params = data["@odata.nextLink"], None
+                continue
+            return list(changes.values()), data.get("@odata.deltaLink"), delta_link is None
+
+    @staticmethod
+    def _sync_path(nodes: dict, item_id: str, scope_id: str) -> Optional[str]:
+        """Caminho relativo à pasta sincronizada, montado pelos ids dos pais"""
+        parts = []
+        current = item_id
+        while current != scope_id:
+            node = nodes.get(current)
+            if node is None or not node.get("parent"):
+                return None  # fora da pasta sincronizada
+            parts.append(node["name"])
+            current = node["parent"]
+        return "/".join(reversed(parts))
+
+    def _download_item_to(self, item_id: str, dest: str):
+        url = f"{self._drive_url()}/items/{item_id}/content"
+        r = self._request("GET", url, headers=self._headers(), timeout=180, stream=True)
+        try:
+            r.raise_for_status()
+            os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest) or ".", suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    for chunk in r.iter_content(chunk_size=DEFAULT_DOWNLOAD_CHUNK):
+                        fh.write(chunk)
+                os.replace(tmp, dest)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        finally:
+            r.close()
+
+    @staticmethod
+    def _remove_local(full_path: str):
+        if os.path.isdir(full_path):
+            shutil.rmtree(full_path, ignore_errors=True)
+        elif os.path.exists(full_path):
+            os.remove(full_path)
+
+    def sync(self, remote_folder: str, local_dir: str, max_workers: int = 4,
+             state_file: str = None) -> dict:
+        """
+        Espelha uma pasta remota em `local_dir` usando Graph /delta.
+
+        O deltaLink e o mapa de itens (por id) ficam em `state_file`
+        (padrão: <local_dir>/.sp_sync.json). A primeira execução enumera tudo;
+        as seguintes leem só as mudanças e baixam apenas arquivos novos ou
+        com cTag diferente, em paralelo. Exclusões, renomeações e movimentos
+        são aplicados localmente. Downloads que falharem são repetidos na
+        próxima execução. Se o deltaLink expirar (410), a nova enumeração
+        completa refaz o mapa e os arquivos locais que não aparecem nela são
+        removidos.
+
+        Observação: no SharePoint/OneDrive for Business o /delta só existe na
+        raiz do drive, então a pasta é filtrada localmente pelos ids dos pais.
+        """
+        os.makedirs(local_dir, exist_ok=True)
+        state_file = state_file or os.path.join(local_dir, ".sp_sync.json")
+        try:
+            with open(state_file, "r", encoding="utf-8") as fh:
+                state = json.load(fh)
+        except (FileNotFoundError, ValueError):
+            state = {}
+
+        scope_id = self._resolve_item_id(remote_folder)
+        if state.get("scope_id") != scope_id:
+            state = {"scope_id": scope_id, "delta_link": None, "nodes": {}}
+        nodes = state["nodes"]  # id -> {name, parent, folder, ctag, remote_ctag, local}
+
+        changes, delta_link, full = self._collect_delta(state.get("delta_link"))
+        stats = {"downloaded": 0, "deleted": 0, "moved": 0, "errors": []}
+
+        old_nodes = {}
+        if full:
+            # Enumeração completa (primeira execução ou deltaLink expirado): o mapa
+            # é refeito e o que não apareceu nela foi excluído no servidor
+            old_nodes, nodes = nodes, {}
+            state["nodes"] = nodes
+
+        deleted = []
+        for item in changes:
+            if "deleted" in item:
+                deleted.append(item["id"])
+                continue
+            node = nodes.setdefault(item["id"], dict(old_nodes.get(item["id"], {})))
+            node["name"] = item.get("name", "")
+            node["parent"] = (item.get("parentReference") or {}).get("id")
+            node["folder"] = "folder" in item or "root" in item
+            if "file" in item:
+                node["remote_ctag"] = item.get("cTag")
+
+        removed = [nodes.pop(item_id, None) for item_id in deleted]
+        removed += [node for item_id, node in old_nodes.items() if item_id not in nodes]
+        for node in removed:
+            if node and node.get("local") is not None:
+                self._remove_local(os.path.join(local_dir, node["local"]))
+                stats["deleted"] += 1
+
+        # Renomeações/movimentos: pais antes dos filhos. Mover uma pasta já move
+        # o conteúdo, então o caminho atual do filho considera os pais movidos
+        moves = []  # (caminho antigo, caminho novo), na ordem aplicada
+
+        def current_path(local):
+            for old, new in moves:
+                if local == old or local.startswith(old + "/"):
+                    local = new + local[len(old):]
+            return local
+
+        materialized = sorted(
+            (n["local"].count("/"), item_id) for item_id, n in nodes.items() if n.get("local") is not None
+        )
+        for _, item_id in materialized:
+            node = nodes[item_id]
+            new_path = self._sync_path(nodes, item_id, scope_id)
+            local = current_path(node["local"])
+            old_full = os.path.join(local_dir, local)
+            if new_path is None:
+                self._remove_local(old_full)
+                node.pop("local")
+                stats["deleted"] += 1
+            elif new_path != local:
+                new_full = os.path.join(local_dir, new_path)
+                if os.path.exists(old_full) and not os.path.exists(new_full):
+                    os.makedirs(os.path.dirname(new_full) or ".", exist_ok=True)
+                    os.replace(old_full, new_full)
+                moves.append((local, new_path))
+                node["local"] = new_path
+                stats["moved"] += 1
+            else:
+                node["local"] = new_path
+
+        downloads = []
+        for item_id, node in nodes.items():
+            rel = self._sync_path(nodes, item_id, scope_id)
+            if not rel:
+                continue
+            full = os.path.join(local_dir, rel)
+            if node.get("folder"):
+                os.makedirs(full, exist_ok=True)
+                node["local"] = rel
+            elif (node.get("ctag") != node.get("remote_ctag")
+                  or node.get("local") != rel or not os.path.exists(full)):
+                downloads.append((item_id, rel))
+
+        def fetch(job):
+            item_id, rel = job
+            self._download_item_to(item_id, os.path.join(local_dir, rel))
+            return job
+
+        for _, (item_id, rel), result in self._run_many(fetch, downloads, max_workers):
+            if isinstance(result, Exception):
+                stats["errors"].append((rel, result))
+                continue
+            nodes[item_id]["local"] = rel
+            nodes[item_id]["ctag"] = nodes[item_id].get("remote_ctag")
+            stats["downloaded"] += 1
+
+        state["delta_link"] = delta_link
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(state_file)), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(state, fh)
+        os.replace(tmp, state_file)
+        return stats
+
+    # -------- Batch --------
+    def batch(self, batch_requests):
+        """
+        Executa sub-requisições via /$batch (até 20 por POST). Cada item é um
+        dict com "id", "method", "url" relativa (ex.: "/drives/{id}/items/{id}")
+        e opcionalmente "headers", "body", "dependsOn". Retorna as
+        sub-respostas na ordem da entrada; só as throttled são reenviadas.
+        """
+        def post(payload):
+            return self._request("POST", f"{GRAPH}/$batch", headers=self._headers(), json=payload, timeout=120)
+
+        return execute_batch(post, batch_requests)
+
+    def item_metadata_many(self, paths, select: str = None) -> list:
+        """
+        Metadados de vários itens em lotes de 20 (um round-trip por lote).
+        Itens inexistentes voltam como FileNotFoundError na posição correspondente.
+        """
+        paths = list(paths)
+        query = f"?$select={select}" if select else ""
+        id_query = f"?$select={self._with_location(select)}" if select else ""
+        targets = [self._indexed_item_url(p) for p in paths]
+        reqs = [
+            {"id": str(i), "method": "GET", "url": url[len(GRAPH):] + (id_query if by_id else query)}
+            for i, (url, by_id) in enumerate(targets)
+        ]
+        subs = self.batch(reqs)
+
+        # Itens endereçados por id que sumiram (404) ou mudaram de caminho:
+        # índice desatualizado, repete pelo caminho
+        stale = [
+            i for i, sub in enumerate(subs) if targets[i][1] and (
+                sub.get("status") == 404 or (
+                    sub.get("status") == 200 and not self._same_location(sub.get("body") or {}, paths[i])))
+        ]
+        if stale:
+            for i in stale:
+                self._forget_path(paths[i])
+            retry = [
+                {"id": str(i), "method": "GET", "url": self._item_url(paths[i])[len(GRAPH):] + query}
+                for i in stale
+            ]
+            for i, sub in zip(stale, self.batch(retry)):
+                subs[i] = sub
+
+        out = []
+        for path, sub in zip(paths, subs):
+            status = sub.get("status")
+            if status == 200:
+                body = sub.get("body") or {}
+                self._remember_path(path, body)
+                out.append(body)
+            elif status == 404:
+                out.append(FileNotFoundError(path))
+            else:
+                error = (sub.get("body") or {}).get("error", {})
+                out.append(RuntimeError(f"{path}: HTTP {status} {error.get('message', '')}".strip()))
+        return out
+
+    def _download_url_content(self, download_url: str) -> bytes:
+        # downloadUrl é pré-autenticada: sem Authorization
+        r = self._request("GET", download_url, timeout=180)
+        r.raise_for_status()
+        return r.content
+
+    def _workers(self, max_workers: Optional[int]) -> int:
+        """
+        Limita o pool ao teto de concorrência da política de retry
+        (None = o próprio teto). Valores acima do teto são reduzidos: mais
+        workers só esperariam pelo semáforo da política.
+        """
+        cap = self.retry_policy.max_concurrency
+        if max_workers is None:
+            return cap
+        if max_workers > cap:
+            logger.warning(f"Concorrência {max_workers} reduzida para {cap} "
+                           f"(max_concurrency da RetryPolicy)")
+            return cap
+        return max(1, max_workers)
+
+    def _run_many(self, fn, paths, max_workers: int):
+        """
+        Executa fn(path) em um pool limitado e gera (índice, path, resultado)
+        à medida que terminam. Erros viram o próprio objeto Exception.
+        """
+        with ThreadPoolExecutor(max_workers=self._workers(max_workers)) as pool:
+            futures = {pool.submit(fn, p): (i, p) for i, p in enumerate(paths)}
+            for future in as_completed(futures):
+                i, p = futures[future]
+                try:
+                    yield i, p, future.result()
+                except Exception as e:
+                    yield i, p, e
+
+    @staticmethod
+    def _collect(results, count: int, raise_errors: bool) -> list:
+        out = [None] * count
+        for i, _, result in results:
+            out[i] = result
+        if raise_errors:
+            for result in out:
+                if isinstance(result, Exception):
+                    raise result
+        return out
+
+    def iter_download_many(self, paths, max_workers: int = 8):
+        """
+        Gera (path, bytes | Exception) na ordem em que os downloads terminam.
+        Metadados e downloadUrls vêm em lotes via $batch; o conteúdo é baixado
+        em paralelo. Um arquivo com erro não interrompe os demais.
+        """
+        paths = list(paths)
+        metas = self.item_metadata_many(paths, "id,size,@microsoft.graph.downloadUrl")
+
+        def fetch(index):
+            meta = metas[index]
+            if isinstance(meta, Exception):
+                raise meta
+            url = meta.get("@microsoft.graph.downloadUrl")
+            return self._download_url_content(url) if url else self.download(paths[index])
+
+        for _, index, result in self._run_many(fetch, range(len(paths)), max_workers):
+            yield paths[index], result
+
+    def download_many(self, paths, max_workers: int = 8, raise_errors: bool = False) -> list:
+        """
+        Baixa vários arquivos em paralelo e retorna o conteúdo na ordem da
+        entrada. Com raise_errors=False, arquivos com erro aparecem na lista
+        como o objeto Exception correspondente.
+        """
+        paths = list(paths)
+        index = {}
+        for i, p in enumerate(paths):
+            index.setdefault(p, []).append(i)
+        out = [None] * len(paths)
+        for path, result in self.iter_download_many(list(index), max_workers):
+            for i in index[path]:
+                out[i] = result
+        return self._collect(((i, paths[i], r) for i, r in enumerate(out)), len(paths), raise_errors)
+
+    def read_csv_many(self, paths, max_workers: int = 8, raise_errors: bool = False, **kw) -> list:
+        """read_csv de vários arquivos em paralelo (resultado na ordem da entrada)"""
+        paths = list(paths)
+        results = self._run_many(lambda p: self.read_csv(p, **kw), paths, max_workers)
+        return self._collect(results, len(paths), raise_errors)
+
+    def read_excel_many(self, paths, max_workers: int = 8, raise_errors: bool = False, **kw) -> list:
+        """read_excel de vários arquivos em paralelo (resultado na ordem da entrada)"""
+        paths = list(paths)
+        results = self._run_many(lambda p: self.read_excel(p, **kw), paths, max_workers)
+        return self._collect(results, len(paths), raise_errors)
+
+    # -------- Cache local --------
+    def _cache_scope(self) -> str:
         if self.is_onedrive:
-            url = f"{GRAPH}/users/{self.user_upn}/drive/root:/{rel}:/content"
+            return f"onedrive:{self.user_upn}"
+        return f"site:{self.hostname}/{self.site_path}/{self.library_name}"
+
+    def fetch_cached(self, path: str) -> str:
+        """
+        Caminho local de uma cópia válida do arquivo (requer content_cache).
+        Dentro do TTL não há chamada de rede; depois disso uma chamada de
+        metadados compara o cTag e só baixa o conteúdo se ele mudou.
+        """
+        return self._fetch_cached_item(path)[0]
+
+    def _fetch_cached_item(self, path: str):
+        """(caminho local, item id) de uma cópia válida no content_cache"""
+        cache = self.content_cache
+        scope, rel = self._cache_scope(), self.normalize_path(path)
+
+        item_id = cache.cached_item(scope, rel)
+        if item_id:
+            local = cache.fresh_path(item_id)
+            if local:
+                return local, item_id
+
+        try:
+            item = self.item_metadata(path, select="id,eTag,cTag,size")
+        except FileNotFoundError:
+            cache.forget(scope, rel)
+            raise
+        cache.remember(scope, rel, item["id"])
+        local = cache.validate(item)
+        if local:
+            return local, item["id"]
+        return cache.store(item, lambda fh: self.download_to(path, fh)), item["id"]
+
+    def _read_frame(self, path: str, reader: str, kw: dict, parse) -> pd.DataFrame:
+        """
+        Aplica o frame_cache (se houver) sobre `parse(local_path_ou_None)`.
+        A chave inclui item id e cTag/eTag, então mudanças no arquivo invalidam.
+        """
+        if self.frame_cache is None:
+            local = self.fetch_cached(path) if self.content_cache is not None else None
+            return parse(local)
+
+        if self.content_cache is not None:
+            local, item_id = self._fetch_cached_item(path)
+            version = self.content_cache.version(item_id)
         else:
-            url = f"{GRAPH}/drives/{self._drive_id()}/root:/{rel}:/content"
-        r = requests.get(url, headers=self._headers(), timeout=180)
+            item = self.item_metadata(path, select="id,eTag,cTag")
+            local, item_id, version = None, item["id"], item.get("cTag") or item.get("eTag")
+
+        key = self.frame_cache.make_key(item_id, version, reader, kw)
+        return self.frame_cache.get_or_parse(key, lambda: parse(local))
+
+    # -------- Download / Upload --------
+    def download(self, path: str, parallel: bool = False, **parallel_kw) -> bytes:
+        """
+        Baixa o conteúdo de um arquivo como bytes
+        Com parallel=True usa download_parallel (ranges concorrentes).
+        """
+        if self.content_cache is not None:
+            with open(self.fetch_cached(path), "rb") as fh:
+                return fh.read()
+        if parallel:
+            return bytes(self.download_parallel(path, **parallel_kw))
+        r = self._item_request("GET", path, "/content", timeout=180)
         if r.status_code == 404:
             raise FileNotFoundError(path)
         r.raise_for_status()
         return r.content
 
+    def _open_download(self, path: str):
+        """Abre a resposta de /content em modo streaming (corpo ainda não lido)"""
+        r = self._item_request("GET", path, "/content", timeout=180, stream=True)
+        if r.status_code == 404:
+            r.close()
+            raise FileNotFoundError(path)
+        if not r.ok:
+            r.close()
+        r.raise_for_status()
+        return r
+
+    def download_stream(self, path: str, chunk_size: int = DEFAULT_DOWNLOAD_CHUNK):
+        """Gera o conteúdo do arquivo em blocos de até `chunk_size` bytes"""
+        r = self._open_download(path)
+        try:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    yield chunk
+        finally:
+            r.close()
+
+    def open_download(self, path: str):
+        """
+        Retorna um objeto file-like (somente leitura, não-seekable) ligado
+        diretamente à conexão HTTP. Use com `with` para liberar a conexão.
+        """
+        r = self._open_download(path)
+        r.raw.decode_content = True
+        return r.raw
+
+    def download_to(self, path: str, dest, chunk_size: int = DEFAULT_DOWNLOAD_CHUNK) -> int:
+        """
+        Grava o arquivo remoto direto em `dest` (caminho local ou arquivo
+        binário aberto) sem carregá-lo na memória. Retorna os bytes gravados.
+        Para caminhos, grava em arquivo temporário e renomeia ao final.
+        """
+        if hasattr(dest, "write"):
+            written = 0
+            for chunk in self.download_stream(path, chunk_size):
+                dest.write(chunk)
+                written += len(chunk)
+            return written
+
+        directory = os.path.dirname(os.path.abspath(dest))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                written = self.download_to(path, fh, chunk_size)
+            os.replace(tmp, dest)
+            return written
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _fetch_range(self, download_url: str, buf, start: int, end: int, max_retries: int):
+        """
+        Baixa bytes [start, end] para buf[start:end+1].
+
+        A requisição já passa pelos retries do transporte e da RetryPolicy;
+        aqui só se retoma, do ponto atingido, um corpo interrompido no meio.
+        """
+        pos = start
+        attempt = 0
+        while pos <= end:
+            # downloadUrl é pré-autenticada: sem Authorization
+            r = self._request("GET", download_url, headers={"Range": f"bytes={pos}-{end}"},
+                              timeout=180, stream=True)
+            try:
+                if r.status_code != 206:
+                    r.raise_for_status()
+                    raise RangeNotSupported(f"Servidor ignorou Range (status {r.status_code})")
+                for chunk in r.iter_content(chunk_size=DEFAULT_DOWNLOAD_CHUNK):
+                    buf[pos:pos + len(chunk)] = chunk
+                    pos += len(chunk)
+            except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout):
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+                time.sleep(self.retry_policy.backoff(attempt))
+            finally:
+                r.close()
+
+    def download_parallel(self, path: str, dest=None, range_size: int = DEFAULT_RANGE_SIZE,
+                          max_workers: int = 4, max_retries: int = 3):
+        """
+        Download paralelo por HTTP Range.
+
+        Obtém tamanho e downloadUrl do item, divide o arquivo em ranges de
+        `range_size` e baixa até `max_workers` ranges ao mesmo tempo (limitado
+        pelo teto da RetryPolicy), cada um escrito na sua posição final. Um
+        range cujo corpo é interrompido é retomado sozinho. Se o servidor
+        ignorar Range, cai para o download em um único fluxo.
+
+        dest=None retorna o conteúdo em memória (no caminho paralelo, um
+        bytearray pré-alocado, sem cópia); com um caminho local o arquivo é
+        pré-alocado e preenchido via mmap (retorna o tamanho).
+        """
+        meta = self.item_metadata(path, select="id,size,@microsoft.graph.downloadUrl")
+        size = int(meta.get("size", 0))
+        download_url = meta.get("@microsoft.graph.downloadUrl")
+        if not download_url or size <= range_size:
+            if dest is None:
+                return self.download(path)
+            return self.download_to(path, dest)
+
+        ranges = [(start, min(start + range_size, size) - 1) for start in range(0, size, range_size)]
+
+        def run(buf):
+            with ThreadPoolExecutor(max_workers=self._workers(max_workers)) as pool:
+                futures = [pool.submit(self._fetch_range, download_url, buf, a, b, max_retries)
+                           for a, b in ranges]
+                try:
+                    for f in futures:
+                        f.result()
+                except BaseException:
+                    for f in futures:
+                        f.cancel()
+                    raise
+
+        if dest is None:
+            buf = bytearray(size)
+            try:
+                run(memoryview(buf))
+            except RangeNotSupported:
+                return self.download(path)
+            return buf
+
+        directory = os.path.dirname(os.path.abspath(dest))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "r+b") as fh:
+                fh.truncate(size)
+                with mmap.mmap(fh.fileno(), size) as mm:
+                    run(mm)
+                    mm.flush()
+            os.replace(tmp, dest)
+            return size
+        except RangeNotSupported:
+            os.remove(tmp)
+            return self.download_to(path, dest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
     def upload_small(self, path: str, content: bytes, overwrite: bool = True):
         """Faz upload de um arquivo pequeno (< 4MB)"""
-        rel = quote(self.normalize_path(path), safe="/")
         params = {"@microsoft.graph.conflictBehavior": "replace" if overwrite else "fail"}
-        if self.is_onedrive:
-            url = f"{GRAPH}/users/{self.user_upn}/drive/root:/{rel}:/content"
-        else:
-            url = f"{GRAPH}/drives/{self._drive_id()}/root:/{rel}:/content"
-        r = requests.put(url, headers=self._headers(), params=params, data=content, timeout=300)
+        url = f"{self._item_url(path)}/content"
+        r = self._request("PUT", url, headers=self._headers(), params=params, data=content, timeout=300)
         r.raise_for_status()
-        return r.json()
+        item = r.json()
+        self._remember_path(path, item)
+        return item
+
+    def _create_upload_session(self, path: str, overwrite: bool) -> str:
+        url = f"{self._item_url(path)}/createUploadSession"
+        body = {"item": {"@microsoft.graph.conflictBehavior": "replace" if overwrite else "fail"}}
+        r = self._request("POST", url, headers=self._headers(), json=body, timeout=60)
+        r.raise_for_status()
+        return r.json()["uploadUrl"]
+
+    def _next_expected_offset(self, upload_url: str) -> int:
+        """Consulta a sessão e retorna o próximo byte que o servidor espera"""
+        r = self._request("GET", upload_url, timeout=60)
+        if r.status_code == 404:
+            raise RuntimeError("Upload session expirada ou cancelada")
+        r.raise_for_status()
+        ranges = r.json().get("nextExpectedRanges") or ["0-"]
+        return int(ranges[0].split("-")[0])
+
+    def upload_stream(self, path: str, source, size: int = None,
+                      chunk_size: int = DEFAULT_UPLOAD_CHUNK, overwrite: bool = True,
+                      max_resumes: int = 5, read_ahead: bool = True):
+        """
+        Faz upload via upload session (createUploadSession), em fragmentos.
+
+        `source` pode ser bytes, um arquivo aberto em modo binário ou um
+        iterável de bytes. Apenas um fragmento fica em memória (dois com
+        `read_ahead`, que lê o próximo enquanto o atual é enviado). Após uma
+        falha o envio retoma de `nextExpectedRanges` informado pelo servidor.
+
+        Observação: o Graph exige fragmentos sequenciais, por isso não há envio
+        de fragmentos em paralelo; o paralelismo possível é o read-ahead.
+        """
+        if chunk_size % UPLOAD_CHUNK_ALIGN:
+            raise ValueError(f"chunk_size deve ser múltiplo de {UPLOAD_CHUNK_ALIGN} bytes")
+
+        fileobj, size, temporary = _as_seekable(source, size, chunk_size)
+        try:
+            if size == 0:
+                return self.upload_small(path, b"", overwrite=overwrite)
+
+            base = fileobj.tell()
+            upload_url = self._create_upload_session(path, overwrite)
+
+            def read_at(offset):
+                fileobj.seek(base + offset)
+                return offset, fileobj.read(min(chunk_size, size - offset))
+
+            resumes = 0
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                pending = pool.submit(read_at, 0)
+                while True:
+                    offset, chunk = pending.result()
+                    end = offset + len(chunk)
+                    pending = pool.submit(read_at, end) if read_ahead and end < size else None
+
+                    headers = {
+                        "Content-Length": str(len(chunk)),
+                        "Content-Range": f"bytes {offset}-{end - 1}/{size}",
+                    }
+                    try:
+                        # A uploadUrl é pré-autenticada: não enviar Authorization
+                        r = self._request("PUT", upload_url, headers=headers, data=chunk, timeout=300)
+                    except requests.exceptions.RequestException:
+                        r = None
+
+                    if r is not None and r.status_code in (200, 201):
+                        item = r.json()
+                        self._remember_path(path, item)
+                        return item
+
+                    if r is not None and r.status_code == 202:
+                        ranges = r.json().get("nextExpectedRanges") or [f"{end}-"]
+                        next_offset = int(ranges[0].split("-")[0])
+                    else:
+                        resumes += 1
+                        if resumes > max_resumes:
+                            if r is not None:
+                                r.raise_for_status()
+                            raise RuntimeError(f"Upload de {path} falhou após {max_resumes} retomadas")
+                        next_offset = self._next_expected_offset(upload_url)
+
+                    if pending is None or next_offset != end:
+                        if pending is not None:
+                            pending.result()
+                        pending = pool.submit(read_at, next_offset)
+        finally:
+            if temporary:
+                fileobj.close()
+
+    def upload_large(self, path: str, local_file, **kw):
+        """Upload de um arquivo local (caminho ou arquivo aberto) via upload session"""
+        if isinstance(local_file, (str, bytes)) or hasattr(local_file, "__fspath__"):
+            with open(local_file, "rb") as fh:
+                return self.upload_stream(path, fh, **kw)
+        return self.upload_stream(path, local_file, **kw)
+
+    def upload(self, path: str, data, overwrite: bool = True, **kw):
+        """Escolhe automaticamente entre PUT simples (< 4MB) e upload session"""
+        if isinstance(data, (bytes, bytearray, memoryview)) and len(data) <= SMALL_UPLOAD_LIMIT:
+            return self.upload_small(path, bytes(data), overwrite=overwrite)
+        fileobj, size, temporary = _as_seekable(data, kw.pop("size", None))
+        try:
+            if size <= SMALL_UPLOAD_LIMIT:
+                return self.upload_small(path, fileobj.read(size), overwrite=overwrite)
+            return self.upload_stream(path, fileobj, size=size, overwrite=overwrite, **kw)
+        finally:
+            if temporary:
+                fileobj.close()
 
     # -------- Conveniências DataFrame --------
+    @contextlib.contextmanager
+    def _excel_source(self, path: str, local: str = None):
+        """Cópia local (content_cache) ou download em arquivo seekable"""
+        if local:
+            yield local
+            return
+        # xlsx é um zip e precisa de arquivo seekable: arquivos grandes vão para disco
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as tmp:
+            self.download_to(path, tmp)
+            tmp.seek(0)
+            yield tmp
+
+    def _excel_engine_for(self, path: str) -> Optional[str]:
+        """
+        Engine para o arquivo: calamine lê todos os formatos (xlsx, xls, xlsb,
+        ods); openpyxl só .xlsx/.xlsm. Nos demais casos retorna None e o
+        pandas escolhe pelo tipo do arquivo.
+        """
+        if self.excel_engine == "calamine" or path.lower().endswith((".xlsx", ".xlsm")):
+            return self.excel_engine
+        return None
+
     def read_excel(self, path: str, **kw) -> pd.DataFrame:
-        """Lê um arquivo Excel do SharePoint/OneDrive como DataFrame"""
-        return pd.read_excel(io.BytesIO(self.download(path)), **kw)
+        """
+        Lê um arquivo Excel do SharePoint/OneDrive como DataFrame.
+        Usa `self.excel_engine` (calamine quando disponível) salvo se `engine`
+        for passado; `usecols` projeta só as colunas pedidas.
+        """
+        engine = self._excel_engine_for(path)
+        if engine:
+            kw.setdefault("engine", engine)
+
+        def parse(local):
+            with self._excel_source(path, local) as src:
+                return pd.read_excel(src, **kw)
+
+        return self._read_frame(path, "excel", kw, parse)
+
+    @contextlib.contextmanager
+    def open_workbook(self, path: str):
+        """
+        pd.ExcelFile do arquivo, baixado uma vez; as abas só são lidas ao
+        chamar book.parse(nome). Útil para ler várias abas do mesmo arquivo.
+        """
+        local = self.fetch_cached(path) if self.content_cache is not None else None
+        engine = self._excel_engine_for(path)
+        with self._excel_source(path, local) as src, pd.ExcelFile(src, engine=engine) as book:
+            yield book
+
+    def list_sheets(self, path: str) -> list:
+        """Nomes das abas, sem ler o conteúdo de nenhuma delas"""
+        with self.open_workbook(path) as book:
+            return list(book.sheet_names)
+
+    def read_sheet(self, path: str, name, usecols=None, **kw) -> pd.DataFrame:
+        """Lê apenas a aba `name` (opcionalmente só as colunas de `usecols`)"""
+        return self.read_excel(path, sheet_name=name, usecols=usecols, **kw)
 
     def read_csv(self, path: str, **kw) -> pd.DataFrame:
-        """Lê um arquivo CSV do SharePoint/OneDrive como DataFrame"""
-        return pd.read_csv(io.BytesIO(self.download(path)), **kw)
+        """Lê um arquivo CSV do SharePoint/OneDrive como DataFrame (direto do stream)"""
+        def parse(local):
+            if local:
+                return pd.read_csv(local, **kw)
+            with self.open_download(path) as fh:
+                return pd.read_csv(fh, **kw)
+
+        return self._read_frame(path, "csv", kw, parse)
+
+    @staticmethod
+    def _write_csv_chunks(frames, fileobj, compression, encoding: str, kw: dict):
+        header = kw.pop("header", True)
+        # O BOM de utf-8-sig só pode aparecer no início do arquivo
+        rest = "utf-8" if encoding.lower().replace("_", "-") == "utf-8-sig" else encoding
+        with _compressed(fileobj, compression) as out:
+            for i, chunk in enumerate(frames):
+                text = chunk.to_csv(header=header if i == 0 else False, **kw)
+                out.write(text.encode(encoding if i == 0 else rest))
+
+    @staticmethod
+    def _write_parquet_chunks(frames, fileobj, compression, chunk_rows: int, kw: dict):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("write_parquet requer pyarrow: pip install pyarrow")
+        writer = None
+        try:
+            for chunk in frames:
+                table = pa.Table.from_pandas(chunk, preserve_index=kw.get("index", False))
+                if writer is None:
+                    writer = pq.ParquetWriter(fileobj, table.schema, compression=compression or "snappy",
+                                              **{k: v for k, v in kw.items() if k != "index"})
+                elif not table.schema.equals(writer.schema):
+                    # Fatias com colunas todas nulas podem inferir outro tipo
+                    table = table.cast(writer.schema)
+                writer.write_table(table, row_group_size=chunk_rows)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def write_dataframe(self, data, path: str, format: str = None, compression: str = None,
+                        chunk_rows: int = DEFAULT_WRITE_CHUNK_ROWS, overwrite: bool = True,
+                        chunk_size: int = DEFAULT_UPLOAD_CHUNK, **kw):
+        """
+        Serializa um DataFrame (ou um iterável de DataFrames, ex.: gerado aos
+        poucos) em fatias de `chunk_rows` linhas e envia via upload session.
+
+        `format` ("csv" ou "parquet") e `compression` ("gzip"/"zstd") são
+        inferidos da extensão quando omitidos (.csv, .csv.gz, .csv.zst,
+        .parquet). No Parquet cada fatia vira um row group e a compressão é
+        a do codec das colunas (padrão snappy). `kw` vai para to_csv ou
+        para o ParquetWriter.
+
+        O resultado é acumulado em um arquivo temporário que transborda para
+        disco acima de SPOOL_MAX_MEMORY, então a memória fica limitada a uma
+        fatia mais o buffer. O Graph exige o tamanho total em cada
+        Content-Range, por isso o envio começa quando a serialização termina;
+        durante o envio o próximo fragmento é lido em paralelo (read-ahead).
+        """
+        inferred_format, inferred_compression = _infer_format(path)
+        format = format or inferred_format
+        frames = _iter_frames(data, chunk_rows)
+
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as tmp:
+            if format == "csv":
+                kw.setdefault("index", False)
+                encoding = kw.pop("encoding", None) or "utf-8"
+                self._write_csv_chunks(frames, tmp, compression or inferred_compression, encoding, kw)
+            elif format == "parquet":
+                self._write_parquet_chunks(frames, tmp, compression, chunk_rows, kw)
+            else:
+                raise ValueError(f"Formato não suportado: {format}")
+            tmp.seek(0)
+            return self.upload(path, tmp, overwrite=overwrite, chunk_size=chunk_size)
+
+    def write_csv(self, data, path: str, compression: str = None, overwrite: bool = True, **kw):
+        """Salva um DataFrame como CSV (opcionalmente gzip/zstd) no SharePoint/OneDrive"""
+        return self.write_dataframe(data, path, format="csv", compression=compression,
+                                    overwrite=overwrite, **kw)
+
+    def write_parquet(self, data, path: str, compression: str = "snappy", overwrite: bool = True, **kw):
+        """Salva um DataFrame como Parquet (um row group por fatia) no SharePoint/OneDrive"""
+        return self.write_dataframe(data, path, format="parquet", compression=compression,
+                                    overwrite=overwrite, **kw)
+
+    def iter_csv(self, path: str, chunksize: int = 100_000, usecols=None, dtype=None,
+                 engine: str = "pandas", block_size: int = 16 * 1024 * 1024, **kw):
+        """
+        Lê um CSV em lotes, gerando um DataFrame por vez direto do stream
+        HTTP (ou da cópia local, com content_cache). A memória fica limitada a
+        um lote, então agregações sobre arquivos de vários GB rodam em memória
+        constante:
+
+            total = sum(chunk["valor"].sum() for chunk in sp.iter_csv("x.csv", usecols=["valor"]))
+
+        engine="pandas" usa read_csv(chunksize=...). engine="pyarrow" usa o
+        leitor CSV em streaming do pyarrow (mais rápido, multi-thread); os
+        lotes têm ~`block_size` bytes e `kw` vai para ReadOptions/ParseOptions
+        (delimiter, skip_rows, ...).
+        """
+        local = self.fetch_cached(path) if self.content_cache is not None else None
+        with (open(local, "rb") if local else self.open_download(path)) as fh:
+            if engine == "pandas":
+                with pd.read_csv(fh, chunksize=chunksize, usecols=usecols, dtype=dtype, **kw) as reader:
+                    yield from reader
+            elif engine == "pyarrow":
+                yield from self._iter_csv_arrow(fh, usecols, dtype, block_size, kw)
+            else:
+                raise ValueError(f"Engine não suportada: {engine}")
+
+    @staticmethod
+    def _iter_csv_arrow(fh, usecols, dtype, block_size: int, kw: dict):
+        try:
+            import pyarrow as pa
+            from pyarrow import csv as pacsv
+        except ImportError:
+            raise ImportError("engine='pyarrow' requer pyarrow: pip install pyarrow")
+        parse_keys = {"delimiter", "quote_char", "escape_char", "newlines_in_values"}
+        read_opts = pacsv.ReadOptions(block_size=block_size,
+                                      **{k: v for k, v in kw.items() if k not in parse_keys})
+        parse_opts = pacsv.ParseOptions(**{k: v for k, v in kw.items() if k in parse_keys})
+        # Tipos pyarrow vão direto para o parser; tipos pandas são aplicados em cada lote
+        if isinstance(dtype, dict):
+            arrow_types = {c: t for c, t in dtype.items() if isinstance(t, pa.DataType)}
+            pandas_types = {c: t for c, t in dtype.items() if c not in arrow_types}
+        else:
+            arrow_types, pandas_types = {}, dtype
+        convert_opts = pacsv.ConvertOptions(include_columns=list(usecols) if usecols else None,
+                                            column_types=arrow_types or None)
+        reader = pacsv.open_csv(fh, read_options=read_opts, parse_options=parse_opts,
+                                convert_options=convert_opts)
+        for batch in reader:
+            frame = batch.to_pandas()
+            yield frame.astype(pandas_types) if pandas_types else frame
 
     def write_excel(self, df: pd.DataFrame, path: str, overwrite: bool = True):
         """Salva um DataFrame como Excel no SharePoint/OneDrive"""
-        bio = io.BytesIO()
-        df.to_excel(bio, index=False)
-        return self.upload_small(path, bio.getvalue(), overwrite=overwrite)
+        # Arquivos grandes transbordam para disco em vez de ficarem na memória
+        with tempfile.SpooledTemporaryFile(max_size=SMALL_UPLOAD_LIMIT) as tmp:
+            df.to_excel(tmp, index=False)
+            tmp.seek(0)
+            return self.upload(path, tmp, overwrite=overwrite)
+
+
+_connectors_lock = threading.Lock()
+_connectors: "OrderedDict[tuple, SPConnector]" = OrderedDict()
+MAX_CONNECTORS = 32
+
+
+def _config_key(value):
+    """Valores simples entram na chave pelo valor; objetos, pela identidade"""
+    if value is None or isinstance(value, (str, int, float, bool, tuple)):
+        return value
+    return (type(value).__name__, id(value))
+
+
+def get_sp_connector(tenant_id, client_id, client_secret,
+                     hostname=None, site_path=None, library_name=None, user_upn=None,
+                     **kw) -> SPConnector:
+    """
+    SPConnector compartilhado pelo processo, um por (tenant, client, credencial,
+    site/biblioteca ou UPN). Todos os conectores da mesma credencial usam o
+    mesmo token app-only. Parâmetros extras entram na chave pelo valor
+    (ex.: excel_engine) ou, se forem objetos (caches, transporte...), pela
+    identidade: passe objetos do processo (get_*), não recriados a cada rerun.
+    O registro guarda no máximo MAX_CONNECTORS conectores (LRU).
+    """
+    key = (
+        tenant_id, client_id, msal_registry.credential_fingerprint(client_secret),
+        (hostname or "").lower(), (site_path or "").strip("/").lower(),
+        (library_name or "").lower(), (user_upn or "").lower(),
+        tuple(sorted((k, _config_key(v)) for k, v in kw.items())),
+    )
+    with _connectors_lock:
+        connector = _connectors.get(key)
+        if connector is None:
+            connector = SPConnector(tenant_id, client_id, client_secret,
+                                    hostname=hostname, site_path=site_path,
+                                    library_name=library_name, user_upn=user_upn, **kw)
+            _connectors[key] = connector
+            while len(_connectors) > MAX_CONNECTORS:
+                _connectors.popitem(last=False)
+        _connectors.move_to_end(key)
+        return connector
@@ -0,0 +1,203 @@
+"""
+Variante asyncio do SPConnector (httpx)
+
+AsyncSPConnector reaproveita um SPConnector síncrono para token app-only,
+normalização de caminhos, descoberta de site/drive e política de retry
+(buckets, breaker e métricas compartilhados). As transferências usam o
+httpx.AsyncClient compartilhado do event loop (graph_async), permitindo
+muitas requisições concorrentes a partir de uma única thread. As APIs de
+múltiplos arquivos respeitam o teto `max_concurrency` da RetryPolicy, como
+as do conector síncrono.
+
+Uso a partir do Streamlit:
+```python
+from graph_async import run_sync
+from sp_connector_async import AsyncSPConnector
+
+asp = AsyncSPConnector(connector=get_sp_connector())
+dfs = run_sync(asp.read_csv_many(["Pasta/a.csv", "Pasta/b.csv"]))
+```
+"""
+
+import asyncio
+import io
+from functools import partial
+from typing import Optional
+
+import pandas as pd
+
+from graph_async import RETRY_EXCEPTIONS, get_async_client
+from sp_connector import (
+    DEFAULT_UPLOAD_CHUNK,
+    LIST_SELECT,
+    LOCATION_SELECT,
+    SMALL_UPLOAD_LIMIT,
+    DriveItem,
+    SPConnector,
+)
+
+
+class AsyncSPConnector:
+    """Conector SharePoint/OneDrive assíncrono (mesmos parâmetros do SPConnector)"""
+
+    def __init__(self, *args, connector: SPConnector = None, **kw):
+        self.sync = connector or SPConnector(*args, **kw)
+
+    @staticmethod
+    async def _in_thread(fn, *args, **kw):
+        """Executa código bloqueante (MSAL, pandas) fora do event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(fn, *args, **kw))
+
+    async def _headers(self) -> dict:
+        return await self._in_thread(self.sync._headers)
+
+    async def _item_url(self, path: str) -> str:
+        # A descoberta do drive é cacheada no conector síncrono
+        return await self._in_thread(self.sync._item_url, path)
+
+    async def _indexed_item_url(self, path: str):
+        # Índice caminho -> id compartilhado com o conector síncrono
+        return await self._in_thread(self.sync._indexed_item_url, path)
+
+    async def _request(self, method: str, url: str, **kw):
+        client = get_async_client()
+        return await self.sync.retry_policy.execute_async(
+            self.sync.tenant_id,
+            lambda: client.request(method, url, **kw),
+            retry_exceptions=RETRY_EXCEPTIONS,
+        )
+
+    # -------- Download / Upload --------
+    async def download(self, path: str) -> bytes:
+        """Baixa o conteúdo de um arquivo como bytes"""
+        url, by_id = await self._indexed_item_url(path)
+        headers = await self._headers()
+        r = None
+        if by_id:
+            # Por id: metadados com downloadUrl confirmam que o item ainda está em `path`
+            params = {"$select": f"id,@microsoft.graph.downloadUrl,{LOCATION_SELECT}"}
+            meta = await self._request("GET", url, headers=headers, params=params, timeout=30)
+            if meta.status_code != 404:
+                meta.raise_for_status()
+                item = meta.json()
+                download_url = item.get("@microsoft.graph.downloadUrl")
+                if self.sync._same_location(item, path) and download_url:
+                    # downloadUrl é pré-autenticada: sem Authorization
+                    r = await self._request("GET", download_url, timeout=180)
+            if r is None:
+                # Id desatualizado (excluído, substituído, renomeado ou movido): repete pelo caminho
+                self.sync._forget_path(path)
+                url = await self._item_url(path)
+        if r is None:
+            r = await self._request("GET", f"{url}/content", headers=headers, timeout=180)
+        if r.status_code == 404:
+            raise FileNotFoundError(path)
+        r.raise_for_status()
+        return r.content
+
+    async def upload(self, path: str, content: bytes, overwrite: bool = True,
+                     chunk_size: int = DEFAULT_UPLOAD_CHUNK, max_resumes: int = 5):
+        """Upload: PUT simples até 4 MB, upload session (em fragmentos) acima disso"""
+        item_url = await self._item_url(path)
+        conflict = "replace" if overwrite else "fail"
+        headers = await self._headers()
+
+        if len(content) <= SMALL_UPLOAD_LIMIT:
+            r = await self._request("PUT", f"{item_url}/content", headers=headers,
+                                    params={"@microsoft.graph.conflictBehavior": conflict},
+                                    content=content, timeout=300)
+            r.raise_for_status()
+            item = r.json()
+            self.sync._remember_path(path, item)
+            return item
+
+        r = await self._request("POST", f"{item_url}/createUploadSession", headers=headers,
+                                json={"item": {"@microsoft.graph.conflictBehavior": conflict}}, timeout=60)
+        r.raise_for_status()
+        upload_url = r.json()["uploadUrl"]
+
+        size = len(content)
+        view = memoryview(content)
+        offset = 0
+        resumes = 0
+        while True:
+            end = min(offset + chunk_size, size)
+            r = await self._request("PUT", upload_url, content=bytes(view[offset:end]), timeout=300, headers={
+                "Content-Length": str(end - offset),
+                "Content-Range": f"bytes {offset}-{end - 1}/{size}",
+            })
+            if r.status_code in (200, 201):
+                item = r.json()
+                self.sync._remember_path(path, item)
+                return item
+            if r.status_code != 202:
+                # Retoma de onde o servidor parou
+                resumes += 1
+                if resumes > max_resumes:
+                    r.raise_for_status()
+                    raise RuntimeError(f"Upload de {path} falhou após {max_resumes} retomadas")
+                status = await self._request("GET", upload_url, timeout=60)
+                status.raise_for_status()
+                ranges = status.json().get("nextExpectedRanges")
+                if not ranges:
+                    r.raise_for_status()
+                offset = int(ranges[0].split("-")[0])
+                continue
+            ranges = r.json().get("nextExpectedRanges") or [f"{end}-"]
+            offset = int(ranges[0].split("-")[0])
+
+    # -------- Listagem --------
+    async def list_children(self, path: str = "", page_size: int = 200, select: str = LIST_SELECT) -> list:
+        """Itens de uma pasta como DriveItem (segue @odata.nextLink)"""
+        url = await self._in_thread(self.sync._children_url, path)
+        parent = self.sync.normalize_path(path).strip("/") if path.strip("/") else ""
+        params = {"$select": select, "$top": page_size}
+        items = []
+        while url:
+            r = await self._request("GET", url, headers=await self._headers(), params=params, timeout=60)
+            if r.status_code == 404:
+                raise FileNotFoundError(path)
+            r.raise_for_status()
+            data = r.json()
+            page = [DriveItem.from_graph(item, parent) for item in data.get("value", [])]
+            self.sync.path_index.put_many(self.sync._cache_scope(), ((i.path, i.id) for i in page))
+            items.extend(page)
+            url, params = data.get("@odata.nextLink"), None
+        return items
+
+    # -------- Conveniências DataFrame --------
+    async def read_csv(self, path: str, **kw) -> pd.DataFrame:
+        content = await self.download(path)
+        return await self._in_thread(pd.read_csv, io.BytesIO(content), **kw)
+
+    async def read_excel(self, path: str, **kw) -> pd.DataFrame:
+        content = await self.download(path)
+        engine = self.sync._excel_engine_for(path)
+        if engine:
+            kw.setdefault("engine", engine)
+        return await self._in_thread(pd.read_excel, io.BytesIO(content), **kw)
+
+    # -------- Múltiplos arquivos --------
+    async def _gather(self, fn, paths, concurrency: Optional[int]) -> list:
+        # Cada tarefa segura a vaga durante a transferência inteira
+        semaphore = asyncio.Semaphore(self.sync._workers(concurrency))
+
+        async def one(p):
+            async with semaphore:
+                return await fn(p)
+
+        return await asyncio.gather(*(one(p) for p in paths), return_exceptions=True)
+
+    async def download_many(self, paths, concurrency: Optional[int] = None) -> list:
+        """
+        Downloads concorrentes; erros voltam como Exception na posição do
+        arquivo. `concurrency` padrão (e máximo) é o max_concurrency da RetryPolicy.
+        """
+        return await self._gather(self.download, list(paths), concurrency)
+
+    async def read_csv_many(self, paths, concurrency: Optional[int] = None, **kw) -> list:
+        return await self._gather(lambda p: self.read_csv(p, **kw), list(paths), concurrency)
+
+    async def read_excel_many(self, paths, concurrency: Optional[int] = None, **kw) -> list:
+        return await self._gather(lambda p: self.read_excel(p, **kw), list(paths), concurrency)
@@ -0,0 +1,141 @@
+"""
+Índice caminho -> drive item id para o SPConnector
+
+Resolver `root:/caminho:` custa trabalho no servidor a cada chamada, e cada
+instância do conector refazia a descoberta de site/drive. O PathIndex guarda,
+por escopo (site/biblioteca ou OneDrive), os ids já conhecidos de caminhos
+normalizados e os ids de site/drive descobertos. As entradas expiram por TTL
+e são invalidadas quando uma chamada por id retorna 404 ou um item que foi
+renomeado/movido (o id sobrevive a ambos) para outro caminho.
+
+O índice padrão é compartilhado pelo processo; com `path` ele também é
+persistido em SQLite e sobrevive a restarts.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class PathIndex:
+    """Mapa thread-safe (escopo, caminho) -> item id com TTL e LRU"""
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 100000,
+                 discovery_ttl: float = 24 * 3600, path: Optional[str] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.discovery_ttl = discovery_ttl
+        self._items: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._discovery: Dict[str, Tuple[Optional[str], str, float]] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS path_index ("
+                    "scope TEXT, path TEXT, item_id TEXT, stored REAL, PRIMARY KEY (scope, path))"
+                )
+
+    @staticmethod
+    def _key(path: str) -> str:
+        # O Graph trata caminhos sem diferenciar maiúsculas/minúsculas
+        return path.strip("/").lower()
+
+    # -------- Itens --------
+    def get(self, scope: str, path: str) -> Optional[str]:
+        key = (scope, self._key(path))
+        now = time.time()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None and self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT item_id, stored FROM path_index WHERE scope = ? AND path = ?", key
+                ).fetchone()
+                if row:
+                    entry = (row[0], row[1])
+                    self._items[key] = entry
+            if entry is None:
+                return None
+            if now - entry[1] > self.ttl:
+                self._items.pop(key, None)
+                return None
+            self._items.move_to_end(key)
+            return entry[0]
+
+    def put(self, scope: str, path: str, item_id: str):
+        if not item_id:
+            return
+        key = (scope, self._key(path))
+        entry = (item_id, time.time())
+        with self._lock:
+            self._items[key] = entry
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO path_index (scope, path, item_id, stored) VALUES (?, ?, ?, ?)",
+                        key + entry,
+                    )
+
+    def put_many(self, scope: str, entries):
+        """Registra vários pares (caminho, item id) de uma vez (ex.: página de listagem)"""
+        now = time.time()
+        rows = [(scope, self._key(path), item_id, now) for path, item_id in entries if item_id]
+        if not rows:
+            return
+        with self._lock:
+            for row in rows:
+                self._items[row[:2]] = row[2:]
+                self._items.move_to_end(row[:2])
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO path_index (scope, path, item_id, stored) VALUES (?, ?, ?, ?)",
+                        rows,
+                    )
+
+    def invalidate(self, scope: str, path: str):
+        key = (scope, self._key(path))
+        with self._lock:
+            self._items.pop(key, None)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM path_index WHERE scope = ? AND path = ?", key)
+
+    # -------- Descoberta de site/drive --------
+    def get_discovery(self, scope: str) -> Tuple[Optional[str], Optional[str]]:
+        """(site_id, drive_id) descobertos para o escopo, se ainda válidos"""
+        with self._lock:
+            entry = self._discovery.get(scope)
+            if entry is None or time.time() - entry[2] > self.discovery_ttl:
+                return None, None
+            return entry[0], entry[1]
+
+    def put_discovery(self, scope: str, site_id: Optional[str], drive_id: Optional[str]):
+        with self._lock:
+            old_site, old_drive, _ = self._discovery.get(scope, (None, None, 0))
+            self._discovery[scope] = (site_id or old_site, drive_id or old_drive, time.time())
+
+    def invalidate_discovery(self, scope: str):
+        with self._lock:
+            self._discovery.pop(scope, None)
+
+
+_lock = threading.Lock()
+_default_index: Optional[PathIndex] = None
+
+
+def get_path_index() -> PathIndex:
+    """Índice compartilhado por todos os SPConnector do processo"""
+    global _default_index
+    with _lock:
+        if _default_index is None:
+            _default_index = PathIndex()
+        return _default_index
@@ -0,0 +1,116 @@
+import io
+import os
+import sys
+
+import pytest
+import requests
+
+# Os módulos do projeto ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_throttle import RetryPolicy  # noqa: E402
+from sp_connector import SPConnector  # noqa: E402
+from sp_index import PathIndex  # noqa: E402
+
+
+class FakeResponse:
+    """O subconjunto de requests.Response usado pelos módulos"""
+
+    def __init__(self, status_code=200, body=None, content=b"", headers=None, fail_after=None):
+        self.status_code = status_code
+        self._body = body
+        self.content = content
+        self.headers = headers or {}
+        self.fail_after = fail_after  # corpo interrompido após N bytes
+        self.closed = False
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def raw(self):
+        # Corpo como arquivo (urllib3 HTTPResponse), usado por open_download
+        return io.BytesIO(self.content)
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code), response=self)
+
+    def iter_content(self, chunk_size=None):
+        content = self.content if self.fail_after is None else self.content[:self.fail_after]
+        step = chunk_size or len(content) or 1
+        for start in range(0, len(content), step):
+            yield content[start:start + step]
+        if self.fail_after is not None:
+            raise requests.exceptions.ChunkedEncodingError("conexão interrompida")
+
+    def close(self):
+        self.closed = True
+
+
+class FakeTransport:
+    """
+    Transporte falso (interface de HttpTransport). `handler(method, url, **kw)`
+    devolve os argumentos de uma FakeResponse (dict) ou a própria resposta.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []  # (método, url, kw)
+
+    def request(self, method, url, **kw):
+        self.calls.append((method, url, kw))
+        result = self.handler(method, url, **kw)
+        return result if isinstance(result, FakeResponse) else FakeResponse(**result)
+
+    def get(self, url, **kw):
+        return self.request("GET", url, **kw)
+
+    def put(self, url, **kw):
+        return self.request("PUT", url, **kw)
+
+    def post(self, url, **kw):
+        return self.request("POST", url, **kw)
+
+
+class FakeTokens:
+    """Token provider app-only falso"""
+
+    def token(self):
+        return "token"
+
+
+@pytest.fixture
+def fake_transport():
+    """Fábrica: fake_transport(handler) -> FakeTransport"""
+    return FakeTransport
+
+
+@pytest.fixture
+def tokens():
+    return FakeTokens()
+
+
+@pytest.fixture
+def make_connector(tokens):
+    """
+    Fábrica de SPConnector (OneDrive de u@example.com) sem rede: `transport`
+    é um handler (vira FakeTransport) ou um transporte pronto; sem esperas
+    na RetryPolicy e com índice de caminhos próprio.
+    """
+    def make(transport=None, max_concurrency=32, **kw):
+        if transport is None:
+            transport = object()
+        elif not hasattr(transport, "request"):
+            transport = FakeTransport(transport)
+        kw.setdefault("retry_policy", RetryPolicy(sleep=lambda s: None, max_concurrency=max_concurrency))
+        kw.setdefault("path_index", PathIndex())
+        kw.setdefault("token_provider", tokens)
+        kw.setdefault("excel_engine", "openpyxl")
+        return SPConnector("tenant", "client", "secret", user_upn="u@example.com", transport=transport, **kw)
+
+    return make
@@ -0,0 +1,43 @@
+import pytest
+
+from auth_flow import FlowStore, SQLiteFlowStore
+
+
+def make_flow(state):
+    return {"state": state, "nonce": "n", "code_verifier": "v", "scope": ["User.Read"],
+            "auth_uri": f"https://login.example/authorize?state={state}"}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return FlowStore()
+    return SQLiteFlowStore(str(tmp_path / "sessions.sqlite"))
+
+
+def test_flow_is_consumed_once(store):
+    store.put(make_flow("s1"))
+    assert store.get("s1") == make_flow("s1")
+    assert store.pop("s1") == make_flow("s1")
+    assert store.pop("s1") is None
+    assert store.get("s1") is None
+
+
+def test_expired_flow_is_rejected(store):
+    store.ttl = -1
+    store.put(make_flow("s1"))
+    assert store.get("s1") is None
+    assert store.pop("s1") is None
+
+
+def test_missing_state(store):
+    assert store.pop(None) is None
+    assert store.get("") is None
+
+
+def test_sqlite_flow_visible_to_other_workers(tmp_path):
+    path = str(tmp_path / "sessions.sqlite")
+    worker_a, worker_b = SQLiteFlowStore(path), SQLiteFlowStore(path)
+    worker_a.put(make_flow("s1"))
+    assert worker_b.pop("s1") == make_flow("s1")
+    assert worker_a.pop("s1") is None
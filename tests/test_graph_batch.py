@@ -0,0 +1,94 @@
+import pytest
+
+from graph_batch import execute_batch
+
+
+class FakeGraph:
+    """Simula /$batch: `outcomes[id]` é a lista de status devolvidos a cada envio"""
+
+    def __init__(self, outcomes):
+        self.outcomes = {k: list(v) for k, v in outcomes.items()}
+        self.payloads = []
+
+    def handle(self, method, url, json=None, **kw):
+        self.payloads.append(json["requests"])
+        status = {}
+        responses = []
+        for sub in json["requests"]:
+            if any(status.get(d, 200) >= 400 for d in sub.get("dependsOn", [])):
+                code = 424
+            else:
+                code = self.outcomes[sub["id"]].pop(0)
+            status[sub["id"]] = code
+            responses.append({"id": sub["id"], "status": code, "headers": {"Retry-After": "0"}, "body": {}})
+        return {"body": {"responses": responses}}
+
+
+def req(rid, depends=None):
+    r = {"id": rid, "method": "GET", "url": f"/items/{rid}"}
+    if depends:
+        r["dependsOn"] = depends
+    return r
+
+
+@pytest.fixture
+def batch(fake_transport):
+    """batch(graph, requests, **kw) -> sub-respostas de execute_batch contra o FakeGraph"""
+    def batch(graph, requests, **kw):
+        transport = fake_transport(graph.handle)
+
+        def post(payload):
+            return transport.post("https://graph.example/$batch", json=payload)
+
+        return execute_batch(post, requests, sleep=lambda s: None, **kw)
+
+    return batch
+
+
+@pytest.fixture
+def run(batch):
+    def run(graph, requests, **kw):
+        return [r["status"] for r in batch(graph, requests, **kw)]
+
+    return run
+
+
+def test_throttled_requests_are_retried_alone(run):
+    graph = FakeGraph({"1": [200], "2": [429, 200]})
+    assert run(graph, [req("1"), req("2")]) == [200, 200]
+    assert [[s["id"] for s in p] for p in graph.payloads] == [["1", "2"], ["2"]]
+
+
+def test_failed_dependency_is_final(run):
+    graph = FakeGraph({"1": [403], "2": [201]})
+    assert run(graph, [req("1"), req("2", ["1"])]) == [403, 424]
+    assert len(graph.payloads) == 1
+
+
+def test_dependency_retried_together_with_its_dependent(run):
+    graph = FakeGraph({"1": [429, 200], "2": [201]})
+    assert run(graph, [req("1"), req("2", ["1"])]) == [200, 201]
+    assert graph.payloads[1] == [req("1"), req("2", ["1"])]
+
+
+def test_dependent_of_exhausted_retry_is_not_sent(run):
+    graph = FakeGraph({"1": [429, 429], "2": [201]})
+    assert run(graph, [req("1"), req("2", ["1"])], max_retries=1) == [429, 424]
+
+
+def test_dependency_from_previous_chunk(run):
+    outcomes = {str(i): [200] for i in range(20)}
+    outcomes["0"] = [403]
+    outcomes["20"] = [201]
+    outcomes["21"] = [201]
+    graph = FakeGraph(outcomes)
+    requests = [req(str(i)) for i in range(20)] + [req("20", ["0"]), req("21", ["1"])]
+    statuses = run(graph, requests)
+    assert statuses[20:] == [424, 201]
+    assert graph.payloads[1] == [req("21")]
+
+
+def test_results_keep_input_order(batch):
+    graph = FakeGraph({"b": [200], "a": [204]})
+    results = batch(graph, [req("b"), req("a")])
+    assert [r["id"] for r in results] == ["b", "a"]
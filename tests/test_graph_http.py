@@ -0,0 +1,97 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from graph_http import HttpTransport
+
+
+class LocalServer:
+    """Servidor HTTP/1.1 local que conta conexões e responde `statuses` em sequência"""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.connections = 0
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                server.connections += 1
+                super().setup()
+
+            def do_GET(self):
+                server.requests += 1
+                status = server.statuses.pop(0) if server.statuses else 200
+                body = b"ok"
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(statuses=()):
+        servers.append(LocalServer(statuses))
+        return servers[-1]
+
+    yield start
+    for s in servers:
+        s.close()
+
+
+def test_connections_are_reused(server):
+    srv = server()
+    transport = HttpTransport()
+    for _ in range(10):
+        assert transport.get(srv.url).status_code == 200
+    assert srv.requests == 10
+    assert srv.connections == 1
+    transport.close()
+
+
+def test_transient_5xx_is_retried(server):
+    srv = server([502, 502])
+    transport = HttpTransport(backoff_factor=0)
+    assert transport.get(srv.url).status_code == 200
+    assert srv.requests == 3
+    transport.close()
+
+
+def test_final_5xx_is_returned_not_raised(server):
+    srv = server([500] * 10)
+    transport = HttpTransport(max_retries=2, backoff_factor=0)
+    assert transport.get(srv.url).status_code == 500
+    assert srv.requests == 3
+    transport.close()
+
+
+def test_timeouts():
+    transport = HttpTransport(connect_timeout=3, read_timeout=20)
+    assert transport._timeout(None) == (3, 20)
+    assert transport._timeout(7) == (3, 7)
+    assert transport._timeout((1, 2)) == (1, 2)
+
+
+def test_policy_transport_does_not_retry_on_status(server):
+    srv = server([429, 503, 502])
+    transport = HttpTransport(retry_status=False, backoff_factor=0)
+    assert [transport.get(srv.url).status_code for _ in range(3)] == [429, 503, 502]
+    assert srv.requests == 3
+    transport.close()
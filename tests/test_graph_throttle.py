@@ -0,0 +1,159 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from graph_http import HttpTransport, get_policy_transport
+from graph_throttle import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+class FakeGraphServer:
+    """Servidor HTTP local que responde `statuses` em sequência (depois 200)"""
+
+    def __init__(self, statuses, retry_after="0"):
+        self.statuses = list(statuses)
+        self.retry_after = retry_after
+        self.hits = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.hits += 1
+                status = server.statuses.pop(0) if server.statuses else 200
+                body = b'{"ok": true}' if status == 200 else b'{"error": {"code": "TooManyRequests"}}'
+                self.send_response(status)
+                if status in (429, 503) and server.retry_after is not None:
+                    self.send_header("Retry-After", server.retry_after)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1.0/me"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def graph_server():
+    servers = []
+
+    def start(statuses, retry_after="0"):
+        server = FakeGraphServer(statuses, retry_after)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def test_retries_429_until_success(graph_server):
+    server = graph_server([429, 429, 429])
+    policy = RetryPolicy(max_attempts=5, sleep=lambda s: None)
+    response = policy.execute("tenant", lambda: get_policy_transport().get(server.url, timeout=5))
+    assert response.status_code == 200
+    assert server.hits == 4
+    assert policy.metrics.snapshot()["throttled"] == 3
+
+
+def test_throttling_does_not_open_breaker(graph_server):
+    server = graph_server([429] * 8 + [503] * 4)
+    policy = RetryPolicy(max_attempts=20, failure_threshold=3, sleep=lambda s: None)
+    response = policy.execute("tenant", lambda: get_policy_transport().get(server.url, timeout=5))
+    assert response.status_code == 200
+    assert policy.breaker("tenant").state == "closed"
+    assert policy.metrics.snapshot()["breaker_trips"] == 0
+
+
+def test_retry_after_is_honored(graph_server):
+    server = graph_server([429], retry_after="0.2")
+    policy = RetryPolicy(sleep=time.sleep)
+    started = time.monotonic()
+    response = policy.execute("tenant", lambda: get_policy_transport().get(server.url, timeout=5))
+    assert response.status_code == 200
+    assert time.monotonic() - started >= 0.2
+
+
+def test_last_throttled_response_is_returned(graph_server):
+    server = graph_server([429] * 5)
+    policy = RetryPolicy(max_attempts=3, sleep=lambda s: None)
+    response = policy.execute("tenant", lambda: get_policy_transport().get(server.url, timeout=5))
+    assert response.status_code == 429
+    assert server.hits == 3
+
+
+def test_server_errors_open_breaker(graph_server):
+    server = graph_server([503] * 10, retry_after=None)
+    policy = RetryPolicy(max_attempts=10, failure_threshold=3, sleep=lambda s: None)
+    with pytest.raises(CircuitOpenError):
+        policy.execute("tenant", lambda: get_policy_transport().get(server.url, timeout=5))
+    assert server.hits == 3
+    assert policy.metrics.snapshot()["breaker_trips"] == 1
+
+
+def test_half_open_admits_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    assert breaker.allow()  # sonda
+    assert not breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.record_failure()
+    assert not breaker.allow()
+
+
+def test_throttled_probe_releases_slot(graph_server):
+    server = graph_server([429])
+    policy = RetryPolicy(failure_threshold=1, reset_timeout=0, sleep=lambda s: None)
+    policy.breaker("tenant").record_failure()
+    response = policy.execute("tenant", lambda: get_policy_transport().get(server.url, timeout=5))
+    assert response.status_code == 200
+    assert policy.breaker("tenant").state == "closed"
+
+
+def test_policy_sees_throttling_through_transport(graph_server):
+    server = graph_server([429, 429])
+    policy = RetryPolicy(sleep=lambda s: None)
+    blocked = []
+    bucket = policy.bucket("tenant")
+    original = bucket.block_for
+    bucket.block_for = lambda seconds: (blocked.append(seconds), original(seconds))
+    response = policy.execute("tenant", lambda: get_policy_transport().get(server.url, timeout=5))
+    assert response.status_code == 200
+    assert server.hits == 3
+    snapshot = policy.metrics.snapshot()
+    assert snapshot["throttled"] == 2 and snapshot["retries"] == 2
+    assert blocked == [0.0, 0.0]  # Retry-After pausou o bucket do tenant
+
+
+def test_status_retrying_transport_hides_throttling(graph_server):
+    # Por isso o SPConnector usa get_policy_transport(): com retries por status
+    # o urllib3 consome os 429 e a política não vê nada
+    server = graph_server([429, 429])
+    policy = RetryPolicy(sleep=lambda s: None)
+    transport = HttpTransport(backoff_factor=0)
+    response = policy.execute("tenant", lambda: transport.get(server.url, timeout=5))
+    assert response.status_code == 200 and server.hits == 3
+    assert policy.metrics.snapshot()["throttled"] == 0
+    transport.close()
@@ -0,0 +1,33 @@
+from html import escape
+
+import auth_microsoft
+from auth_microsoft import LOGIN_CONFIG, render_login_card
+
+URL = "https://login.example/authorize?state=a&b=<c>"
+
+
+def test_only_the_login_url_changes_between_requests(monkeypatch):
+    builds = []
+    build = auth_microsoft._build_login_template
+    monkeypatch.setattr(auth_microsoft, "_build_login_template",
+                        lambda config, state: builds.append(state) or build(config, state))
+    monkeypatch.setattr(auth_microsoft, "_login_templates", {})
+    config = dict(LOGIN_CONFIG)
+
+    first = render_login_card(config, 0, URL)
+    second = render_login_card(config, 0, URL + "&n=2")
+
+    assert builds == [0]
+    assert 'href="https://login.example/authorize?state=a&amp;b=&lt;c&gt;"' in first
+    assert first.replace(escape(URL), "") == second.replace(escape(URL + "&n=2"), "")
+
+
+def test_attempt_states_and_config_changes_rebuild():
+    config = dict(LOGIN_CONFIG)
+    assert "Tentativa" not in render_login_card(config, 0, URL)
+    assert "Tentativa 1" in render_login_card(config, 1, URL)
+    assert render_login_card(config, 5, URL) == render_login_card(config, 3, URL)
+
+    config["title"] = "Outro Título"
+    assert "Outro Título" in render_login_card(config, 0, URL)
+    assert "Outro Título" in render_login_card(dict(config, highlights=[]), 0, URL)
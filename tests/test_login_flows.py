@@ -0,0 +1,62 @@
+import logging
+import time
+
+from auth_flow import FlowPool, FlowStore
+from auth_microsoft import MicrosoftAuth
+
+
+class FakeApp:
+    def __init__(self):
+        self.calls = []
+
+    def get_authorization_request_url(self, scopes, redirect_uri=None, prompt=None):
+        self.calls.append(("url", tuple(scopes), redirect_uri))
+        return f"https://login.example/authorize?redirect_uri={redirect_uri}"
+
+    def acquire_token_by_authorization_code(self, code, scopes=None, redirect_uri=None):
+        self.calls.append(("code", code, redirect_uri))
+        return {"access_token": "at", "refresh_token": "rt", "expires_in": 3600}
+
+    def initiate_auth_code_flow(self, scopes, redirect_uri=None, prompt=None):
+        raise AssertionError("o par legado não usa fluxos PKCE")
+
+
+class FakeCache:
+    def save_partition(self, home_account_id, force=False):
+        pass
+
+
+def make_auth(monkeypatch):
+    auth = MicrosoftAuth.__new__(MicrosoftAuth)
+    auth.client_id, auth.tenant_id = "client", "tenant"
+    auth.authority = "https://login.example/tenant"
+    auth.redirect_uri = "http://localhost:8501"
+    auth.scope = ["User.Read"]
+    auth.token_cache = FakeCache()
+    auth.flow_store = FlowStore()
+    app = FakeApp()
+    monkeypatch.setattr(auth, "_get_app", lambda: app)
+    return auth, app
+
+
+def test_legacy_login_url_and_code_pair(monkeypatch):
+    auth, app = make_auth(monkeypatch)
+    url = auth.get_login_url()
+    assert "code_challenge" not in url
+    assert auth.get_token_from_code("the-code")["access_token"] == "at"
+    assert [c[0] for c in app.calls] == ["url", "code"]
+    assert app.calls[1][2] == auth.redirect_uri
+
+
+def test_pool_refill_errors_are_logged(caplog):
+    def broken():
+        raise RuntimeError("authority indisponível")
+
+    pool = FlowPool(broken, size=2, low_water=1)
+    with caplog.at_level(logging.ERROR, logger="auth_flow"):
+        pool._refill_async()
+        for _ in range(100):
+            if not pool._refilling:
+                break
+            time.sleep(0.01)
+    assert "authority indisponível" in caplog.text
@@ -0,0 +1,61 @@
+import jwt
+import pytest
+
+from auth_microsoft import MicrosoftAuth
+from profile_cache import get_profile_cache
+
+
+def graph_token(oid):
+    # Tokens Graph não podem ser verificados localmente: a assinatura é irrelevante aqui
+    return jwt.encode({"oid": oid, "aud": "https://graph.microsoft.com"}, "x" * 32, algorithm="HS256")
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    get_profile_cache()._data.clear()
+    instance = MicrosoftAuth.__new__(MicrosoftAuth)
+    monkeypatch.setattr(instance, "_user_oid", lambda token: None)
+    return instance
+
+
+@pytest.fixture
+def serve(auth, fake_transport):
+    """serve(status, body, headers): o Graph passa a responder sempre isso a /me"""
+    def serve(status, body=None, headers=None):
+        auth.transport = fake_transport(
+            lambda method, url, **kw: {"status_code": status, "body": dict(body or {}), "headers": headers})
+        return auth.transport
+
+    return serve
+
+
+def test_trusted_oid_serves_fresh_cache(auth, serve):
+    serve(200, {"id": "victim", "displayName": "Vítima"}, {"ETag": "e1"})
+    assert auth.get_user_info(graph_token("victim"), oid="victim")["displayName"] == "Vítima"
+    assert auth.get_user_info(graph_token("victim"), oid="victim")["displayName"] == "Vítima"
+    assert len(auth.transport.calls) == 1
+
+
+def test_forged_oid_never_served_from_cache(auth, serve):
+    serve(200, {"id": "victim", "displayName": "Vítima"}, {"ETag": "e1"})
+    auth.get_user_info(graph_token("victim"), oid="victim")
+
+    serve(401)
+    assert auth.get_user_info(graph_token("victim")) is None
+    assert auth.transport.calls[0][2]["headers"]["If-None-Match"] == "e1"
+
+
+def test_unverified_token_revalidates_with_etag(auth, serve):
+    serve(200, {"id": "u1", "displayName": "Ana"}, {"ETag": "e1"})
+    auth.get_user_info(graph_token("u1"), oid="u1")
+
+    serve(304)
+    assert auth.get_user_info(graph_token("u1"))["displayName"] == "Ana"
+    assert len(auth.transport.calls) == 1
+
+
+def test_unverified_200_is_keyed_by_graph_id(auth, serve):
+    serve(200, {"id": "real", "displayName": "Real"}, {"ETag": "e2"})
+    auth.get_user_info(graph_token("claimed"))
+    assert get_profile_cache().lookup(("claimed", None))[0] is None
+    assert get_profile_cache().lookup(("real", None))[0]["displayName"] == "Real"
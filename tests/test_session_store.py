@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from session_store import MemorySessionStore, SQLiteSessionStore, SessionRecord, new_session_id
+from token_refresher import SessionTokens, TokenSet
+
+
+def make_record():
+    tokens = SessionTokens(TokenSet("at", "rt", time.time() + 3600, "hid"))
+    return SessionRecord(new_session_id(), {"displayName": "Ana"}, tokens)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore()
+    return SQLiteSessionStore(str(tmp_path / "sessions.sqlite"))
+
+
+def test_rotate_invalidates_old_id(store):
+    record = make_record()
+    store.put(record)
+    old = record.sid
+
+    store.rotate(record)
+
+    assert record.sid != old
+    assert store.get(old) is None
+    assert store.get(record.sid).user == {"displayName": "Ana"}
+
+
+def test_update_does_not_recreate_deleted_session(store):
+    record = make_record()
+    store.put(record)
+    assert store.update(record)
+
+    store.delete(record.sid)
+    assert not store.update(record)
+    store.touch(record)
+    assert store.get(record.sid) is None
+
+
+def test_logout_during_refresh_does_not_resurrect_session(store):
+    import threading
+
+    from token_refresher import TokenRefresher
+
+    refresher = TokenRefresher()
+    record = make_record()
+    store.put(record)
+    record.tokens.on_swap = lambda _: store.update(record)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_refresh(rt, hid):
+        started.set()
+        release.wait(5)
+        return {"access_token": "at2", "refresh_token": "rt2", "expires_in": 3600}
+
+    refresher.track(record.tokens, slow_refresh)
+    future = refresher._pool.submit(refresher.refresh, record.tokens)
+    assert started.wait(5)
+
+    # logout enquanto a chamada ao Azure AD está em andamento
+    refresher.untrack(record.tokens)
+    store.delete(record.sid)
+    release.set()
+
+    assert future.result(5) is False
+    assert record.tokens.current.access_token == "at"
+    assert record.tokens.on_swap is None
+    assert store.get(record.sid) is None
@@ -0,0 +1,153 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from sp_cache import ContentCache, DataFrameCache
+
+
+def test_string_columns_count_towards_memory_limit():
+    df = pd.DataFrame({"text": ["x" * 1000] * 100})  # ~100 KB de strings, 800 B de ponteiros
+    cache = DataFrameCache(max_memory_bytes=50 * 1024)
+    cache._remember("k", df)
+    assert cache.get("k") is None
+
+    roomy = DataFrameCache(max_memory_bytes=1024 ** 2)
+    roomy._remember("k", df)
+    assert roomy._memory_bytes > 100 * 1000
+    assert roomy.get("k").equals(df)
+
+
+class FakeFiles:
+    """Arquivos na raiz do drive, por caminho e por id, com cTag por versão"""
+
+    def __init__(self):
+        self.files = {}  # nome -> (id, cTag, conteúdo)
+        self.metadata_calls = 0
+        self.downloads = []
+
+    def put(self, name, content, ctag):
+        item_id = self.files[name][0] if name in self.files else f"ID-{name}"
+        self.files[name] = (item_id, ctag, content)
+
+    def _by_id(self, item_id):
+        return next(name for name, (i, _, _) in self.files.items() if i == item_id)
+
+    def handle(self, method, url, **kw):
+        if url.startswith("https://download.example/"):
+            name = url.rsplit("/", 1)[1]
+            self.downloads.append(name)
+            return {"content": self.files[name][2]}
+        if "/root:/" in url:
+            name, _, suffix = url.split("/root:/", 1)[1].partition(":")
+        else:
+            item_id, _, suffix = url.split("/items/", 1)[1].partition("/")
+            name, suffix = self._by_id(item_id), "/" + suffix if suffix else ""
+        if suffix == "/content":
+            self.downloads.append(name)
+            return {"content": self.files[name][2]}
+        self.metadata_calls += 1
+        item_id, ctag, content = self.files[name]
+        return {"body": {"id": item_id, "name": name, "cTag": ctag, "eTag": ctag, "size": len(content),
+                         "parentReference": {"path": "/drive/root:"},
+                         "@microsoft.graph.downloadUrl": f"https://download.example/{name}"}}
+
+
+@pytest.fixture
+def files():
+    files = FakeFiles()
+    files.put("a.csv", b"x\n1\n", "c1")
+    return files
+
+
+def cached_connector(make_connector, files, tmp_path, **kw):
+    return make_connector(files.handle, content_cache=ContentCache(str(tmp_path / "cache"), **kw))
+
+
+def test_reads_inside_ttl_cost_nothing(make_connector, files, tmp_path):
+    sp = cached_connector(make_connector, files, tmp_path, ttl=60)
+    assert sp.download("a.csv") == b"x\n1\n"
+    calls = len(sp.transport.calls)
+
+    assert sp.read_csv("a.csv")["x"].tolist() == [1]
+    assert sp.download("a.csv") == b"x\n1\n"
+    assert len(sp.transport.calls) == calls
+    assert files.downloads == ["a.csv"]
+
+
+def test_unchanged_ctag_costs_one_metadata_call(make_connector, files, tmp_path):
+    sp = cached_connector(make_connector, files, tmp_path, ttl=0)
+    sp.download("a.csv")
+    before = files.metadata_calls
+
+    assert sp.download("a.csv") == b"x\n1\n"
+    assert files.metadata_calls == before + 1
+    assert files.downloads == ["a.csv"]
+
+
+def test_changed_ctag_downloads_again(make_connector, files, tmp_path):
+    sp = cached_connector(make_connector, files, tmp_path, ttl=0)
+    sp.download("a.csv")
+
+    files.put("a.csv", b"x\n2\n", "c2")
+    assert sp.download("a.csv") == b"x\n2\n"
+    assert files.downloads == ["a.csv", "a.csv"]
+    assert sp.content_cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_file_is_evicted(make_connector, files, tmp_path):
+    for name in ("a.csv", "b.csv", "c.csv"):
+        files.put(name, name[0].encode() * 60, "c1")
+    sp = cached_connector(make_connector, files, tmp_path, ttl=60, max_bytes=130)
+    for name in ("a.csv", "b.csv", "a.csv", "c.csv"):  # a.csv é relido antes de c.csv chegar
+        sp.download(name)
+        time.sleep(0.01)  # mtime distinto para a ordem LRU
+
+    cache = sp.content_cache
+    assert not os.path.exists(cache.data_path("ID-b.csv"))
+    assert os.path.exists(cache.data_path("ID-a.csv")) and os.path.exists(cache.data_path("ID-c.csv"))
+    assert cache.stats()["evictions"] == 1
+
+
+def test_unreadable_pickle_is_discarded_and_reparsed(tmp_path):
+    cache = DataFrameCache(str(tmp_path / "frames"))
+    key = cache.make_key("ID", "c1", "csv", {})
+    cache.put(key, pd.DataFrame({"a": [1]}))
+    # pickle que referencia um módulo inexistente (ModuleNotFoundError ao carregar)
+    with open(cache._disk.data_path(key), "wb") as fh:
+        fh.write(b"cmodulo_que_nao_existe\nX\n.")
+    cache._memory.clear()
+
+    assert cache.get(key) is None
+    assert not os.path.exists(cache._disk.data_path(key))
+    df = cache.get_or_parse(key, lambda: pd.DataFrame({"a": [2]}))
+    assert df["a"].tolist() == [2]
+    assert cache.stats()["discarded"] == 1
+
+
+def test_make_key_is_stable_and_refuses_callables():
+    import numpy as np
+
+    make_key = DataFrameCache.make_key
+    a = make_key("ID", "c1", "csv", {"usecols": ["a", "b"], "dtype": {"a": np.int32, "b": "string"}})
+    b = make_key("ID", "c1", "csv", {"dtype": {"b": "string", "a": np.int32}, "usecols": ["a", "b"]})
+    assert a == b
+    assert a != make_key("ID", "c2", "csv", {"usecols": ["a", "b"], "dtype": {"a": np.int32, "b": "string"}})
+    assert make_key("ID", "c1", "csv", {"converters": {"a": lambda v: v.strip()}}) is None
+    assert make_key("ID", "c1", "csv", {"usecols": lambda c: c != "b"}) is None
+    assert make_key("ID", "c1", "csv", {"na_values": {object()}}) is None
+
+
+def test_uncacheable_kwargs_always_parse():
+    cache = DataFrameCache()
+    calls = []
+
+    def parse():
+        calls.append(1)
+        return pd.DataFrame({"a": [1]})
+
+    key = cache.make_key("ID", "c1", "csv", {"converters": {"a": str.strip}})
+    cache.get_or_parse(key, parse)
+    cache.get_or_parse(key, parse)
+    assert len(calls) == 2 and cache.stats()["memory_entries"] == 0
@@ -0,0 +1,115 @@
+import pytest
+
+import sp_connector
+
+CONTENT = bytes(range(256)) * 40  # 10 KB
+DOWNLOAD_URL = "https://download.example/file"
+
+
+class FakeServer:
+    def __init__(self, honor_range=True, interrupt_once=False):
+        self.honor_range = honor_range
+        self.interrupt_once = interrupt_once
+        self.range_requests = []
+        self.full_requests = 0
+
+    def handle(self, method, url, headers=None, **kw):
+        if url == DOWNLOAD_URL:
+            header = (headers or {}).get("Range")
+            self.range_requests.append(header)
+            if not self.honor_range:
+                return {"content": CONTENT}
+            start, end = (int(x) for x in header.split("=")[1].split("-"))
+            body = CONTENT[start:end + 1]
+            if self.interrupt_once:
+                self.interrupt_once = False
+                return {"status_code": 206, "content": body, "fail_after": len(body) // 2}
+            return {"status_code": 206, "content": body}
+        assert url.endswith("/content")
+        self.full_requests += 1
+        return {"content": CONTENT}
+
+
+@pytest.fixture
+def connector(make_connector, monkeypatch):
+    def make(server, max_concurrency=32):
+        sp = make_connector(server.handle, max_concurrency=max_concurrency)
+        monkeypatch.setattr(sp, "item_metadata", lambda path, select=None: {
+            "id": "A", "size": len(CONTENT), "@microsoft.graph.downloadUrl": DOWNLOAD_URL})
+        return sp
+
+    return make
+
+
+def test_parallel_download_returns_bytes(connector):
+    server = FakeServer()
+    data = connector(server).download("a.bin", parallel=True, range_size=1024)
+    assert type(data) is bytes and data == CONTENT
+    assert len(server.range_requests) == 10
+
+
+def test_interrupted_range_resumes_from_offset(connector, tmp_path):
+    server = FakeServer(interrupt_once=True)
+    dest = tmp_path / "a.bin"
+    sp = connector(server)
+    assert sp.download_parallel("a.bin", dest=str(dest), range_size=4096, max_workers=1) == len(CONTENT)
+    assert dest.read_bytes() == CONTENT
+    assert server.range_requests[:2] == ["bytes=0-4095", "bytes=2048-4095"]
+
+
+def test_ignored_range_falls_back_to_single_stream(connector, tmp_path):
+    server = FakeServer(honor_range=False)
+    sp = connector(server)
+    assert sp.download_parallel("a.bin", range_size=1024, max_workers=1) == CONTENT
+    assert len(server.range_requests) == 1  # sem retries: o primeiro 200 já decide
+    assert server.full_requests == 1
+
+    dest = tmp_path / "a.bin"
+    assert sp.download_parallel("a.bin", dest=str(dest), range_size=1024) == len(CONTENT)
+    assert dest.read_bytes() == CONTENT
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_pool_is_clamped_to_policy_concurrency(connector, monkeypatch):
+    sp = connector(FakeServer(), max_concurrency=2)
+    created = []
+    original = sp_connector.ThreadPoolExecutor
+
+    def spy(max_workers=None, **kw):
+        created.append(max_workers)
+        return original(max_workers=max_workers, **kw)
+
+    monkeypatch.setattr(sp_connector, "ThreadPoolExecutor", spy)
+    sp.download_parallel("a.bin", range_size=1024, max_workers=16)
+    assert created == [2]
+
+
+def test_async_gather_respects_policy_concurrency(connector):
+    import asyncio
+
+    from sp_connector_async import AsyncSPConnector
+
+    asp = AsyncSPConnector(connector=connector(FakeServer(), max_concurrency=3))
+    active, peak = 0, 0
+
+    async def fetch(path):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return path
+
+    results = asyncio.run(asp._gather(fetch, list(range(20)), concurrency=64))
+    assert results == list(range(20))
+    assert peak == 3
+
+
+def test_clamped_concurrency_is_logged(connector, caplog):
+    sp = connector(FakeServer(), max_concurrency=4)
+    with caplog.at_level("WARNING", logger="sp_connector"):
+        assert sp._workers(2) == 2
+        assert sp._workers(None) == 4
+        assert not caplog.records
+        assert sp._workers(100) == 4
+    assert "100" in caplog.text and "4" in caplog.text
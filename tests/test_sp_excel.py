@@ -0,0 +1,51 @@
+import io
+
+import pandas as pd
+import pytest
+
+import sp_connector
+
+
+@pytest.fixture
+def make(make_connector, monkeypatch):
+    def make(engine, content=b""):
+        sp = make_connector(excel_engine=engine)
+        monkeypatch.setattr(sp, "download_to", lambda path, dest, chunk_size=None: dest.write(content))
+        return sp
+
+    return make
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    seen = []
+    monkeypatch.setattr(sp_connector.pd, "read_excel", lambda src, **kw: seen.append(kw.get("engine")))
+    return seen
+
+
+@pytest.mark.parametrize("path,expected", [
+    ("a.xlsx", "openpyxl"), ("a.XLSM", "openpyxl"),
+    ("a.xls", None), ("a.xlsb", None), ("a.ods", None),
+])
+def test_openpyxl_only_forced_for_xlsx(make, engines, path, expected):
+    make("openpyxl").read_excel(path)
+    assert engines == [expected]
+
+
+@pytest.mark.parametrize("path", ["a.xlsx", "a.xls", "a.xlsb", "a.ods"])
+def test_calamine_reads_every_format(make, engines, path):
+    make("calamine").read_excel(path)
+    assert engines == ["calamine"]
+
+
+def test_explicit_engine_wins(make, engines):
+    make("openpyxl").read_excel("a.xls", engine="xlrd")
+    assert engines == ["xlrd"]
+
+
+def test_ods_workbook_detected_by_pandas(make):
+    pytest.importorskip("odf")
+    buf = io.BytesIO()
+    pd.DataFrame({"a": [1, 2]}).to_excel(buf, index=False, engine="odf")
+    sp = make("openpyxl", buf.getvalue())
+    assert sp.list_sheets("dados.ods") == ["Sheet1"]
@@ -0,0 +1,83 @@
+from urllib.parse import unquote
+
+import pytest
+
+DRIVE = "https://graph.microsoft.com/v1.0/users/u@example.com/drive"
+
+
+class FakeDrive:
+    """Itens endereçáveis por caminho (root:/...:) e por id (/items/{id})"""
+
+    def __init__(self):
+        self.items = {}  # id -> caminho
+
+    def body(self, item_id):
+        parent, _, name = self.items[item_id].rpartition("/")
+        return {"id": item_id, "name": name,
+                "parentReference": {"path": "/drive/root:" + (f"/{parent}" if parent else "")},
+                "@microsoft.graph.downloadUrl": f"https://download.example/{item_id}"}
+
+    def handle(self, method, url, headers=None, params=None, **kw):
+        if url.startswith("https://download.example/"):
+            return {"content": url.rsplit("/", 1)[1].encode()}
+        if "/root:/" in url:
+            rel, _, suffix = unquote(url.split("/root:/", 1)[1]).partition(":")
+            item_id = next((i for i, p in self.items.items() if p == rel), None)
+        else:
+            item_id, _, suffix = url.split("/items/", 1)[1].partition("/")
+            suffix = "/" + suffix if suffix else ""
+        if item_id not in self.items:
+            return {"status_code": 404}
+        if suffix == "/content":
+            return {"content": item_id.encode()}
+        return {"body": self.body(item_id)}
+
+
+@pytest.fixture
+def drive():
+    return FakeDrive()
+
+
+@pytest.fixture
+def sp(drive, make_connector, fake_transport):
+    return make_connector(fake_transport(drive.handle))
+
+
+def urls(sp):
+    return [url for _, url, _ in sp.transport.calls]
+
+
+def test_known_item_is_fetched_by_id(sp, drive):
+    drive.items["A"] = "docs/a.txt"
+    sp.item_metadata("docs/a.txt")
+    sp.transport.calls.clear()
+
+    assert sp.download("docs/a.txt") == b"A"
+    assert urls(sp)[0] == f"{DRIVE}/items/A"
+    assert not any("/root:/" in url for url in urls(sp))
+
+
+def test_renamed_item_is_re_resolved_by_path(sp, drive):
+    drive.items["A"] = "docs/a.txt"
+    sp.item_metadata("docs/a.txt")
+
+    # o id sobrevive ao rename; outro arquivo ocupa o caminho antigo
+    drive.items["A"] = "docs/old-a.txt"
+    drive.items["B"] = "docs/a.txt"
+
+    assert sp.download("docs/a.txt") == b"B"
+    assert sp.item_metadata("docs/a.txt")["id"] == "B"
+    assert sp.path_index.get(sp._cache_scope(), "docs/a.txt") == "B"
+
+
+def test_moved_item_is_re_resolved_by_path(sp, drive):
+    drive.items["A"] = "docs/a.txt"
+    sp.item_metadata("docs/a.txt", select="id,size")
+
+    drive.items["A"] = "archive/a.txt"  # mesmo nome, outra pasta
+    sp.transport.calls.clear()
+
+    with pytest.raises(FileNotFoundError):
+        sp.item_metadata("docs/a.txt", select="id,size")
+    assert urls(sp)[-1].endswith("/root:/docs/a.txt:")
+    assert sp.path_index.get(sp._cache_scope(), "docs/a.txt") is None
@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+ROWS = 1000
+CONTENT = ("id,name,value\n" + "".join(f"{i},item {i},{i * 0.5}\n" for i in range(ROWS))).encode()
+
+
+@pytest.fixture
+def sp(make_connector):
+    def handle(method, url, stream=False, **kw):
+        assert url.endswith("/data.csv:/content") and stream
+        return {"content": CONTENT}
+
+    return make_connector(handle)
+
+
+def test_pandas_batches(sp):
+    chunks = list(sp.iter_csv("data.csv", chunksize=300, usecols=["id", "value"], dtype={"id": "int32"}))
+    assert [len(c) for c in chunks] == [300, 300, 300, 100]
+    assert all(list(c.columns) == ["id", "value"] and c["id"].dtype == "int32" for c in chunks)
+    assert sum(c["value"].sum() for c in chunks) == sum(i * 0.5 for i in range(ROWS))
+
+
+def test_nothing_is_downloaded_until_iterated(sp):
+    chunks = sp.iter_csv("data.csv")
+    assert sp.transport.calls == []
+    assert len(next(chunks)) == ROWS
+    assert len(sp.transport.calls) == 1
+
+
+def test_pyarrow_streaming_batches(sp):
+    pa = pytest.importorskip("pyarrow")
+    chunks = list(sp.iter_csv("data.csv", engine="pyarrow", block_size=4096, usecols=["id", "name"],
+                              dtype={"id": pa.int16(), "name": "string"}))
+    assert len(chunks) > 1
+    frame = pd.concat(chunks, ignore_index=True)
+    assert list(frame.columns) == ["id", "name"] and len(frame) == ROWS
+    assert frame["id"].dtype == "int16" and frame["name"].dtype == "string"
+    assert frame["name"].iloc[-1] == f"item {ROWS - 1}"
+
+
+def test_unknown_engine(sp):
+    with pytest.raises(ValueError):
+        next(sp.iter_csv("data.csv", engine="polars"))
@@ -0,0 +1,94 @@
+import itertools
+
+import pytest
+
+from sp_connector import LIST_SELECT, DriveItem
+
+NEXT = "https://graph.example/next"
+
+
+class FakeTree:
+    """Pastas com /children paginado por $top e @odata.nextLink"""
+
+    def __init__(self):
+        self.children = {"ROOT": []}  # id da pasta -> itens
+        self.requests = []  # (pasta, página, params)
+
+    def add(self, item_id, name, parent="ROOT", folder=False, size=10):
+        item = {"id": item_id, "name": name, "size": size, "eTag": f"e-{item_id}", "cTag": f"c-{item_id}",
+                "lastModifiedDateTime": "2026-01-01T00:00:00Z"}
+        if folder:
+            item["folder"] = {"childCount": 0}
+            self.children[item_id] = []
+        self.children[parent].append(item)
+
+    def handle(self, method, url, params=None, **kw):
+        if url.startswith(NEXT):
+            folder, page, top = url[len(NEXT) + 1:].split("/")
+            page, top = int(page), int(top)
+        else:
+            folder = url.split("/items/")[1].split("/")[0] if "/items/" in url else "ROOT"
+            if "/root:/" in url:
+                name = url.split("/root:/")[1].split(":")[0]
+                folder = next((i["id"] for i in self.children["ROOT"] if i["name"] == name), None)
+            page, top = 0, int(params["$top"])
+        if folder not in self.children:
+            return {"status_code": 404}
+        self.requests.append((folder, page, params))
+        items = self.children[folder][page * top:(page + 1) * top]
+        body = {"value": items}
+        if (page + 1) * top < len(self.children[folder]):
+            body["@odata.nextLink"] = f"{NEXT}/{folder}/{page + 1}/{top}"
+        return {"body": body}
+
+
+@pytest.fixture
+def tree():
+    tree = FakeTree()
+    for i in range(5):
+        tree.add(f"F{i}", f"file{i}.csv")
+    tree.add("D", "docs", folder=True)
+    tree.add("D1", "a.txt", parent="D")
+    tree.add("S", "sub", parent="D", folder=True)
+    tree.add("S1", "b.txt", parent="S")
+    return tree
+
+
+@pytest.fixture
+def sp(tree, make_connector):
+    return make_connector(tree.handle)
+
+
+def test_pages_are_fetched_on_demand(sp, tree):
+    children = sp.list_children("", page_size=2)
+    first = list(itertools.islice(children, 2))
+    assert [i.name for i in first] == ["file0.csv", "file1.csv"]
+    assert len(tree.requests) == 1
+
+    rest = list(children)
+    assert len(first + rest) == 6
+    assert [page for _, page, _ in tree.requests] == [0, 1, 2]
+
+
+def test_top_and_select_only_on_first_request(sp, tree):
+    list(sp.list_children("", page_size=2))
+    assert tree.requests[0][2] == {"$top": 2, "$select": LIST_SELECT}
+    # o nextLink já carrega $top/$select
+    assert all(params is None for _, _, params in tree.requests[1:])
+
+
+def test_items_are_compact_records_and_feed_the_index(sp):
+    (item,) = [i for i in sp.list_children("docs") if not i.is_folder]
+    assert item == DriveItem("D1", "a.txt", "docs/a.txt", 10, "e-D1", "c-D1", "2026-01-01T00:00:00Z", False)
+    assert sp.path_index.get(sp._cache_scope(), "docs/a.txt") == "D1"
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_walk_lists_every_level(sp, parallel):
+    paths = {i.path for i in sp.walk("", parallel=parallel, page_size=2)}
+    assert paths == {f"file{i}.csv" for i in range(5)} | {"docs", "docs/a.txt", "docs/sub", "docs/sub/b.txt"}
+
+
+def test_missing_folder(sp):
+    with pytest.raises(FileNotFoundError):
+        list(sp.list_children("nope"))
@@ -0,0 +1,26 @@
+import pytest
+
+import sp_connector
+from sp_connector import get_sp_connector
+
+
+@pytest.fixture
+def make(tokens):
+    def make(**kw):
+        return get_sp_connector("tenant", "client", "secret", user_upn="u@example.com",
+                                token_provider=tokens, **kw)
+
+    return make
+
+
+def test_same_configuration_reuses_connector(make):
+    assert make(excel_engine="openpyxl") is make(excel_engine="openpyxl")
+    assert make(excel_engine="openpyxl") is not make(excel_engine="calamine")
+
+
+def test_registry_is_bounded(make, monkeypatch):
+    monkeypatch.setattr(sp_connector, "MAX_CONNECTORS", 3)
+    sp_connector._connectors.clear()
+    for _ in range(10):
+        make(content_cache=object())  # objeto novo a cada "rerun"
+    assert len(sp_connector._connectors) == 3
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+import requests
+
+CSV = "".join(f"{i},item {i},{i * 0.5}\n" for i in range(2000)).encode()
+CONTENT = b"id,name,value\n" + CSV
+
+
+class FakeContent:
+    """/content de um arquivo (`fail_after` interrompe o corpo no meio)"""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.responses = []
+
+    def handle(self, method, url, **kw):
+        if not url.endswith("/data.csv:/content"):
+            return {"status_code": 404}
+        assert kw.get("stream"), "o conteúdo deve ser lido em streaming"
+        return {"content": CONTENT, "fail_after": self.fail_after}
+
+
+@pytest.fixture
+def server():
+    return FakeContent()
+
+
+@pytest.fixture
+def sp(server, make_connector):
+    return make_connector(server.handle)
+
+
+def test_download_stream_yields_bounded_chunks(sp):
+    chunks = list(sp.download_stream("data.csv", chunk_size=4096))
+    assert b"".join(chunks) == CONTENT
+    assert max(len(c) for c in chunks) <= 4096 and len(chunks) > 1
+
+
+def test_download_to_path_is_atomic(sp, server, tmp_path):
+    dest = tmp_path / "data.csv"
+    assert sp.download_to("data.csv", str(dest)) == len(CONTENT)
+    assert dest.read_bytes() == CONTENT
+
+    server.fail_after = 1000
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        sp.download_to("data.csv", str(tmp_path / "broken.csv"))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["data.csv"]  # sem .part nem arquivo parcial
+
+
+def test_read_csv_consumes_the_stream(sp):
+    df = sp.read_csv("data.csv", usecols=["id", "value"])
+    assert list(df.columns) == ["id", "value"]
+    assert len(df) == 2000 and df["value"].iloc[-1] == 1999 * 0.5
+
+
+def test_missing_file(sp):
+    with pytest.raises(FileNotFoundError):
+        list(sp.download_stream("other.csv"))
+    with pytest.raises(FileNotFoundError):
+        sp.read_csv("other.csv")
+
+
+def test_open_download_is_file_like(sp):
+    with sp.open_download("data.csv") as fh:
+        assert pd.read_csv(fh).shape == (2000, 3)
@@ -0,0 +1,125 @@
+import os
+
+import pytest
+
+
+class FakeDrive:
+    """Drive com /delta: enumeração completa, mudanças por deltaLink e 410"""
+
+    def __init__(self):
+        self.items = {"ROOT": {"id": "ROOT", "name": "root", "root": {}}}
+        self.changes = []
+        self.link = 0
+        self.expired = set()
+        self.downloads = []
+
+    def add(self, item_id, name, parent, folder=False, ctag="c1"):
+        item = {"id": item_id, "name": name, "parentReference": {"id": parent}}
+        if folder:
+            item["folder"] = {}
+        else:
+            item["file"] = {}
+            item["cTag"] = ctag
+        self.items[item_id] = item
+        return item
+
+    def change(self, item_id, **fields):
+        item = self.items[item_id]
+        if "parent" in fields:
+            item["parentReference"] = {"id": fields.pop("parent")}
+        item.update(fields)
+        self.changes.append(dict(item))
+
+    def delete(self, item_id, record=True):
+        self.items.pop(item_id)
+        if record:
+            self.changes.append({"id": item_id, "deleted": {}})
+
+    def _next_link(self):
+        self.link += 1
+        return f"delta-link-{self.link}"
+
+    def handle(self, method, url, params=None, **kw):
+        if url.endswith("/content"):
+            item_id = url.split("/items/")[1].split("/")[0]
+            self.downloads.append(item_id)
+            return {"content": self.items[item_id]["name"].encode()}
+        if url in self.expired:
+            return {"status_code": 410}
+        if url.endswith("/root/delta"):
+            values = [dict(item) for item in self.items.values()]
+        else:
+            assert url == f"delta-link-{self.link}"
+            values = self.changes
+        self.changes = []
+        return {"body": {"value": values, "@odata.deltaLink": self._next_link()}}
+
+
+@pytest.fixture
+def drive():
+    drive = FakeDrive()
+    drive.add("F", "sync", "ROOT", folder=True)
+    drive.add("D", "docs", "F", folder=True)
+    drive.add("A", "a.txt", "D")
+    drive.add("B", "b.txt", "F")
+    return drive
+
+
+@pytest.fixture
+def connector(drive, make_connector, monkeypatch):
+    sp = make_connector(drive.handle)
+    monkeypatch.setattr(sp, "_resolve_item_id", lambda path: "F")
+    return sp
+
+
+def files(root):
+    found = set()
+    for base, _, names in os.walk(root):
+        for name in names:
+            if not name.startswith("."):
+                found.add(os.path.relpath(os.path.join(base, name), root).replace(os.sep, "/"))
+    return found
+
+
+def test_initial_sync_downloads_everything(drive, connector, tmp_path):
+    stats = connector.sync("sync", str(tmp_path))
+    assert stats["downloaded"] == 2 and not stats["errors"]
+    assert files(tmp_path) == {"docs/a.txt", "b.txt"}
+
+
+def test_rename_inside_renamed_folder_moves_without_download(drive, connector, tmp_path):
+    connector.sync("sync", str(tmp_path))
+    drive.downloads.clear()
+
+    drive.change("D", name="papers")
+    drive.change("A", name="a2.txt")
+    stats = connector.sync("sync", str(tmp_path))
+
+    assert drive.downloads == []
+    assert files(tmp_path) == {"papers/a2.txt", "b.txt"}
+    assert stats["moved"] == 2
+
+
+def test_expired_delta_link_reconciles_deletions(drive, connector, tmp_path):
+    connector.sync("sync", str(tmp_path))
+    drive.downloads.clear()
+
+    drive.delete("B", record=False)  # a exclusão some junto com o deltaLink expirado
+    drive.expired.add(f"delta-link-{drive.link}")
+    stats = connector.sync("sync", str(tmp_path))
+
+    assert files(tmp_path) == {"docs/a.txt"}
+    assert stats["deleted"] == 1
+    assert drive.downloads == []  # cTag inalterado: nada é baixado de novo
+
+
+def test_delta_deletion_and_update(drive, connector, tmp_path):
+    connector.sync("sync", str(tmp_path))
+    drive.downloads.clear()
+
+    drive.delete("B")
+    drive.change("A", cTag="c2")
+    connector.sync("sync", str(tmp_path))
+
+    assert files(tmp_path) == {"docs/a.txt"}
+    assert drive.downloads == ["A"]
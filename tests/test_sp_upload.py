@@ -0,0 +1,95 @@
+import os
+
+import pytest
+import requests
+
+from sp_connector import UPLOAD_CHUNK_ALIGN
+
+UPLOAD_URL = "https://upload.example/session"
+CHUNK = UPLOAD_CHUNK_ALIGN
+
+
+class FakeUploadSession:
+    """createUploadSession + PUTs com Content-Range, como o Graph (416 para bytes já recebidos)"""
+
+    def __init__(self, drop_at=None):
+        self.received = bytearray()
+        self.size = None
+        self.drop_at = drop_at  # offset absoluto em que a conexão cai (uma vez)
+        self.ranges = []
+        self.sessions = 0
+        self.small_puts = 0
+
+    def handle(self, method, url, headers=None, data=None, **kw):
+        if url.endswith("/createUploadSession"):
+            self.sessions += 1
+            return {"body": {"uploadUrl": UPLOAD_URL}}
+        if url.endswith("/content"):
+            self.small_puts += 1
+            self.received = bytearray(data)
+            return {"status_code": 201, "body": {"id": "SMALL", "name": "small.bin"}}
+        if method == "GET":
+            return {"body": {"nextExpectedRanges": [f"{len(self.received)}-"]}}
+
+        spec, total = headers["Content-Range"].split(" ")[1].split("/")
+        start, end = (int(x) for x in spec.split("-"))
+        self.size = int(total)
+        self.ranges.append((start, end))
+        if start != len(self.received):
+            return {"status_code": 416}
+        if self.drop_at is not None and start < self.drop_at <= end:
+            # Parte do fragmento chegou antes de a conexão cair
+            self.received += data[:self.drop_at - start]
+            self.drop_at = None
+            raise requests.exceptions.ConnectionError("conexão interrompida")
+        self.received += data
+        if len(self.received) == self.size:
+            return {"status_code": 201, "body": {"id": "BIG", "name": "big.bin"}}
+        return {"status_code": 202, "body": {"nextExpectedRanges": [f"{len(self.received)}-"]}}
+
+
+@pytest.fixture
+def content():
+    return os.urandom(2 * CHUNK + CHUNK // 2)
+
+
+def test_chunks_are_sequential_and_aligned(make_connector, content):
+    server = FakeUploadSession()
+    item = make_connector(server.handle).upload_stream("big.bin", content, chunk_size=CHUNK)
+
+    assert item["id"] == "BIG"
+    assert bytes(server.received) == content
+    assert server.ranges == [(0, CHUNK - 1), (CHUNK, 2 * CHUNK - 1), (2 * CHUNK, len(content) - 1)]
+
+
+def test_dropped_chunk_resumes_from_next_expected_range(make_connector, content):
+    server = FakeUploadSession(drop_at=CHUNK + 1000)
+    item = make_connector(server.handle).upload_stream("big.bin", content, chunk_size=CHUNK)
+
+    assert item["id"] == "BIG"
+    assert bytes(server.received) == content
+    assert server.sessions == 1
+    # reenvio do mesmo fragmento é recusado (416); o envio retoma do byte que faltava
+    assert server.ranges[1:4] == [(CHUNK, 2 * CHUNK - 1), (CHUNK, 2 * CHUNK - 1),
+                                  (CHUNK + 1000, 2 * CHUNK + 999)]
+
+
+def test_generator_source_keeps_content(make_connector, content):
+    server = FakeUploadSession()
+    parts = (content[i:i + 1000] for i in range(0, len(content), 1000))
+    make_connector(server.handle).upload_stream("big.bin", parts, chunk_size=CHUNK)
+    assert bytes(server.received) == content
+
+
+def test_upload_picks_small_or_session_path(make_connector, monkeypatch, content):
+    import sp_connector
+
+    monkeypatch.setattr(sp_connector, "SMALL_UPLOAD_LIMIT", CHUNK)
+    server = FakeUploadSession()
+    sp = make_connector(server.handle)
+
+    assert sp.upload("small.bin", content[:CHUNK])["id"] == "SMALL"
+    assert (server.small_puts, server.sessions) == (1, 0)
+
+    assert sp.upload("big.bin", content, chunk_size=CHUNK)["id"] == "BIG"
+    assert (server.small_puts, server.sessions) == (1, 1)
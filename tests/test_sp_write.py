@@ -0,0 +1,79 @@
+import gzip
+import io
+
+import pandas as pd
+import pytest
+
+DF = pd.DataFrame({"id": range(10), "name": [f"item {i}" for i in range(10)], "value": [i * 0.5 for i in range(10)]})
+
+
+@pytest.fixture
+def uploads(make_connector, monkeypatch):
+    """(conector, {caminho: bytes enviados})"""
+    sp = make_connector()
+    sent = {}
+
+    def upload(path, data, overwrite=True, **kw):
+        sent[path] = data.read()
+        return {"id": "X", "name": path}
+
+    monkeypatch.setattr(sp, "upload", upload)
+    return sp, sent
+
+
+def test_csv_chunks_write_header_once(uploads):
+    sp, sent = uploads
+    sp.write_csv(DF, "out.csv", chunk_rows=3)
+    text = sent["out.csv"].decode()
+    assert text.count("id,name,value") == 1
+    pd.testing.assert_frame_equal(pd.read_csv(io.StringIO(text)), DF)
+
+
+def test_bom_only_at_start_of_file(uploads):
+    sp, sent = uploads
+    sp.write_csv(DF, "out.csv", chunk_rows=3, encoding="utf-8-sig")
+    assert sent["out.csv"].startswith(b"\xef\xbb\xbf")
+    assert sent["out.csv"].count(b"\xef\xbb\xbf") == 1
+
+
+def test_gzip_inferred_from_extension(uploads):
+    sp, sent = uploads
+    sp.write_dataframe(DF, "out.csv.gz", chunk_rows=4)
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(gzip.decompress(sent["out.csv.gz"]))), DF)
+
+
+def test_zstd_compression(uploads):
+    zstandard = pytest.importorskip("zstandard")
+    sp, sent = uploads
+    sp.write_dataframe(DF, "out.csv.zst", chunk_rows=4)
+    raw = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(sent["out.csv.zst"])).read()
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(raw)), DF)
+
+
+def test_generator_of_frames(uploads):
+    sp, sent = uploads
+    sp.write_csv((DF.iloc[i:i + 2] for i in range(0, 10, 2)), "out.csv")
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(sent["out.csv"])), DF)
+
+
+def test_parquet_row_group_per_chunk(uploads):
+    pq = pytest.importorskip("pyarrow.parquet")
+    sp, sent = uploads
+    sp.write_parquet(DF, "out.parquet", chunk_rows=4)
+    parquet = pq.ParquetFile(io.BytesIO(sent["out.parquet"]))
+    assert parquet.num_row_groups == 3
+    pd.testing.assert_frame_equal(parquet.read().to_pandas(), DF)
+
+
+def test_parquet_all_null_slice_keeps_schema(uploads):
+    pq = pytest.importorskip("pyarrow.parquet")
+    sp, sent = uploads
+    frames = [pd.DataFrame({"v": [1.5, 2.5]}), pd.DataFrame({"v": [None, None]})]
+    sp.write_parquet(iter(frames), "out.parquet")
+    assert pq.read_table(io.BytesIO(sent["out.parquet"])).column("v").to_pylist() == [1.5, 2.5, None, None]
+
+
+def test_unknown_format(uploads):
+    sp, _ = uploads
+    with pytest.raises(ValueError):
+        sp.write_dataframe(DF, "out.xml", format="xml")
@@ -0,0 +1,79 @@
+import json
+
+from token_cache import MemoryTokenStore, PartitionedTokenCache, SQLiteTokenStore
+
+
+class CountingStore(MemoryTokenStore):
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def set(self, partition, blob):
+        self.writes.append(partition)
+        super().set(partition, blob)
+
+
+def add_token(cache, hid, secret):
+    with cache._lock:
+        cache._cache.setdefault("RefreshToken", {})[f"{hid}-rt"] = {"home_account_id": hid, "secret": secret}
+        cache._cache.setdefault("AppMetadata", {})["appmetadata-x"] = {"client_id": "x"}
+        cache.has_state_changed = True
+
+
+def test_concurrent_changes_are_saved_per_partition():
+    store = CountingStore()
+    cache = PartitionedTokenCache(store)
+    add_token(cache, "a", "rt-a")
+    add_token(cache, "b", "rt-b")
+
+    cache.save_partition("a")
+    cache.save_partition("b")  # a mudança de B não some com a gravação de A
+    assert json.loads(store.get("b"))["RefreshToken"] == {"b-rt": {"home_account_id": "b", "secret": "rt-b"}}
+
+    cache.save_partition("a")
+    assert store.writes == ["a", "b"]  # nada mudou em A desde a última gravação
+
+
+def test_partitions_are_isolated_and_app_metadata_shared():
+    store = MemoryTokenStore()
+    cache = PartitionedTokenCache(store)
+    add_token(cache, "a", "rt-a")
+    add_token(cache, "b", "rt-b")
+    cache.save_partition("a")
+    data = json.loads(store.get("a"))
+    assert list(data["RefreshToken"]) == ["a-rt"]
+    assert "appmetadata-x" in data["AppMetadata"]
+
+
+def test_memory_holds_only_recent_partitions(tmp_path):
+    store = SQLiteTokenStore(str(tmp_path / "tokens.sqlite"))
+    cache = PartitionedTokenCache(store, max_partitions=2)
+    for hid in ("a", "b", "c"):
+        cache.load_partition(hid)
+        add_token(cache, hid, f"rt-{hid}")
+        cache.save_partition(hid)
+
+    assert set(cache._cache["RefreshToken"]) == {"b-rt", "c-rt"}
+    assert store.get("a") is not None
+
+    cache.load_partition("a")
+    assert set(cache._cache["RefreshToken"]) == {"a-rt", "c-rt"}
+
+
+def test_evicted_partition_is_saved_before_leaving_memory():
+    store = MemoryTokenStore()
+    cache = PartitionedTokenCache(store, max_partitions=1)
+    cache.load_partition("a")
+    add_token(cache, "a", "rt-a")  # ainda não gravado
+    cache.load_partition("b")
+    assert json.loads(store.get("a"))["RefreshToken"]["a-rt"]["secret"] == "rt-a"
+
+
+def test_forget_partition_removes_memory_and_store():
+    store = MemoryTokenStore()
+    cache = PartitionedTokenCache(store)
+    add_token(cache, "a", "rt-a")
+    cache.save_partition("a")
+    cache.forget_partition("a")
+    assert store.get("a") is None
+    assert cache._cache["RefreshToken"] == {}
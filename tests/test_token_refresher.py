@@ -0,0 +1,86 @@
+import time
+
+from token_refresher import MSAL_REFRESH_WINDOW, SessionTokens, TokenRefresher, TokenSet
+
+
+def make_tokens(expires_in):
+    return SessionTokens(TokenSet("at1", "rt1", time.time() + expires_in, "hid"))
+
+
+def due_times(refresher):
+    return sorted(entry[0] for entry in refresher._heap)
+
+
+def test_schedules_inside_msal_window():
+    refresher = TokenRefresher()
+    tokens = make_tokens(3600)
+    refresher.track(tokens, lambda rt, hid: None)
+    (due,) = due_times(refresher)
+    assert tokens.current.expires_at - MSAL_REFRESH_WINDOW <= due < tokens.current.expires_at
+
+
+def test_new_token_is_swapped_and_propagated():
+    refresher = TokenRefresher()
+    tokens = make_tokens(200)
+    swaps = []
+    tokens.on_swap = swaps.append
+    tokens.refresh = lambda rt, hid: {"access_token": "at2", "refresh_token": "rt2", "expires_in": 3600}
+
+    assert refresher.refresh(tokens)
+    assert tokens.current.access_token == "at2"
+    assert tokens.current.refresh_token == "rt2"
+    assert [t.access_token for t in swaps] == ["at2"]
+
+
+def test_same_token_is_not_swapped_nor_rescheduled_immediately():
+    refresher = TokenRefresher()
+    tokens = make_tokens(900)
+    swaps, calls = [], []
+    tokens.on_swap = swaps.append
+
+    def refresh(rt, hid):
+        calls.append(rt)
+        return {"access_token": "at1", "expires_in": 900}
+
+    tokens.refresh = refresh
+    generation = tokens.generation
+
+    assert not refresher.refresh(tokens)
+    assert tokens.generation == generation
+    assert swaps == []
+    assert len(calls) == 1
+    (due,) = due_times(refresher)
+    # próxima tentativa já dentro da janela do MSAL, não imediata
+    assert due >= tokens.current.expires_at - MSAL_REFRESH_WINDOW
+    assert due - time.time() > 500
+
+
+def test_concurrent_refreshes_share_one_call():
+    refresher = TokenRefresher()
+    calls = []
+
+    def refresh(rt, hid):
+        calls.append(rt)
+        time.sleep(0.2)
+        return {"access_token": "at2", "expires_in": 3600}
+
+    sessions = [make_tokens(100) for _ in range(4)]
+    for tokens in sessions:
+        tokens.refresh = refresh
+    futures = [refresher._pool.submit(refresher.refresh, tokens) for tokens in sessions]
+    assert all(f.result() for f in futures)
+    assert len(calls) == 1
+    assert {t.current.access_token for t in sessions} == {"at2"}
+
+
+def test_failure_retries_then_marks_failed():
+    refresher = TokenRefresher(retry_delay=30)
+    tokens = make_tokens(600)
+    tokens.refresh = lambda rt, hid: None
+    assert not refresher.refresh(tokens)
+    assert not tokens.failed and len(refresher._heap) == 1
+
+    expiring = make_tokens(10)
+    expiring.refresh = lambda rt, hid: None
+    assert not refresher.refresh(expiring)
+    assert expiring.failed
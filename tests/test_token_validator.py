@@ -0,0 +1,68 @@
+import json
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from token_validator import GRAPH_AUDIENCES, JwksCache, TokenValidator
+
+TENANT = "tenant-id"
+CLIENT = "client-id"
+ISSUER = f"https://login.microsoftonline.com/{TENANT}/v2.0"
+
+
+@pytest.fixture(scope="module")
+def key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def validator(key):
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+    jwk["kid"] = "k1"
+    jwks = JwksCache("https://example.invalid/keys", fetcher=lambda: {"keys": [jwk]})
+    return TokenValidator(TENANT, [CLIENT], jwks=jwks)
+
+
+def claims(**overrides):
+    now = int(time.time())
+    data = {"aud": CLIENT, "iss": ISSUER, "exp": now + 600, "nbf": now - 10, "oid": "user-oid"}
+    data.update(overrides)
+    return data
+
+
+def sign(key, headers=None, **overrides):
+    return jwt.encode(claims(**overrides), key, algorithm="RS256", headers={"kid": "k1", **(headers or {})})
+
+
+def test_valid_signed_token(validator, key):
+    assert validator.validate(sign(key))["oid"] == "user-oid"
+
+
+def test_nonce_header_does_not_skip_signature(validator):
+    forged = jwt.encode(claims(), "segredo-qualquer-com-32-bytes-ou-mais!", algorithm="HS256",
+                        headers={"kid": "k1", "nonce": "abc"})
+    assert not validator.is_valid(forged)
+    with pytest.raises(jwt.PyJWTError):
+        validator.validate(forged)
+
+
+def test_rs256_with_nonce_from_other_key_is_rejected(validator):
+    other = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    assert not validator.is_valid(sign(other, headers={"nonce": "abc"}))
+
+
+def test_graph_audience_is_never_identity(validator, key):
+    token = sign(key, aud=GRAPH_AUDIENCES[0])
+    assert not validator.is_valid(token)
+    assert validator.is_unverifiable(token)
+    # Só claims: aceito por check_claims, mesmo com assinatura inválida
+    forged = jwt.encode(claims(aud=GRAPH_AUDIENCES[0]), "x" * 32, algorithm="HS256")
+    assert validator.check_claims(forged)["aud"] == GRAPH_AUDIENCES[0]
+
+
+def test_expired_wrong_issuer_and_unknown_kid(validator, key):
+    assert not validator.is_valid(sign(key, exp=int(time.time()) - 3600))
+    assert not validator.is_valid(sign(key, iss="https://evil.example/"))
+    assert not validator.is_valid(sign(key, headers={"kid": "desconhecido"}))
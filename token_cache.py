@@ -0,0 +1,302 @@
+"""
+Cache de tokens MSAL serializado e particionado por usuário
+
+O PartitionedTokenCache é um msal.SerializableTokenCache cujo conteúdo é
+gravado em um armazenamento plugável, uma partição por home_account_id.
+Assim acquire_token_silent atende tokens e renovações sem ida ao endpoint
+de token, e um restart do processo não perde o cache (stores file/sqlite).
+
+Armazenamentos disponíveis:
+  - MemoryTokenStore: LRU em memória (padrão)
+  - FileTokenStore:   um arquivo JSON por usuário, com lock de arquivo
+  - SQLiteTokenStore: tabela única em um arquivo SQLite
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import msal
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# ============================================================================
+# ARMAZENAMENTOS
+# ============================================================================
+class TokenStore:
+    """Interface mínima de um armazenamento de partições do cache"""
+
+    def get(self, partition: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, partition: str, blob: str):
+        raise NotImplementedError
+
+    def delete(self, partition: str):
+        raise NotImplementedError
+
+
+class MemoryTokenStore(TokenStore):
+    """LRU em memória; perde o conteúdo quando o processo termina"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, partition: str) -> Optional[str]:
+        with self._lock:
+            blob = self._data.get(partition)
+            if blob is not None:
+                self._data.move_to_end(partition)
+            return blob
+
+    def set(self, partition: str, blob: str):
+        with self._lock:
+            self._data[partition] = blob
+            self._data.move_to_end(partition)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, partition: str):
+        with self._lock:
+            self._data.pop(partition, None)
+
+
+@contextmanager
+def file_lock(lock_path: str):
+    """Lock exclusivo entre processos baseado em arquivo"""
+    with open(lock_path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileTokenStore(TokenStore):
+    """Um arquivo JSON por partição em disco local, gravado atomicamente"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, partition: str) -> str:
+        name = hashlib.sha256(partition.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def get(self, partition: str) -> Optional[str]:
+        path = self._path(partition)
+        with file_lock(path + ".lock"):
+            try:
+                with open(path, "r", encoding="utf-8") as fh:
+                    return fh.read()
+            except FileNotFoundError:
+                return None
+
+    def set(self, partition: str, blob: str):
+        path = self._path(partition)
+        with file_lock(path + ".lock"):
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                    fh.write(blob)
+                os.replace(tmp, path)
+            except Exception:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+
+    def delete(self, partition: str):
+        path = self._path(partition)
+        with file_lock(path + ".lock"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class SQLiteTokenStore(TokenStore):
+    """Partições em uma tabela SQLite (seguro entre threads e processos)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_cache ("
+                "partition TEXT PRIMARY KEY, blob TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def get(self, partition: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT blob FROM token_cache WHERE partition = ?", (partition,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, partition: str, blob: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO token_cache (partition, blob, updated) VALUES (?, ?, ?)",
+                (partition, blob, time.time()),
+            )
+
+    def delete(self, partition: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM token_cache WHERE partition = ?", (partition,))
+
+
+# ============================================================================
+# CACHE MSAL PARTICIONADO
+# ============================================================================
+class PartitionedTokenCache(msal.SerializableTokenCache):
+    """
+    SerializableTokenCache que persiste cada usuário em uma partição própria.
+
+    Uso típico por operação:
+        cache.load_partition(home_account_id)
+        ... app.acquire_token_silent(...) ...
+        cache.save_partition(home_account_id)
+
+    O flag has_state_changed do MSAL é único para o cache inteiro; aqui cada
+    partição guarda o digest do que foi gravado por último, então gravar a
+    partição de um usuário não esconde a mudança de outro. Só as
+    `max_partitions` partições usadas mais recentemente ficam na memória;
+    as demais continuam no store e são recarregadas sob demanda.
+    """
+
+    def __init__(self, store: TokenStore, max_partitions: int = 1000):
+        super().__init__()
+        self.store = store
+        self.max_partitions = max_partitions
+        self._saved: Dict[str, str] = {}  # partição -> digest gravado/carregado
+        self._resident: "OrderedDict[str, None]" = OrderedDict()
+
+    @staticmethod
+    def _digest(subset: Dict[str, dict]) -> str:
+        return hashlib.sha256(json.dumps(subset, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _subset(self, home_account_id: str) -> Dict[str, dict]:
+        # Chamado com self._lock adquirido
+        subset: Dict[str, dict] = {}
+        for section, entries in self._cache.items():
+            if not isinstance(entries, dict):
+                continue
+            # AppMetadata não tem home_account_id e vai em todas as partições
+            picked = {
+                k: v for k, v in entries.items()
+                if v.get("home_account_id", home_account_id) == home_account_id
+            }
+            if picked:
+                subset[section] = picked
+        return subset
+
+    def _drop(self, home_account_id: str):
+        # Chamado com self._lock adquirido
+        for entries in self._cache.values():
+            if isinstance(entries, dict):
+                for k in [k for k, v in entries.items()
+                          if v.get("home_account_id") == home_account_id]:
+                    del entries[k]
+        self._saved.pop(home_account_id, None)
+        self._resident.pop(home_account_id, None)
+
+    def _touch(self, home_account_id: str):
+        """Marca a partição como residente e tira da memória as excedentes"""
+        with self._lock:
+            self._resident[home_account_id] = None
+            self._resident.move_to_end(home_account_id)
+            victims = []
+            while len(self._resident) > self.max_partitions:
+                victims.append(self._resident.popitem(last=False)[0])
+        for victim in victims:
+            self._write(victim, force=False)  # no-op se nada mudou
+            with self._lock:
+                if victim not in self._resident:  # não foi reusada no meio tempo
+                    self._drop(victim)
+
+    def load_partition(self, home_account_id: str):
+        """Mescla a partição persistida do usuário no cache em memória"""
+        if not home_account_id:
+            return
+        blob = self.store.get(home_account_id)
+        if blob:
+            data = json.loads(blob)
+            with self._lock:
+                for section, entries in data.items():
+                    if isinstance(entries, dict):
+                        self._cache.setdefault(section, {}).update(entries)
+                self._saved[home_account_id] = self._digest(self._subset(home_account_id))
+        self._touch(home_account_id)
+
+    def _write(self, home_account_id: str, force: bool):
+        with self._lock:
+            subset = self._subset(home_account_id)
+            digest = self._digest(subset)
+            if not force and self._saved.get(home_account_id) == digest:
+                return
+            self._saved[home_account_id] = digest
+        self.store.set(home_account_id, json.dumps(subset))
+
+    def save_partition(self, home_account_id: str, force: bool = False):
+        """Grava no store apenas as entradas do usuário (se mudaram desde a última gravação)"""
+        if not home_account_id:
+            return
+        self._write(home_account_id, force)
+        if home_account_id not in self._resident:
+            self._touch(home_account_id)  # ex.: login, sem load_partition antes
+
+    def forget_partition(self, home_account_id: str):
+        """Remove o usuário da memória e do store (ex.: logout)"""
+        if not home_account_id:
+            return
+        with self._lock:
+            self._drop(home_account_id)
+        self.store.delete(home_account_id)
+
+
+_caches_lock = threading.Lock()
+_caches: Dict[tuple, PartitionedTokenCache] = {}
+
+
+def create_token_store(kind: str = "memory", path: Optional[str] = None) -> TokenStore:
+    """Cria o store a partir da configuração ("memory", "file" ou "sqlite")"""
+    kind = (kind or "memory").lower()
+    if kind == "memory":
+        return MemoryTokenStore()
+    if kind == "file":
+        return FileTokenStore(path or os.path.join(".streamlit", "token_cache"))
+    if kind == "sqlite":
+        return SQLiteTokenStore(path or os.path.join(".streamlit", "token_cache.sqlite"))
+    raise ValueError(f"Tipo de token cache desconhecido: {kind}")
+
+
+def get_token_cache(kind: str = "memory", path: Optional[str] = None) -> PartitionedTokenCache:
+    """Cache particionado compartilhado pelo processo para (kind, path)"""
+    key = ((kind or "memory").lower(), path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = PartitionedTokenCache(create_token_store(kind, path))
+            _caches[key] = cache
+        return cache
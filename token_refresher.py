@@ -0,0 +1,209 @@
+"""
+Renovação de tokens de usuário em segundo plano
+
+Antes, check_and_refresh_token renovava o token dentro do rerun do usuário
+quando faltavam menos de 5 minutos, travando a página no endpoint de token.
+O TokenRefresher mantém as próximas expirações em um min-heap e renova
+antecipadamente em threads de trabalho:
+  - o instante de cada renovação recebe jitter, espalhando sessões que
+    fizeram login juntas;
+  - single-flight por refresh token: sessões que compartilham o mesmo
+    refresh token disparam uma única chamada ao Azure AD;
+  - o novo token é trocado atomicamente no SessionTokens da sessão (uma
+    única atribuição de TokenSet), então leitores nunca veem token e
+    validade misturados;
+  - as renovações caem dentro da janela de MSAL_REFRESH_WINDOW segundos em
+    que acquire_token_silent deixa de servir o token do cache. Se mesmo
+    assim o MSAL devolver o token atual, nada é trocado e a próxima
+    tentativa é agendada para dentro dessa janela.
+
+O heap guarda referências fracas: sessões descartadas saem sozinhas.
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+RefreshFn = Callable[[str, Optional[str]], Optional[Dict[str, Any]]]
+
+# Antes disso o MSAL devolve o access token do cache sem renovar
+MSAL_REFRESH_WINDOW = 300
+
+
+class TokenSet(NamedTuple):
+    """Tokens de uma sessão; trocado por inteiro a cada renovação"""
+    access_token: str
+    refresh_token: Optional[str]
+    expires_at: float  # epoch
+    home_account_id: Optional[str]
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any], previous: "TokenSet" = None) -> "TokenSet":
+        return cls(
+            access_token=result["access_token"],
+            refresh_token=result.get("refresh_token") or (previous.refresh_token if previous else None),
+            expires_at=time.time() + int(result.get("expires_in", 3600)),
+            home_account_id=result.get("home_account_id") or (previous.home_account_id if previous else None),
+        )
+
+    def expires_in(self) -> float:
+        return self.expires_at - time.time()
+
+
+class SessionTokens:
+    """Contêiner dos tokens de uma sessão (guardado no session_state)"""
+
+    __slots__ = ("current", "refresh", "on_swap", "generation", "scheduled", "failed", "__weakref__")
+
+    def __init__(self, current: TokenSet):
+        self.current = current
+        self.refresh: Optional[RefreshFn] = None
+        # Chamado após cada troca (ex.: persistir no session store)
+        self.on_swap: Optional[Callable[[TokenSet], None]] = None
+        self.generation = 0  # invalida entradas antigas do heap
+        self.scheduled = -1
+        self.failed = False
+
+    def swap(self, new: TokenSet):
+        self.generation += 1
+        self.failed = False
+        self.current = new
+
+
+class TokenRefresher:
+    """Agenda e executa renovações antecipadas de SessionTokens"""
+
+    def __init__(self, lead_time: float = 240, jitter: float = 60,
+                 retry_delay: float = 30, max_workers: int = 4):
+        self.lead_time = lead_time
+        self.jitter = jitter
+        self.retry_delay = retry_delay
+        self._heap = []  # (vencimento, seq, ref fraca, geração)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._inflight: Dict[str, Future] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="token-refresh")
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, tokens: SessionTokens, refresh: RefreshFn):
+        """Passa a renovar `tokens` em segundo plano usando `refresh(refresh_token, home_account_id)`"""
+        tokens.refresh = refresh
+        if not tokens.current.refresh_token:
+            return
+        with self._cond:
+            if tokens.scheduled != tokens.generation:
+                self._push(tokens)
+
+    def untrack(self, tokens: SessionTokens):
+        """Para de renovar (logout); uma renovação em andamento é descartada"""
+        with self._cond:
+            tokens.generation += 1
+            tokens.refresh = None
+            tokens.on_swap = None
+
+    def _push(self, tokens: SessionTokens, delay: float = None):
+        # Chamado com self._cond adquirido
+        if delay is None:
+            due = tokens.current.expires_at - self.lead_time - random.uniform(0, self.jitter)
+        else:
+            due = time.time() + delay
+        heapq.heappush(self._heap, (due, next(self._seq), weakref.ref(tokens), tokens.generation))
+        tokens.scheduled = tokens.generation
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="token-refresher", daemon=True)
+            self._thread.start()
+        self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.time()
+                    if self._heap and self._heap[0][0] <= now:
+                        _, _, ref, generation = heapq.heappop(self._heap)
+                        break
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+            tokens = ref()
+            if tokens is None or tokens.generation != generation or tokens.refresh is None:
+                continue  # sessão descartada, já renovada ou deslogada
+            self._pool.submit(self.refresh, tokens)
+
+    def refresh(self, tokens: SessionTokens) -> bool:
+        """
+        Renova agora (single-flight por refresh token) e troca o TokenSet.
+        Também usado em primeiro plano quando o token já venceu.
+        """
+        current = tokens.current
+        refresh = tokens.refresh
+        generation = tokens.generation
+        key = current.refresh_token
+        if not key or refresh is None:
+            return False
+
+        with self._cond:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+
+        if owner:
+            try:
+                result = refresh(key, current.home_account_id)
+            except Exception as e:
+                logger.error(f"Erro ao renovar token em segundo plano: {e}")
+                result = None
+            with self._cond:
+                self._inflight.pop(key, None)
+            future.set_result(result)
+        result = future.result()
+
+        with self._cond:
+            if tokens.current is not current:
+                return True  # outra renovação já trocou o token
+            if tokens.refresh is None or tokens.generation != generation:
+                return False  # deslogada durante a chamada: descarta o resultado
+            if not result or "access_token" not in result:
+                if tokens.refresh is not None and current.expires_in() > self.retry_delay:
+                    self._push(tokens, delay=self.retry_delay)
+                else:
+                    tokens.failed = True
+                return False
+            if result["access_token"] == current.access_token:
+                # Token do cache do MSAL: trocar e reagendar giraria em falso
+                delay = current.expires_in() - MSAL_REFRESH_WINDOW + self.retry_delay
+                if current.expires_in() > self.retry_delay:
+                    self._push(tokens, delay=max(delay, self.retry_delay))
+                else:
+                    tokens.failed = True
+                return False
+            tokens.swap(TokenSet.from_result(result, current))
+            self._push(tokens)
+            on_swap, new = tokens.on_swap, tokens.current
+
+        if on_swap is not None:
+            try:
+                on_swap(new)
+            except Exception as e:
+                logger.error(f"Erro ao propagar token renovado: {e}")
+        return True
+
+
+_lock = threading.Lock()
+_default_refresher: Optional[TokenRefresher] = None
+
+
+def get_token_refresher() -> TokenRefresher:
+    """Refresher compartilhado por todas as sessões do processo"""
+    global _default_refresher
+    with _lock:
+        if _default_refresher is None:
+            _default_refresher = TokenRefresher()
+        return _default_refresher
@@ -0,0 +1,182 @@
+"""
+Validação local de tokens JWT do Azure AD
+
+Substitui a chamada GET /me por uma verificação offline: decodifica o token,
+confere exp/nbf/aud/iss e valida a assinatura contra o JWKS do tenant, que é
+mantido em cache e renovado periodicamente (ou quando aparece um `kid`
+desconhecido, após rotação de chaves).
+
+validate() sempre verifica a assinatura (RS256, chave do JWKS); nada no
+cabeçalho do token, que é controlado por quem o envia, desliga essa checagem.
+
+Observação: access tokens emitidos para o Microsoft Graph, por desenho da
+Microsoft, não podem ter a assinatura verificada por terceiros, então
+validate() os rejeita. check_claims() confere apenas exp/nbf/aud/iss desses
+tokens; o resultado NÃO prova identidade e não detecta tokens revogados ou
+forjados (para isso, chame o Graph com o token).
+
+Para testes, passe um `fetcher` que devolva um JWKS gerado localmente.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import jwt
+import requests
+from jwt import PyJWK
+
+from graph_http import get_default_transport
+
+GRAPH_AUDIENCES = ("https://graph.microsoft.com", "00000003-0000-0000-c000-000000000000")
+
+
+class JwksCache:
+    """Conjunto de chaves públicas (JWKS) em cache, indexado por `kid`"""
+
+    def __init__(self, jwks_uri: str, refresh_interval: float = 6 * 3600,
+                 min_refresh_interval: float = 300,
+                 fetcher: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.jwks_uri = jwks_uri
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._fetcher = fetcher or self._fetch
+        self._keys: Dict[str, PyJWK] = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch(self) -> Dict[str, Any]:
+        r = get_default_transport().get(self.jwks_uri, timeout=10)
+        r.raise_for_status()
+        return r.json()
+
+    def refresh(self):
+        """Baixa o JWKS e substitui o conjunto de chaves"""
+        data = self._fetcher()
+        keys = {}
+        for jwk in data.get("keys", []):
+            if "kid" in jwk:
+                keys[jwk["kid"]] = PyJWK(jwk)
+        self._keys = keys
+        self._fetched_at = time.time()
+
+    def _needs_refresh(self, kid: Optional[str]) -> bool:
+        age = time.time() - self._fetched_at
+        if age > self.refresh_interval:
+            return True
+        # kid desconhecido (rotação de chaves), com limite de frequência
+        return kid not in self._keys and age > self.min_refresh_interval
+
+    def get_key(self, kid: Optional[str]) -> Optional[PyJWK]:
+        """Chave para `kid`; renova o JWKS se vencido ou se o kid for desconhecido"""
+        if self._needs_refresh(kid):
+            with self._lock:
+                # Outra thread pode ter renovado enquanto esperávamos o lock
+                if self._needs_refresh(kid):
+                    self.refresh()
+        return self._keys.get(kid)
+
+
+class TokenValidator:
+    """Valida tokens do tenant localmente, sem chamadas de rede no caminho comum"""
+
+    def __init__(self, tenant_id: str, audiences: Iterable[str],
+                 jwks: Optional[JwksCache] = None, leeway: int = 60,
+                 algorithms: Iterable[str] = ("RS256",),
+                 unverified_audiences: Iterable[str] = GRAPH_AUDIENCES):
+        self.tenant_id = tenant_id
+        # Audiences cujos tokens têm a assinatura verificada (client id / API própria)
+        self.audiences = list(audiences)
+        # Audiences aceitas só em check_claims (tokens que não podemos verificar)
+        self.unverified_audiences = list(unverified_audiences)
+        self.issuers = (
+            f"https://login.microsoftonline.com/{tenant_id}/v2.0",
+            f"https://sts.windows.net/{tenant_id}/",
+        )
+        self.jwks = jwks or get_jwks_cache(
+            f"https://login.microsoftonline.com/{tenant_id}/discovery/v2.0/keys"
+        )
+        self.leeway = leeway
+        self.algorithms = list(algorithms)
+
+    def _decode(self, token: str, key, audiences, verify_signature: bool) -> Dict[str, Any]:
+        claims = jwt.decode(
+            token,
+            key=key,
+            algorithms=self.algorithms,
+            audience=audiences,
+            leeway=self.leeway,
+            options={
+                "verify_signature": verify_signature,
+                "verify_exp": True,
+                "verify_nbf": True,
+                "verify_aud": True,
+                "require": ["exp", "iss", "aud"],
+            },
+        )
+        if claims.get("iss") not in self.issuers:
+            raise jwt.InvalidIssuerError(f"Emissor inválido: {claims.get('iss')}")
+        return claims
+
+    def validate(self, token: str) -> Dict[str, Any]:
+        """
+        Retorna as claims do token ou levanta jwt.InvalidTokenError.
+        A assinatura é sempre verificada e a audience deve estar em `audiences`.
+        """
+        header = jwt.get_unverified_header(token)
+        jwk = self.jwks.get_key(header.get("kid"))
+        if jwk is None:
+            raise jwt.InvalidTokenError(f"Chave de assinatura desconhecida: {header.get('kid')}")
+        return self._decode(token, jwk.key, self.audiences, verify_signature=True)
+
+    def is_unverifiable(self, token: str) -> bool:
+        """True se a claim `aud` (não verificada) é de uma audience só conferível por claims"""
+        try:
+            aud = jwt.decode(token, options={"verify_signature": False}).get("aud")
+        except jwt.PyJWTError:
+            return False
+        auds = aud if isinstance(aud, list) else [aud]
+        return any(a in self.unverified_audiences for a in auds)
+
+    def check_claims(self, token: str) -> Dict[str, Any]:
+        """
+        Confere só exp/nbf/aud/iss de um token que não podemos verificar (ex.:
+        access token do Graph). Sem verificação de assinatura: as claims NÃO
+        provam identidade e tokens revogados ou forjados não são detectados.
+        """
+        return self._decode(token, None, self.unverified_audiences, verify_signature=False)
+
+    def is_valid(self, token: str) -> bool:
+        """True se o token passa por todas as verificações"""
+        try:
+            self.validate(token)
+            return True
+        except (jwt.PyJWTError, requests.exceptions.RequestException, ValueError):
+            return False
+
+
+_lock = threading.Lock()
+_jwks_caches: Dict[str, JwksCache] = {}
+_validators: Dict[tuple, TokenValidator] = {}
+
+
+def get_jwks_cache(jwks_uri: str) -> JwksCache:
+    """JWKS compartilhado pelo processo para a URI"""
+    with _lock:
+        cache = _jwks_caches.get(jwks_uri)
+        if cache is None:
+            cache = JwksCache(jwks_uri)
+            _jwks_caches[jwks_uri] = cache
+        return cache
+
+
+def get_token_validator(tenant_id: str, audiences: Iterable[str]) -> TokenValidator:
+    """Validador compartilhado pelo processo para (tenant, audiences)"""
+    key = (tenant_id, tuple(audiences))
+    with _lock:
+        validator = _validators.get(key)
+    if validator is None:
+        validator = TokenValidator(tenant_id, key[1])
+        with _lock:
+            validator = _validators.setdefault(key, validator)
+    return validator